@@ -0,0 +1,14 @@
+# analytics — consultas agregadas das páginas, sem Streamlit
+"""API de consultas usada pelas páginas (que só desenham) e por testes, benchmarks e jobs em lote.
+
+    df   = abrir(caminho)                       # ou carregar_dados(...) dentro do app
+    spec = especificar_filtros(df, regiao_sel='SUL', advp_valor=7)
+    r    = series_por_periodo(df, spec, 'Mensal')
+
+Cada consulta é memoizada por versão da base + filtros (ver analytics.consultas).
+"""
+from common import FiltroSpec, especificar_filtros, aplicar_filtros
+from .consultas import (
+    abrir, consulta, precos_por_agencia, participacao_rankings, vantagem_por_trecho,
+    melhor_preco_por_hora, mapa_hora_advp, cascatas, series_por_periodo, series_por_hora
+)
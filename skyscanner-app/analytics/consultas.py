@@ -0,0 +1,308 @@
+# analytics/consultas.py — agregações das páginas 01–06 como funções puras (sem st.*)
+"""Cada consulta recebe o handle da base (o que carregar_dados/abrir devolvem) e um FiltroSpec,
+e devolve um dict de frames pequenos, prontos para plotar. O resultado fica no cache LRU de
+recortes (cache_recortes) chaveado por (consulta, argumentos, versão da base, filtros normalizados):
+numa batida o recorte nem é resolvido. Frames avulsos (sem versão) são sempre recalculados.
+
+Uso fora do Streamlit (a partir de skyscanner-app/):
+    from analytics import abrir, especificar_filtros, precos_por_agencia
+    df = abrir('data/OFERTAS.parquet')
+    r = precos_por_agencia(df, especificar_filtros(df, regiao_sel='SUL'))
+"""
+import functools
+
+import numpy as np
+import pandas as pd
+
+from common import (
+    CAMINHO_ARQUIVO, CARGA_COMPACTA, GRUPO123, REGIOES, ADVPS_ORDEM, FiltroSpec, DatasetParticionado, CuboHoraVoo,
+    abrir_fonte, aplicar_filtros, cache_recortes, etapa, _linhas_de, cubo_filtrado, rollup_horario_filtrado, podio_buscas,
+    preco_medio_cubo, ofertas_cubo, diferenca_vs_melhor, _versao_de
+)
+
+# ==================== BASE / MEMOIZAÇÃO ====================
+def abrir(caminho: str | None = None, compacto: bool = CARGA_COMPACTA):
+    """Handle da base fora do Streamlit (scripts, benchmarks, workers): o mesmo objeto que carregar_dados
+    devolve às páginas. ValueError se a fonte não puder ser lida."""
+    caminho = caminho or CAMINHO_ARQUIVO
+    if not caminho:
+        raise ValueError("Caminho do arquivo não definido. Configure PARQUET_PATH ou informe o caminho.")
+    fonte = abrir_fonte(caminho, compacto)
+    if isinstance(fonte, DatasetParticionado): return fonte
+    if fonte.df is None: raise ValueError(fonte.erro or f"Arquivo não encontrado: {caminho}")
+    return fonte.df
+
+def _copia(obj):
+    """Cópia rasa (copy-on-write) do que está no cache: quem recebe pode acrescentar colunas à vontade."""
+    if isinstance(obj, dict): return {k: _copia(v) for k, v in obj.items()}
+    if isinstance(obj, (pd.DataFrame, pd.Series)): return obj.copy(deep=False)
+    return obj
+
+def consulta(fn):
+    """fn(flt, *args) -> fn(df, spec, *args), memoizada no cache de recortes; `flt` (aplicar_filtros)
+    só é montado quando falta no cache. Os argumentos extras entram na chave (precisam ser hashable)."""
+    @functools.wraps(fn)
+    def chamar(df, spec: FiltroSpec, *args):
+        k = spec.chave(_versao_de(df))
+        chave = None if k is None else (('consulta', fn.__name__) + args, k)
+        with etapa('agregacao', fn.__name__) as e:
+            r = _copia(cache_recortes().obter(chave, lambda: fn(aplicar_filtros(df, spec), *args)))
+            e.linhas = _linhas_de(r)
+        return r
+    return chamar
+
+def _ofertas(d: pd.DataFrame) -> int:
+    return int(d['OFERTAS'].sum()) if 'OFERTAS' in d.columns else len(d)
+
+# ==================== 1. PREÇOS POR AGÊNCIA ====================
+@consulta
+def precos_por_agencia(flt) -> dict:
+    """Preço médio das principais e das concorrentes (None = sem ofertas no grupo) e diferença
+    vs. melhor concorrente de Grupo123 ou de 123MILHAS/MAXMILHAS, conforme a análise 123/Max."""
+    d = cubo_filtrado(flt)
+    if d.empty: return dict(ofertas=0)
+    ag = d['Agência/Companhia']
+    grupo = flt['config_123_max_filtro'] == 'Grupo123'
+    princ = d[ag.isin(['Grupo123'] if grupo else list(flt['agencias_principais']))]
+    conc = d[ag != 'Grupo123'] if grupo else d[~ag.isin(list(flt['agencias_principais']))]
+    return dict(
+        ofertas=_ofertas(d),
+        principais=None if princ.empty else preco_medio_cubo(princ, 'Agência/Companhia').reset_index(),
+        concorrentes=None if conc.empty else preco_medio_cubo(conc, 'Agência/Companhia').reset_index().sort_values('Preço'),
+        diferencas=(diferenca_vs_melhor(d, agencias=['Grupo123'], excluir=['Grupo123']) if grupo
+                    else diferenca_vs_melhor(d, agencias=GRUPO123)))
+
+# ==================== 2. PARTICIPAÇÃO NOS RANKINGS ====================
+@consulta
+def participacao_rankings(flt) -> dict:
+    """Ofertas agência x RANKING (com totais) e participação (%) dentro da agência e dentro do ranking."""
+    d = cubo_filtrado(flt)
+    if d.empty: return dict(ofertas=0)
+    counts = ofertas_cubo(d, ['Agência/Companhia', 'RANKING']).unstack(fill_value=0)
+    # Ordena pela coluna de 1º lugar, se existir
+    col_r1 = 1 if 1 in counts.columns else ('1' if '1' in counts.columns else None)
+    if col_r1 is not None:
+        counts = counts.sort_values(by=col_r1, ascending=False)
+
+    counts_tot = counts.copy()
+    counts_tot['Total'] = counts_tot.sum(axis=1)
+    counts_tot.loc['Total'] = counts_tot.sum(numeric_only=True, axis=0)
+
+    row_sums = counts.sum(axis=1).replace(0, np.nan)
+    pct_row = (counts.divide(row_sums, axis=0) * 100).fillna(0).round(2)
+    if col_r1 is not None:
+        pct_row = pct_row.sort_values(by=col_r1, ascending=False)
+    col_sums = counts.sum(axis=0).replace(0, np.nan)
+    pct_col = (counts.divide(col_sums, axis=1) * 100).fillna(0).round(2)
+    return dict(ofertas=_ofertas(d), contagens=counts_tot, pct_linha=pct_row, pct_coluna=pct_col)
+
+# ==================== 3. VANTAGEM POR TRECHO ====================
+def _moda_por_trecho(d: pd.DataFrame, col: str) -> pd.DataFrame:
+    """Valor mais frequente de `col` por TRECHO (empate: o que aparece primeiro), via contagem agrupada."""
+    x = d[['TRECHO', col]].assign(_ordem=np.arange(len(d))).dropna(subset=[col])
+    n = x.groupby(['TRECHO', col], observed=True)['_ordem'].agg(['size', 'min']).reset_index()
+    n = n.sort_values(['TRECHO', 'size', 'min'], ascending=[True, False, True], kind='stable')
+    return n.drop_duplicates('TRECHO')[['TRECHO', col]]
+
+def _top_trechos(pv: pd.DataFrame, ag: str) -> pd.DataFrame:
+    d = pv[pv['Agência_1'] == ag]
+    if d.empty: return d.iloc[:, :0]
+    top = (d.groupby('TRECHO', observed=True)
+             .agg(
+                 Vitorias=('TRECHO','count'),
+                 Menor_Preco_1=('Preço_1','min'),
+                 Menor_Preco_2=('Preço_2','min'),
+                 Diferenca_Media_2=('Diferença_2_pct','mean'),
+                 Menor_Preco_3=('Preço_3','min'),
+                 Diferenca_Media_3=('Diferença_3_pct','mean')
+             )
+             .sort_values('Diferenca_Media_2', ascending=False)
+             .head(20)
+             .reset_index())
+    top = top.merge(_moda_por_trecho(d, 'Agência_2'), on='TRECHO', how='left').merge(
+        _moda_por_trecho(d, 'Agência_3'), on='TRECHO', how='left')
+    return top[[
+        'TRECHO','Vitorias','Menor_Preco_1','Agência_2','Menor_Preco_2','Diferenca_Media_2',
+        'Agência_3','Menor_Preco_3','Diferenca_Media_3'
+    ]].rename(columns={
+        'Menor_Preco_1':'Menor Preço 1º Lugar',
+        'Agência_2':'2º Lugar',
+        'Menor_Preco_2':'Menor Preço 2º Lugar',
+        'Diferenca_Media_2':'Diferença (%) para 2º',
+        'Agência_3':'3º Lugar',
+        'Menor_Preco_3':'Menor Preço 3º Lugar',
+        'Diferenca_Media_3':'Diferença (%) para 3º'
+    })
+
+@consulta
+def vantagem_por_trecho(flt) -> dict:
+    """Pódio de cada busca (123 e MAX separados): buscas com pódio, buscas com 1º e 2º de agências
+    diferentes e, por agência de GRUPO123, o top 20 de trechos em que ela venceu (vazio se nenhum)."""
+    pv = podio_buscas(flt)
+    buscas = len(pv)
+    pv = pv.dropna(subset=['Preço_1','Preço_2','Agência_1','Agência_2'])
+    pv = pv[pv['Agência_1'] != pv['Agência_2']]
+    if pv.empty: return dict(buscas=buscas, comparaveis=0, top={})
+    pv = pv.assign(Diferença_2_pct=((pv['Preço_2'] - pv['Preço_1']) / pv['Preço_1'] * 100).round(2),
+                   Diferença_3_pct=((pv['Preço_3'] - pv['Preço_1']) / pv['Preço_1'] * 100).round(2))
+    return dict(buscas=buscas, comparaveis=len(pv), top={ag: _top_trechos(pv, ag) for ag in GRUPO123})
+
+# ==================== 4. MELHOR PREÇO POR HORA DO VOO ====================
+@consulta
+def melhor_preco_por_hora(flt) -> dict:
+    """Menor preço por hora do voo: série 'Melhor Preço' + 123/MAX (ou Grupo123, ou as principais
+    presentes), no cubo hora do voo. horario=False quando a base não tem Horário1/2/3."""
+    if not CuboHoraVoo.coluna_horario(flt['_df']): return dict(horario=False, ofertas=0)
+    df_h = cubo_filtrado(flt, cubo='cubo_hora_voo')
+    if df_h.empty: return dict(horario=True, ofertas=0)
+
+    best_by_hour = df_h.groupby('HORA_VOO')['PRECO_MIN'].min().rename_axis('Hora do Voo').reset_index(name='Preço (R$)')
+    best_by_hour['Agência'] = 'Melhor Preço'
+
+    por_agencia = df_h.groupby(['Agência/Companhia','HORA_VOO'], observed=True)['PRECO_MIN'].min().reset_index()
+    por_agencia.columns = ['Agência','Hora do Voo','Preço (R$)']
+    por_agencia['Agência'] = por_agencia['Agência'].astype(str)
+    presentes = set(por_agencia['Agência'])
+    principais = flt['agencias_principais']
+    agencias = [a for a in (['Grupo123'] if flt['config_123_max_filtro'] == 'Grupo123' else GRUPO123) if a in presentes]
+    if not agencias and principais:
+        agencias = [a for a in principais if a in presentes]
+
+    series = por_agencia[por_agencia['Agência'].isin(agencias)]
+    series = series.iloc[np.argsort(series['Agência'].map({a: i for i, a in enumerate(agencias)}).to_numpy(), kind='stable')]
+    return dict(horario=True, ofertas=_ofertas(df_h), serie=pd.concat([best_by_hour, series], ignore_index=True))
+
+@consulta
+def mapa_hora_advp(flt, medida: str = 'Menor preço') -> pd.DataFrame:
+    """ADVP (ADVPS_ORDEM primeiro) x hora do voo (0–23) com o menor preço ou o preço médio ('Preço médio')."""
+    df_h = cubo_filtrado(flt, cubo='cubo_hora_voo')
+    g = df_h.groupby(['ADVP','HORA_VOO'], observed=True)
+    valores = g['PRECO_MIN'].min() if medida == 'Menor preço' else g['PRECO_SOMA'].sum() / g['PRECO_N'].sum()
+    mapa = valores.unstack('HORA_VOO').reindex(columns=range(24))
+    return mapa.reindex([a for a in ADVPS_ORDEM if a in mapa.index] + [a for a in mapa.index if a not in ADVPS_ORDEM])
+
+# ==================== 5. CASCATAS 123 x MAX ====================
+def _cascata(dif: pd.DataFrame, agencia_ref: str, xcol: str) -> pd.DataFrame:
+    d = dif[(dif['Agência'] == agencia_ref) & dif['Diferença (%)'].notna()]
+    return pd.DataFrame({xcol: d[xcol].astype(str), 'DifPct': d['Diferença (%)'],
+                         'LabelPct': d['Diferença (%)'].map('{:.2f}%'.format)}).reset_index(drop=True)
+
+@consulta
+def cascatas(flt) -> dict:
+    """Diferença (%) de 123MILHAS e MAXMILHAS vs. melhor concorrente por ADVP e por região (filtros da
+    série temporal), já ordenada para a cascata; só há chave para as agências presentes no recorte."""
+    d = cubo_filtrado(flt, timeseries=True)
+    if d.empty: return dict(ofertas=0, advp={}, regiao={})
+    # 123 e MAX vs melhor concorrente por ADVP e por região, cada um numa agregação só
+    dif_advp = diferenca_vs_melhor(d[d['ADVP'].isin(ADVPS_ORDEM)], 'ADVP')
+    dif_advp['ADVP'] = dif_advp['ADVP'].astype(int)
+    dif_regiao = diferenca_vs_melhor(d, 'REGIAO').rename(columns={'REGIAO': 'REGIÃO'})
+    presentes = set(d['Agência/Companhia'].unique())
+    por_advp, por_regiao = {}, {}
+    for ag in (a for a in GRUPO123 if a in presentes):
+        a = _cascata(dif_advp, ag, 'ADVP')
+        a['ADVP'] = pd.Categorical(a['ADVP'], categories=[str(x) for x in ADVPS_ORDEM], ordered=True)
+        por_advp[ag] = a.sort_values('ADVP')
+        por_regiao[ag] = _cascata(dif_regiao, ag, 'REGIÃO').sort_values('REGIÃO')
+    return dict(ofertas=_ofertas(d), advp=por_advp, regiao=por_regiao)
+
+# ==================== 6. VISÕES TEMPORAIS ====================
+@consulta
+def series_por_periodo(flt, visao: str = 'Semanal') -> dict:
+    """Seções 6.1–6.3 e 6.5–6.7 no cubo diário com PERIODO (visão Semanal/Quinzenal/Mensal): preço médio
+    e ofertas de 123, MAX e top-3 concorrentes, ofertas e share por ranking (1–3) e diferença vs. melhor
+    concorrente de cada principal por ADVP, por região (5 de maior volume) e no total. `ofertas` é a série
+    por período; o total do recorte vai em `total_ofertas`."""
+    cubo_ts = cubo_filtrado(flt, timeseries=True, periodo=visao)
+    if cubo_ts.empty: return dict(total_ofertas=0)
+    ag = cubo_ts['Agência/Companhia']
+    comp = cubo_ts[~ag.isin(GRUPO123)]
+    top3 = [] if comp.empty else list(ofertas_cubo(comp, 'Agência/Companhia').sort_values(ascending=False).head(3).index)
+    principais = [a for a in GRUPO123 if a in ag.unique()]
+    alvo = cubo_ts[ag.isin(principais + top3)]
+
+    ofertas_ranking, share_ranking = {}, {}
+    for rnk in [1,2,3]:
+        ofertas_ranking[rnk] = ofertas_cubo(alvo[alvo['RANKING']==rnk], ['PERIODO','Agência/Companhia']).reset_index(name='Ofertas')
+        base_r = cubo_ts[cubo_ts['RANKING']==rnk]
+        if base_r.empty: share_ranking[rnk] = pd.DataFrame(); continue
+        cnt = ofertas_cubo(base_r, ['PERIODO','Agência/Companhia']).reset_index(name='Q')
+        tot = cnt.groupby('PERIODO')['Q'].sum().reset_index(name='TOT')
+        share = cnt.merge(tot, on='PERIODO')
+        share['Participação (%)'] = (share['Q']/share['TOT']*100).round(2)
+        share_ranking[rnk] = share[share['Agência/Companhia'].isin(principais + top3)]
+
+    # 6.5–6.7: diferença vs melhor concorrente numa agregação só por (chaves, agência), direto do cubo
+    def diff_vs_best(chaves, ag, colunas):
+        d = diferenca_vs_melhor(cubo_ts, chaves, agencias=[ag]).dropna(subset=['Diferença (%)'])
+        return d[colunas].reset_index(drop=True)
+
+    vol = ofertas_cubo(cubo_ts, 'REGIAO')
+    reg_rank = [(reg, int(vol.get(reg, 0))) for reg in REGIOES]
+    top_regs = [r for r,_ in sorted(reg_rank, key=lambda x:x[1], reverse=True)[:5] if _>0]
+    dif_advp, dif_regiao, linhas = {}, {}, []
+    for a in principais:
+        dd = diff_vs_best(['ADVP','PERIODO'], a, ['PERIODO','ADVP','Diferença (%)'])
+        dif_advp[a] = dd.assign(ADVP=dd['ADVP'].astype(int).astype(str))
+        dr = diff_vs_best(['REGIAO','PERIODO'], a, ['PERIODO','REGIAO','Diferença (%)'])
+        dr = dr.rename(columns={'REGIAO': 'REGIÃO'}).astype({'REGIÃO': str})
+        dif_regiao[a] = dr[dr['REGIÃO'].isin(top_regs)] if top_regs and not dr.empty else dr
+        d = diff_vs_best('PERIODO', a, ['PERIODO','Agência','Diferença (%)'])
+        if not d.empty: linhas.append(d)
+
+    return dict(
+        total_ofertas=_ofertas(cubo_ts), preco=preco_medio_cubo(alvo, ['PERIODO','Agência/Companhia']).reset_index(),
+        ofertas=ofertas_cubo(alvo, ['PERIODO','Agência/Companhia']).reset_index(name='Ofertas'),
+        ofertas_ranking=ofertas_ranking, share_ranking=share_ranking, principais=principais,
+        dif_advp=dif_advp, dif_regiao=dif_regiao,
+        dif_agencias=pd.concat(linhas, ignore_index=True) if linhas else pd.DataFrame())
+
+@consulta
+def series_por_hora(flt) -> dict:
+    """Seções 6.4 e 6.8–6.10 no rollup hora da busca x agência x RANKING: preço mínimo por hora, ofertas por
+    ranking, % de ranking 1 dentro de cada agência e share de 123/MAX no ranking 1
+    (pct_coluna=None quando não há ranking 1)."""
+    dH = rollup_horario_filtrado(flt)
+    if dH.empty: return dict(ofertas=0)
+    principais = [a for a in GRUPO123 if a in dH['Agência/Companhia'].unique()]
+
+    ag_series = []
+    for ag in principais:
+        s = dH[dH['Agência/Companhia']==ag].groupby('HORA')['PRECO_MIN'].min().reset_index(name='Preço')
+        s['Série'] = ag; ag_series.append(s)
+    smin = dH.groupby('HORA')['PRECO_MIN'].min().reset_index(name='Preço'); smin['Série'] = 'Melhor Preço'; ag_series.append(smin)
+    melhor_preco = pd.concat(ag_series, ignore_index=True)
+
+    series=[]
+    for ag in principais:
+        s = dH[(dH['Agência/Companhia']==ag) & dH['RANKING'].notna()]
+        s = s[['HORA','RANKING','Agência/Companhia','OFERTAS']].rename(columns={'OFERTAS':'Ofertas'}); s['Série']=ag; series.append(s)
+    dr1 = dH[dH['RANKING']==1]
+    win = dr1.groupby('HORA')['OFERTAS'].sum().reset_index(name='Ofertas')
+    win['RANKING']=1; win['Agência/Companhia']='*'; win['Série']='Melhor Preço'; series.append(win)
+    dfR = pd.concat(series, ignore_index=True)
+    ranking = {rnk: dfR[dfR['RANKING']==rnk] for rnk in [1,2,3]}
+
+    out=[]
+    tot_mkt = dH.groupby('HORA')['OFERTAS'].sum().reset_index(name='TOT')
+    win_mkt = dr1.groupby('HORA')['OFERTAS'].sum().reset_index(name='WIN')
+    m = tot_mkt.merge(win_mkt, on='HORA', how='left').fillna(0.0)
+    m['Participação (%)']=np.where(m['TOT']>0, m['WIN']/m['TOT']*100, np.nan); m['Série']='Melhor Preço'
+    out.append(m[['HORA','Participação (%)','Série']])
+    for ag in principais:
+        tot = dH[dH['Agência/Companhia']==ag].groupby('HORA')['OFERTAS'].sum().reset_index(name='TOT')
+        win = dr1[dr1['Agência/Companhia']==ag].groupby('HORA')['OFERTAS'].sum().reset_index(name='WIN')
+        x = tot.merge(win, on='HORA', how='left').fillna(0.0)
+        x['Participação (%)']=np.where(x['TOT']>0, x['WIN']/x['TOT']*100, np.nan)
+        x['Série']=ag; out.append(x[['HORA','Participação (%)','Série']])
+
+    share = None
+    if not dr1.empty:
+        cnt = dr1.groupby(['HORA','Agência/Companhia'], observed=True)['OFERTAS'].sum().reset_index(name='Q')
+        tot = cnt.groupby('HORA')['Q'].sum().reset_index(name='TOT')
+        share = cnt.merge(tot, on='HORA'); share['Participação (%)']=np.where(share['TOT']>0, share['Q']/share['TOT']*100, np.nan)
+        share['Série'] = share['Agência/Companhia']
+        share = share[share['Série'].isin(GRUPO123)]
+
+    return dict(ofertas=_ofertas(dH), principais=principais, melhor_preco=melhor_preco, ranking=ranking,
+                pct_linha=pd.concat(out, ignore_index=True), pct_coluna=share)
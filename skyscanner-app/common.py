@@ -4,9 +4,13 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-import os, re
+import os, re, sys, json, types, logging, hashlib, glob, threading, time, warnings, contextlib, functools, tracemalloc, weakref
+from dataclasses import dataclass, fields
 from datetime import datetime, timedelta
 from urllib.parse import urlparse
+from collections import OrderedDict
+from pandas.api.types import union_categoricals
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 # ==================== DETECÇÃO DE CAMINHO (ROBUSTO) ====================
 def _is_url(path: str) -> bool:
@@ -41,6 +45,306 @@ def _discover_data_path() -> str | None:
 
 CAMINHO_ARQUIVO = _discover_data_path()
 
+def _get_config(key, default=None):
+    s = _get_secret(key)
+    if s is not None: return s
+    return os.environ.get(key, default)
+
+def _get_flag(key, default=False) -> bool:
+    v = _get_config(key)
+    if v is None: return default
+    return str(v).strip().lower() in ("1", "true", "sim", "yes", "on")
+
+# Carga compacta (categorias + inteiros pequenos + float32). Desligar com CARGA_COMPACTA=0.
+CARGA_COMPACTA = _get_flag("CARGA_COMPACTA", True)
+# Cache Arrow IPC (Feather v2, sem compressão) da base normalizada; CACHE_DIR="" desliga.
+CACHE_DIR = _get_config("CACHE_DIR", os.path.join("data", ".cache"))
+# Intervalo mínimo (s) entre verificações de lotes novos/alterados na fonte.
+INTERVALO_ATUALIZACAO = float(_get_config("INTERVALO_ATUALIZACAO", 60))
+# Orçamento (MB) do cache LRU de recortes filtrados compartilhado entre páginas/sessões.
+CACHE_FILTROS_MB = float(_get_config("CACHE_FILTROS_MB", 64))
+# Linhas por página nas tabelas (só a página visível é formatada e enviada ao navegador).
+LINHAS_POR_PAGINA = int(_get_config("LINHAS_POR_PAGINA", 50))
+# Gráficos de linha: acima de PONTOS_WEBGL pontos no total usa Scattergl; séries com mais de
+# PONTOS_MAX_SERIE pontos são reduzidas por LTTB (mantém picos e vales).
+PONTOS_WEBGL = int(_get_config("PONTOS_WEBGL", 1500))
+PONTOS_MAX_SERIE = int(_get_config("PONTOS_MAX_SERIE", 2000))
+# Diagnóstico: tempo por etapa (carga/filtros/agregação/render) e RSS/pico por rerun, uma linha JSON por
+# rerun no logger 'skyscanner.desempenho' e os painéis "Desempenho"/"Memória" na sidebar. Desligado, nada é medido.
+DIAGNOSTICO = _get_flag("DIAGNOSTICO", False)
+
+log = logging.getLogger("skyscanner")
+log_desempenho = logging.getLogger("skyscanner.desempenho")
+if DIAGNOSTICO and not log_desempenho.handlers:
+    _h = logging.StreamHandler(); _h.setFormatter(logging.Formatter("%(message)s"))
+    log_desempenho.addHandler(_h); log_desempenho.setLevel(logging.INFO); log_desempenho.propagate = False
+
+# Copy-on-write: recortes da base compartilhada nunca escrevem de volta nela (padrão no pandas>=3).
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+# ==================== DIAGNÓSTICO (TEMPOS POR ETAPA) ====================
+ESTAGIOS = ('carga', 'filtros', 'agregacao', 'render')
+
+class _EtapaVazia:
+    """O que `with etapa(...) as e` recebe sem diagnóstico: aceita e.linhas/e.cache e ignora."""
+    __slots__ = ()
+    def __setattr__(self, nome, valor): pass
+    cache = linhas = bytes = None
+
+_SEM_MEDICAO = contextlib.nullcontext(_EtapaVazia())
+
+class Etapa:
+    """Trecho medido de um rerun. `linhas`, `cache` ('acerto'/'falta') e `bytes` (tamanho do que a etapa
+    produziu, ex.: figura serializada) podem ser preenchidos dentro do with."""
+    __slots__ = ('estagio', 'nome', 'linhas', 'cache', 'bytes', 'nivel', 's', '_medicao', '_t0')
+
+    def __init__(self, medicao, estagio, nome, linhas=None):
+        self.estagio, self.nome, self.linhas, self.cache, self.bytes, self.s = estagio, nome, linhas, None, None, 0.0
+        self._medicao = medicao
+
+    def __enter__(self):
+        m = self._medicao
+        self.nivel = len(m.abertas)
+        m.abertas.append(self); m.etapas.append(self)
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.s = time.perf_counter() - self._t0
+        self._medicao.abertas.pop()
+        return False
+
+class MedicaoRerun:
+    """Etapas de um rerun de página, da carga ao rodapé (em st.session_state enquanto aberto).
+    O pico de RSS é o do processo desde o início do rerun (com sessões simultâneas, inclui o das outras)."""
+    def __init__(self, pagina: str):
+        self.pagina, self.quando, self.t0 = pagina, datetime.now(), time.perf_counter()
+        self.etapas, self.abertas = [], []
+        zerar_pico_rss()
+        self.rss0 = memoria_processo().get('rss_mb')
+
+    def registro(self) -> dict:
+        """Resumo JSON-serializável: total, tempo por estágio (só etapas de nível 0; o resto vai para
+        'outros' = Streamlit/widgets), acertos/faltas de cache e as etapas na ordem em que começaram."""
+        total = time.perf_counter() - self.t0
+        por = dict.fromkeys(ESTAGIOS, 0.0)
+        for e in self.etapas:
+            if e.nivel == 0: por[e.estagio] = por.get(e.estagio, 0.0) + e.s
+        por['outros'] = max(total - sum(por.values()), 0.0)
+        marcas = [e.cache for e in self.etapas if e.cache]
+        ms = lambda s: round(s * 1000, 2)
+        mem = memoria_processo()
+        if self.rss0 is not None and 'pico_mb' in mem: mem['delta_pico_mb'] = round(mem['pico_mb'] - self.rss0, 1)
+        mem['figuras_mb'] = round(sum(e.bytes or 0 for e in self.etapas) / 2**20, 2)
+        return dict(quando=self.quando.isoformat(timespec='milliseconds'), pagina=self.pagina, total_ms=ms(total),
+                    estagios={k: ms(v) for k, v in por.items()},
+                    cache=dict(acertos=marcas.count('acerto'), faltas=marcas.count('falta')), memoria=mem,
+                    etapas=[dict(estagio=e.estagio, nome=e.nome, nivel=e.nivel, ms=ms(e.s), linhas=e.linhas, cache=e.cache,
+                                 bytes=e.bytes) for e in self.etapas])
+
+def _medicao() -> MedicaoRerun | None:
+    if get_script_run_ctx(suppress_warning=True) is None: return None
+    return st.session_state.get('_medicao_rerun')
+
+def _pagina_atual(ctx) -> str:
+    info = ctx.pages_manager.get_pages().get(ctx.page_script_hash, {})
+    return os.path.splitext(os.path.basename(info.get('script_path') or ctx.main_script_path))[0]
+
+def iniciar_medicao():
+    """Abre a medição do rerun (carregar_dados, primeira etapa de toda página). Reruns só de fragmento não abrem."""
+    if not DIAGNOSTICO: return
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is not None: st.session_state['_medicao_rerun'] = MedicaoRerun(_pagina_atual(ctx))
+
+def etapa(estagio: str, nome: str, linhas: int | None = None):
+    """with etapa('filtros', 'aplicar_filtros') as e: ...; e.linhas = n. Sem DIAGNOSTICO, fora de um rerun
+    medido ou headless é um nullcontext."""
+    if not DIAGNOSTICO: return _SEM_MEDICAO
+    m = _medicao()
+    return _SEM_MEDICAO if m is None else Etapa(m, estagio, nome, linhas)
+
+def marcar_cache(acerto: bool):
+    """Acerto/falta de cache na etapa aberta mais interna (a primeira marca vale)."""
+    if not DIAGNOSTICO: return
+    m = _medicao()
+    if m is not None and m.abertas and m.abertas[-1].cache is None:
+        m.abertas[-1].cache = 'acerto' if acerto else 'falta'
+
+def _linhas_de(obj) -> int | None:
+    if isinstance(obj, (pd.DataFrame, pd.Series)): return len(obj)
+    if isinstance(obj, dict):
+        n = [x for x in map(_linhas_de, obj.values()) if x is not None]
+        return sum(n) if n else None
+    return None
+
+def medido(estagio: str, linhas=None, cache: bool = False):
+    """Decorador: cada chamada vira uma etapa com o nome da função. linhas(resultado) -> contagem;
+    cache=True: função em st.cache_* que chama marcar_cache(False) quando calcula (sem marca = acerto).
+    Sem DIAGNOSTICO devolve a função intacta."""
+    def decorar(fn):
+        if not DIAGNOSTICO: return fn
+        @functools.wraps(fn)
+        def medir(*args, **kwargs):
+            with etapa(estagio, fn.__name__) as e:
+                r = fn(*args, **kwargs)
+                if linhas is not None: e.linhas = linhas(r)
+                if cache and e.cache is None: e.cache = 'acerto'
+                return r
+        return medir
+    return decorar
+
+def concluir_medicao():
+    """Fecha a medição do rerun: uma linha JSON no log e o painel Desempenho na sidebar."""
+    if not DIAGNOSTICO: return
+    m = _medicao()
+    if m is None: return
+    del st.session_state['_medicao_rerun']
+    reg = m.registro()
+    reg['sessao'] = get_script_run_ctx().session_id
+    log_desempenho.info(json.dumps(reg, ensure_ascii=False, default=str))
+    painel_desempenho(reg)
+
+def painel_desempenho(reg: dict):
+    with st.sidebar.expander("Desempenho", expanded=False):
+        st.caption(f"Rerun em **{reg['total_ms']:,.0f} ms** • cache: {reg['cache']['acertos']} acertos / "
+                   f"{reg['cache']['faltas']} faltas".replace(',', '.'))
+        m = reg['memoria']
+        if 'rss_mb' in m:
+            st.caption(f"RSS **{m['rss_mb']:.0f} MB** • pico no rerun {m.get('pico_mb', 0):.0f} MB "
+                       f"(+{m.get('delta_pico_mb', 0):.0f}) • figuras {m['figuras_mb']:.1f} MB")
+        st.dataframe(pd.DataFrame({'ms': reg['estagios']}).rename_axis('Estágio'), use_container_width=True)
+        et = pd.DataFrame(reg['etapas'], columns=['estagio', 'nome', 'nivel', 'ms', 'linhas', 'cache'])
+        et['nome'] = ['· ' * n + x for n, x in zip(et.pop('nivel'), et['nome'])]
+        st.dataframe(et.rename(columns={'estagio': 'Estágio', 'nome': 'Etapa', 'linhas': 'Linhas', 'cache': 'Cache'}),
+                     hide_index=True, use_container_width=True)
+        c = cache_recortes().estatisticas()
+        st.caption(f"Cache de recortes: {c['itens']} itens • {c['bytes'] / 2**20:.1f} de {c['limite'] / 2**20:.0f} MB • "
+                   f"acerto {c['taxa_acerto']:.0%} ({c['acertos']}/{c['acertos'] + c['faltas']}) • {c['descartes']} descartes")
+    painel_memoria()
+
+# ==================== DIAGNÓSTICO (MEMÓRIA) ====================
+# Fontes abertas (BaseOfertas/DatasetParticionado) por (caminho, compacto), sem segurá-las vivas.
+_FONTES = weakref.WeakValueDictionary()
+# Quadros da pilha guardados por alocação quando o tracemalloc é ligado pelo painel.
+QUADROS_TRACEMALLOC = 5
+_SEM_TAMANHO = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType,
+                type(threading.Lock()), threading.Event, threading.Thread)
+
+def memoria_processo() -> dict:
+    """RSS atual e pico (MB): /proc/self/status no Linux; fora dele psutil, se instalado; senão {}."""
+    try:
+        with open('/proc/self/status') as f:
+            v = {l.split(':')[0]: int(l.split()[1]) / 1024 for l in f if l.startswith(('VmRSS', 'VmHWM'))}
+        return dict(rss_mb=round(v['VmRSS'], 1), pico_mb=round(v['VmHWM'], 1))
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        import psutil
+        m = psutil.Process().memory_info()
+        return dict(rss_mb=round(m.rss / 2**20, 1), **({'pico_mb': round(m.peak_wset / 2**20, 1)} if hasattr(m, 'peak_wset') else {}))
+    except Exception:
+        return {}
+
+def zerar_pico_rss():
+    """Zera o pico (VmHWM) do processo, para medir o de um trecho; sem efeito fora do Linux."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f: f.write('5')
+    except OSError:
+        pass
+
+def tamanho_profundo(obj, _vistos: set | None = None) -> int:
+    """Bytes de obj e de tudo que ele referencia, cada objeto contado uma vez (passe o mesmo `_vistos`
+    para não recontar o que é compartilhado): frames/séries pelo memory_usage(deep), arrays e tabelas
+    Arrow pelo nbytes (memory-map incluso), contêineres e atributos recursivamente."""
+    vistos = set() if _vistos is None else _vistos
+    if id(obj) in vistos or isinstance(obj, _SEM_TAMANHO): return 0
+    vistos.add(id(obj))
+    if isinstance(obj, pd.DataFrame): return int(obj.memory_usage(deep=True, index=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)): return int(obj.memory_usage(deep=True))
+    if isinstance(obj, (str, bytes, int, float, bool, type(None))): return sys.getsizeof(obj)
+    nbytes = getattr(obj, 'nbytes', None)
+    if isinstance(nbytes, (int, np.integer)): return int(nbytes)
+    n = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        n += sum(tamanho_profundo(k, vistos) + tamanho_profundo(v, vistos) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        n += sum(tamanho_profundo(x, vistos) for x in obj)
+    else:
+        if hasattr(obj, '__dict__'): n += tamanho_profundo(vars(obj), vistos)
+        for nome in getattr(type(obj), '__slots__', ()):
+            n += tamanho_profundo(getattr(obj, nome, None), vistos)
+    return n
+
+def _memoria_fonte(fonte) -> dict:
+    """MB por parte de uma fonte aberta: base e nomes ingeridos + cada derivado (BaseOfertas) ou
+    facetas/catálogo/recortes lidos (DatasetParticionado). O que um derivado compartilha com a base não é recontado."""
+    if isinstance(fonte, DatasetParticionado):
+        partes = {'facetas': fonte._facetas, 'catalogo': fonte._catalogo, 'recortes': fonte._recortes}
+    else:
+        partes = {'ofertas': fonte.df, 'nomes': fonte.nomes, **{f"derivado {k}": v for k, v in fonte._derivados.items()}}
+    vistos = set()
+    mb = {k: round(tamanho_profundo(v, vistos) / 2**20, 2) for k, v in partes.items()}
+    return dict(versao=fonte.versao, total_mb=round(sum(mb.values()), 2), partes=mb)
+
+def memoria_sessao() -> dict:
+    """Bytes de cada chave de st.session_state da sessão atual ({} fora de uma sessão)."""
+    if get_script_run_ctx(suppress_warning=True) is None: return {}
+    return {str(k): tamanho_profundo(st.session_state[k]) for k in list(st.session_state.keys())}
+
+def alocacoes_tracemalloc(top: int = 15) -> list:
+    """Maiores alocações vivas por linha de código (tracemalloc precisa estar ligado; [] se não estiver)."""
+    if not tracemalloc.is_tracing(): return []
+    stats = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)]).statistics('lineno')
+    raiz = os.getcwd() + os.sep
+    return [dict(local=f"{s.traceback[0].filename.removeprefix(raiz)}:{s.traceback[0].lineno}",
+                 mb=round(s.size / 2**20, 3), blocos=s.count) for s in stats[:top]]
+
+def relatorio_memoria(top: int = 10) -> dict:
+    """Processo (RSS/pico), cada fonte aberta por parte, cache de recortes (maiores itens), sessão atual
+    e, com tracemalloc ligado, as maiores alocações."""
+    c = cache_recortes()
+    sessao = memoria_sessao()
+    return dict(quando=datetime.now().isoformat(timespec='seconds'), processo=memoria_processo(),
+                fontes={f"{k[0]} ({'compacta' if k[1] else 'completa'})": _memoria_fonte(f) for k, f in list(_FONTES.items())},
+                cache_recortes=dict(c.estatisticas(), maiores=c.maiores(top)),
+                sessao=dict(total_mb=round(sum(sessao.values()) / 2**20, 3),
+                            chaves=dict(sorted(sessao.items(), key=lambda kv: -kv[1])[:top])),
+                tracemalloc=alocacoes_tracemalloc(top))
+
+def despejar_memoria(caminho: str | None = None, top: int = 10) -> dict:
+    """relatorio_memoria numa linha JSON do logger 'skyscanner.desempenho' e, com `caminho`, num arquivo JSON."""
+    r = relatorio_memoria(top)
+    texto = json.dumps(r, ensure_ascii=False, default=str)
+    log_desempenho.info(texto)
+    if caminho:
+        with open(caminho, 'w', encoding='utf-8') as f: f.write(texto)
+    return r
+
+def painel_memoria():
+    """Expander "Memória": tamanho das fontes, cache de recortes e sessão sob demanda (medir percorre os
+    objetos, pode levar segundos em bases grandes) e snapshots do tracemalloc."""
+    with st.sidebar.expander("Memória", expanded=False):
+        if st.button("Medir memória", key="_diag_medir_memoria"):
+            r = despejar_memoria()
+            linhas = [(fonte, parte, mb) for fonte, f in r['fontes'].items() for parte, mb in f['partes'].items()]
+            st.dataframe(pd.DataFrame(linhas, columns=['Fonte', 'Parte', 'MB']), hide_index=True, use_container_width=True)
+            if r['cache_recortes']['maiores']:
+                st.dataframe(pd.DataFrame(r['cache_recortes']['maiores']), hide_index=True, use_container_width=True)
+            st.caption(f"Sessão: {r['sessao']['total_mb']:.2f} MB em {len(st.session_state)} chaves")
+            st.download_button("Baixar relatório (JSON)", json.dumps(r, ensure_ascii=False, indent=1, default=str),
+                               file_name="memoria.json", mime="application/json", key="_diag_baixar_memoria")
+        if not tracemalloc.is_tracing() and st.button("Ligar tracemalloc", key="_diag_tm_ligar"):
+            tracemalloc.start(QUADROS_TRACEMALLOC)
+        if tracemalloc.is_tracing():
+            c1, c2 = st.columns(2)
+            if c2.button("Desligar", key="_diag_tm_desligar"):
+                tracemalloc.stop(); return
+            if c1.button("Snapshot", key="_diag_tm_snapshot"):
+                st.dataframe(pd.DataFrame(alocacoes_tracemalloc()), hide_index=True, use_container_width=True)
+            atual, pico = tracemalloc.get_traced_memory()
+            st.caption(f"tracemalloc ligado: {atual / 2**20:.1f} MB rastreados (pico {pico / 2**20:.1f} MB)")
+
 # ==================== PALETA / ESTILO ====================
 BLUES = ['#0A2A6B','#0B5FFF','#1E6BFF','#3880FF','#5A97FF','#7FADFF','#A5C3FF','#CAD9FF','#E6F0FF']
 DARK_NAVY = '#0A2A6B'
@@ -143,22 +447,51 @@ def format_data_br(ts) -> str:
     if pd.isna(ts): return ""
     return ts.strftime("%d/%m/%Y %H:%M")
 
+def formatar_datas_br(s: pd.Series) -> pd.Series:
+    """format_data_br para a coluna inteira (strftime vetorizado; '' nos nulos)."""
+    return s.dt.strftime("%d/%m/%Y %H:%M").astype(object).where(s.notna(), "")
+
+def _tem_datas(s: pd.Series) -> bool:
+    """Coluna object com algum Timestamp/datetime (tipo inferido uma vez, sem isinstance por célula)."""
+    tipo = pd.api.types.infer_dtype(s, skipna=True)
+    if tipo in ('datetime', 'datetime64'): return True
+    if tipo != 'mixed': return False
+    return any(isinstance(v, (pd.Timestamp, np.datetime64, datetime)) for v in pd.unique(s.dropna()))
+
+@medido('render', linhas=len)
 def format_dates_in_df_for_display(df: pd.DataFrame) -> pd.DataFrame:
     d = df.copy()
-    for c in d.columns:
-        if pd.api.types.is_datetime64_any_dtype(d[c]):
-            d[c] = d[c].apply(lambda x: format_data_br(x) if pd.notna(x) else "")
-            continue
-        if pd.api.types.is_period_dtype(d[c]):
-            d[c] = d[c].dt.to_timestamp()
-            d[c] = d[c].apply(lambda x: format_data_br(x) if pd.notna(x) else "")
-            continue
-        if pd.api.types.is_object_dtype(d[c]) or pd.api.types.is_string_dtype(d[c]):
-            if d[c].map(lambda v: isinstance(v, (pd.Timestamp, np.datetime64, datetime))).any():
-                d[c] = pd.to_datetime(d[c], errors="coerce")
-                d[c] = d[c].apply(lambda x: format_data_br(x) if pd.notna(x) else "")
+    for i in range(d.shape[1]):
+        s = d.iloc[:, i]
+        if isinstance(s.dtype, pd.PeriodDtype):
+            s = s.dt.to_timestamp()
+        elif pd.api.types.is_object_dtype(s) and _tem_datas(s):
+            s = pd.to_datetime(s, errors="coerce")
+        if pd.api.types.is_datetime64_any_dtype(s):
+            d.isetitem(i, formatar_datas_br(s))
     return d
 
+def _padrao_numero(fmt: str):
+    """'R$ {:,.2f}' -> ('R$ ', True, 2, ''); None se o formato não for desse tipo."""
+    m = re.fullmatch(r"(.*)\{:(,?)\.(\d+)f\}(.*)", fmt, flags=re.S)
+    return (m.group(1), m.group(2) == ',', int(m.group(3)), m.group(4)) if m else None
+
+def fmt_num_br(valores, fmt: str = '{:,.0f}') -> np.ndarray:
+    """Números -> texto no padrão brasileiro (milhar '.', decimal ','), vetorizado; '' para nulos.
+    fmt segue a sintaxe do Styler ('{:,.0f}', '{:.2f}%', 'R$ {:,.2f}')."""
+    padrao = _padrao_numero(fmt)
+    v = pd.to_numeric(pd.Series(valores), errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    ok = np.isfinite(v)
+    if padrao is None:
+        return np.array([fmt.format(x) if o else "" for x, o in zip(v, ok)], dtype=object)
+    prefixo, milhar, casas, sufixo = padrao
+    r = np.round(np.where(ok, v, 0.0), casas)
+    partes = pd.Series(np.char.mod(f"%.{casas}f", np.abs(r))).str.partition('.')
+    inteiro = partes[0].str.replace(r"\B(?=(\d{3})+$)", ".", regex=True) if milhar else partes[0]
+    txt = np.where(r < 0, '-', '') + prefixo + inteiro.to_numpy(dtype=object)
+    if casas: txt = txt + ',' + partes[2].to_numpy(dtype=object)
+    return np.where(ok, txt + sufixo, "").astype(object)
+
 def theme_plotly(fig):
     fig.update_layout(
         template='plotly_white', paper_bgcolor='white', plot_bgcolor='white',
@@ -191,20 +524,135 @@ def build_blue_gray_map(categories):
         blue_turn = not blue_turn
     return cmap
 
-def line_fig(df, x, y, color, title, percent=False, height=380, cmap=None):
-    cmap = cmap or {}
-    fig = px.line(df, x=x, y=y, color=color, markers=True, color_discrete_map=cmap, title=title)
+def lttb(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: índices de n pontos que preservam a forma da série."""
+    tam = len(x)
+    if n >= tam or n < 3: return np.arange(tam)
+    x = np.asarray(x, dtype='float64'); y = np.asarray(y, dtype='float64')
+    bordas = np.linspace(1, tam - 1, n - 1).astype(np.int64)   # n-2 baldes entre o 1º e o último ponto
+    idx = np.empty(n, dtype=np.int64); idx[0], idx[-1] = 0, tam - 1
+    a = 0
+    for i in range(n - 2):
+        ini, fim = bordas[i], bordas[i + 1]
+        prox = slice(fim, bordas[i + 2]) if i + 2 < len(bordas) else slice(tam - 1, tam)
+        cx, cy = x[prox].mean(), y[prox].mean()
+        area = np.abs((x[a] - cx) * (y[ini:fim] - y[a]) - (x[a] - x[ini:fim]) * (cy - y[a]))
+        a = ini + int(np.argmax(area)); idx[i + 1] = a
+    return idx
+
+def _eixo_numerico(v: np.ndarray) -> np.ndarray:
+    return v.astype('datetime64[ns]').astype('int64').astype('float64') if np.issubdtype(v.dtype, np.datetime64) else v.astype('float64')
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _figura_linhas(df, x, y, color, title, percent, height, cores, webgl, max_serie):
+    """Figura (go) de line_fig; em cache por hash do frame agregado e dos parâmetros."""
+    marcar_cache(False)
+    xs = df[x].to_numpy(); ys = df[y].to_numpy(dtype='float64', na_value=np.nan)
+    codigos, series = pd.factorize(df[color], sort=False)
+    total = len(df)
+    Trace = go.Scattergl if total > webgl else go.Scatter
+    modo = 'lines' if total > webgl else 'lines+markers'
+    cores, seq, j = dict(cores), px.colors.qualitative.Plotly, 0
+    fig = go.Figure()
+    for k, nome in enumerate(series):
+        sel = np.flatnonzero(codigos == k)
+        sx, sy = xs[sel], ys[sel]
+        if len(sel) > max_serie:
+            ok = ~np.isnan(sy)
+            sx, sy = sx[ok], sy[ok]
+            if pd.api.types.is_numeric_dtype(sx) or np.issubdtype(sx.dtype, np.datetime64):
+                i = lttb(_eixo_numerico(sx), sy, max_serie); sx, sy = sx[i], sy[i]
+        if str(nome) in cores: cor = cores[str(nome)]
+        else: cor = seq[j % len(seq)]; j += 1
+        fig.add_trace(Trace(x=sx, y=sy, name=str(nome), legendgroup=str(nome), mode=modo,
+                            line=dict(color=cor), marker=dict(symbol='circle'), showlegend=True,
+                            hovertemplate=f"{color}={nome}<br>{x}=%{{x}}<br>{y}=%{{y}}<extra></extra>"))
+    fig.update_layout(title=dict(text=title), height=height, legend=dict(title=None, tracegroupgap=0),
+                      xaxis_title=None, yaxis_title=y, margin=dict(t=60))
     if percent: fig.update_yaxes(ticksuffix='%')
-    fig.update_layout(height=height, legend_title=None, xaxis_title=None)
     return theme_plotly(fig)
 
+def _pontos(fig) -> int:
+    return sum(len(t.x) for t in fig.data if getattr(t, 'x', None) is not None)
+
+@medido('render', linhas=_pontos, cache=True)
+def line_fig(df, x, y, color, title, percent=False, height=380, cmap=None):
+    """Linhas por `color` montadas direto em graph_objects a partir dos arrays (WebGL e LTTB em séries longas)."""
+    cores = tuple(sorted((str(k), v) for k, v in (cmap or {}).items()))
+    return _figura_linhas(df[[x, y, color]], x, y, color, title, percent, height, cores, PONTOS_WEBGL, PONTOS_MAX_SERIE)
+
+def mostrar_grafico(fig):
+    """st.plotly_chart na largura do container; a serialização da figura entra na etapa de render."""
+    with etapa('render', 'plotly_chart') as e:
+        if DIAGNOSTICO: e.linhas = _pontos(fig); e.bytes = len(fig.to_json())
+        st.plotly_chart(fig, use_container_width=True)
+
 def _ensure_dataframe(obj): return obj.to_frame().T if isinstance(obj,pd.Series) else obj
-def _show_styled_table(df_table, fmt='{:,.0f}', cmap='Blues'):
-    df_table=_ensure_dataframe(df_table)
-    if df_table is None or df_table.empty or df_table.shape[1]==0:
-        st.dataframe(df_table); return
-    d=format_dates_in_df_for_display(df_table.copy()); d.columns=d.columns.map(str)
-    st.dataframe(d.style.background_gradient(cmap=cmap).format(fmt))
+
+# ==================== TABELAS (EXIBIÇÃO) ====================
+_HEX = np.array([f"{i:02x}" for i in range(256)], dtype=object)
+
+def cores_gradiente(valores, cmap: str = 'Blues') -> np.ndarray:
+    """CSS do Styler.background_gradient (escala por coluna, texto claro em fundo escuro) calculado
+    em arrays para a tabela toda; células nulas ficam sem estilo."""
+    import matplotlib as mpl
+    v = np.asarray(valores, dtype='float64')
+    if v.ndim == 1: v = v[:, None]
+    nulo = np.isnan(v)
+    with np.errstate(invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)   # colunas só com nulos
+        lo, hi = np.nanmin(v, axis=0), np.nanmax(v, axis=0)
+        faixa = hi - lo
+        norm = np.where(faixa > 0, (v - lo) / np.where(faixa > 0, faixa, 1.0), 0.0)
+    rgba = mpl.colormaps[cmap](np.where(nulo, 0.0, norm))
+    rgb = rgba[..., :3]
+    lin = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    escuro = lin @ np.array([0.2126, 0.7152, 0.0722]) < 0.408
+    k = np.round(rgb * 255).astype(int)
+    css = ('background-color: #' + _HEX[k[..., 0]] + _HEX[k[..., 1]] + _HEX[k[..., 2]]
+           + np.where(escuro, ';color: #f1f1f1;', ';color: #000000;'))
+    return np.where(nulo, '', css)
+
+def exibir_tabela(df_table, fmt='{:,.0f}', cmap: str | None = 'Blues', chave: str = 'tabela',
+                  linhas_por_pagina: int = LINHAS_POR_PAGINA):
+    """st.dataframe paginado: gradiente das colunas numéricas (sobre a tabela inteira) e formatação
+    BR de datas/números feitos em arrays, só para a página visível.
+    fmt: um formato para todas as colunas numéricas ou dict coluna -> formato (as demais ficam cruas).
+    chave: identifica o seletor de página (única por tabela na página)."""
+    df_table = _ensure_dataframe(df_table)
+    with etapa('render', 'exibir_tabela', None if df_table is None else len(df_table)):
+        if df_table is None or df_table.empty or df_table.shape[1] == 0:
+            st.dataframe(df_table); return
+        _tabela_paginada(df_table, fmt, cmap, chave, linhas_por_pagina)
+
+@st.fragment
+def _tabela_paginada(df_table, fmt, cmap, chave, linhas_por_pagina):
+    """Fragmento: trocar de página reexecuta só esta tabela."""
+    num = [i for i in range(df_table.shape[1]) if pd.api.types.is_numeric_dtype(df_table.iloc[:, i])
+           and not pd.api.types.is_bool_dtype(df_table.iloc[:, i])]
+    css = cores_gradiente(df_table.iloc[:, num].to_numpy(dtype='float64', na_value=np.nan), cmap) if cmap and num else None
+
+    n = len(df_table)
+    paginas = max(1, -(-n // linhas_por_pagina))
+    area = st.container()
+    ini = 0
+    if paginas > 1:
+        c1, c2 = st.columns([1, 4])
+        pagina = c1.selectbox("Página", range(1, paginas + 1), key=f"pagina_{chave}")
+        ini = (pagina - 1) * linhas_por_pagina
+        c2.caption(f"Linhas {fmt_int_br(ini + 1)}–{fmt_int_br(min(ini + linhas_por_pagina, n))} de {fmt_int_br(n)}")
+    fim = ini + linhas_por_pagina
+
+    vis = format_dates_in_df_for_display(df_table.iloc[ini:fim])
+    for i in num:
+        f = fmt.get(vis.columns[i]) if isinstance(fmt, dict) else fmt
+        if f: vis.isetitem(i, fmt_num_br(vis.iloc[:, i], f))
+    vis.columns = vis.columns.map(str)
+    if css is None or not (vis.index.is_unique and vis.columns.is_unique):
+        area.dataframe(vis); return
+    estilo = np.full(vis.shape, '', dtype=object)
+    estilo[:, num] = css[ini:fim]
+    area.dataframe(vis.style.apply(lambda _: estilo, axis=None))
 
 # ==================== REGIÕES / TRECHOS ====================
 def expand_bidirectional(pairs):
@@ -217,14 +665,34 @@ def expand_bidirectional(pairs):
             a,b=t.split('-',1); s.add(f"{b}-{a}")
     return sorted(s)
 
-REGIOES_RAW={
- "NORTE":["BEL-GRU","BEL-GIG","BEL-GRU","BEL-MCP","BEL-STM","BEL-FOR","BEL-MAO","BEL-REC","BEL-CWB","BEL-FLN","BEL-CNF","BEL-NVT","BEL-SDU","CKS-CNF","MAO-STM","MAO-TBT","MAO-VCP","MAO-REC","MAO-PVH","MAO-TFF","FOR-MAO"],
- "NORDESTE":["AJU-GRU","AJU-GIG","AJU-VCP","AJU-CGH","AJU-CNF","BPS-CNF","BPS-CGH","BPS-GRU","FOR-GRU","FOR-GIG","FOR-REC","FOR-VCP","FOR-SSA","GYN-MCZ","GYN-REC","GYN-VCP","GYN-SDU","JDO-VCP","MCZ-VCP","PNZ-VCP","REC-SSA","REC-VCP","REC-VIX","SSA-VCP","SSA-VIX"],
- "CENTRO-OESTE":["BSB-CGH","BSB-REC","BSB-SDU","BSB-GIG","BSB-SSA","BSB-VCP","BSB-CNF","BSB-GRU","BSB-NAT","BSB-THE","BSB-SLZ","BSB-FOR","BSB-CGB","BSB-CWB","BSB-VIX","BSB-JPA","CGB-GRU","CGR-GRU","CGR-VCP"],
- "SUDESTE":["CAC-GRU","CGH-SDU","CGH-SSA","CGH-REC","CGH-CNF","CGH-CWB","CGH-POA","CGH-FLN","CGH-GYN","CGH-NVT","CGH-FOR","CGH-MCZ","CGH-VIX","CGH-GIG","CGH-THE","CGH-JPA","CGH-NAT","CGH-CGR","CNF-SSA","CNF-GIG","CNF-GRU","CNF-REC","CNF-FOR","CNF-SLZ","CNF-MAO","CNF-CWB","CNF-FLN","CNF-VCP","CNF-SLZ","CNF-MCZ","CNF-NAT","CNF-VIX","CNF-POA","CNF-THE"],
- "SUL":["CWB-GIG","CWB-MAO","CWB-SSA","CWB-POA","CWB-IGU","CWB-REC","CWB-SDU","FLN-GIG","FLN-SDU","FLN-MAO","FLN-SSA"]
-}
-REGIOES_TRECHOS={k:expand_bidirectional(v) for k,v in REGIOES_RAW.items()}
+def _arquivo_regioes() -> str | None:
+    for p in (_get_config("REGIOES_PATH"), os.path.join("data", "regioes.csv"),
+              os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "regioes.csv")):
+        if p and (_is_url(p) or os.path.exists(p)): return p
+    return None
+
+def carregar_regioes(caminho: str | None) -> dict:
+    """REGIAO -> trechos a partir de um CSV (colunas REGIAO,TRECHO). Trechos repetidos (em qualquer
+    sentido) são colapsados; se o mesmo trecho aparece em duas regiões, fica na primeira."""
+    if not caminho:
+        log.warning("tabela de regiões não encontrada (data/regioes.csv ou REGIOES_PATH); análises por região ficam vazias")
+        return {}
+    try:
+        tab = pd.read_csv(caminho, dtype=str, keep_default_na=False)
+    except Exception:
+        log.exception("falha ao ler a tabela de regiões %s", caminho)
+        return {}
+    regioes, dono = {}, {}
+    for reg, tr in zip(tab['REGIAO'].str.strip().str.upper(), tab['TRECHO']):
+        std = normalize_trecho(tr)
+        if not reg or not std: continue
+        if std in dono:
+            if dono[std] != reg: log.warning("trecho %s listado em %s e %s; mantido em %s", std, dono[std], reg, dono[std])
+            continue
+        dono[std] = dono[_rota_inversa(std)] = reg
+        regioes.setdefault(reg, []).append(std)
+    return regioes
+
 
 def normalize_trecho(value:str)->str:
     if value is None: return ""
@@ -235,193 +703,1312 @@ def normalize_trecho(value:str)->str:
     s=re.sub(r'[^A-Z]','-',s); s=re.sub(r'-+','-',s).strip('-'); return s
 
 def normalize_set(items): return {normalize_trecho(x) for x in items}
+
+def _rota_inversa(std: str) -> str:
+    a, sep, b = std.partition('-')
+    return f"{b}-{a}" if sep else std
+
+REGIOES_RAW=carregar_regioes(_arquivo_regioes())
+REGIOES_TRECHOS={k:expand_bidirectional(v) for k,v in REGIOES_RAW.items()}
 REGIOES_TRECHOS_STD={k:normalize_set(v) for k,v in REGIOES_TRECHOS.items()}
+REGIOES=list(REGIOES_TRECHOS_STD)
+# TRECHO_STD -> posição da região em REGIOES
+_REGIAO_DA_ROTA={t: i for i, v in enumerate(REGIOES_TRECHOS_STD.values()) for t in v}
+
+def tabela_rotas(trechos_std) -> pd.DataFrame:
+    """Dimensão de rotas: para cada TRECHO_STD, REGIAO (categórica), ORIGEM, DESTINO e ROTA_INVERSA."""
+    idx = pd.Index(pd.unique(pd.Index(trechos_std, dtype=object).dropna()), dtype=object, name='TRECHO_STD')
+    cod = np.array([_REGIAO_DA_ROTA.get(t, -1) for t in idx], dtype=np.int8)
+    od = idx.str.extract(r'^([A-Z]{3})-([A-Z]{3})$') if len(idx) else pd.DataFrame(columns=[0, 1])
+    return pd.DataFrame({'REGIAO': pd.Categorical.from_codes(cod, categories=REGIOES),
+                         'ORIGEM': od[0].to_numpy(), 'DESTINO': od[1].to_numpy(),
+                         'ROTA_INVERSA': [_rota_inversa(t) for t in idx]}, index=idx)
 
 # ==================== CARGA DE DADOS (HÍBRIDA) ====================
-@st.cache_data
-def carregar_dados(caminho: str | None):
-    if not caminho:
-        st.error("Caminho do arquivo não definido. Configure PARQUET_PATH (secret/env) ou coloque data/OFERTAS.parquet no repo.")
+COLUNAS_OFERTAS=['Nome do Arquivo','Companhia Aérea','Horário1','Horário2','Horário3','Tipo de Voo','Data do Voo','Data/Hora da Busca','Agência/Companhia','Preço','TRECHO','ADVP','RANKING']
+COLUNAS_DATA=['Data/Hora da Busca','Data do Voo']
+COLUNAS_HORARIO=['Horário1','Horário2','Horário3']   # guardadas como minuto do dia (Int16)
+COLUNAS_CATEGORIA=['Nome do Arquivo','Companhia Aérea','Tipo de Voo','Agência/Companhia','TRECHO']
+GRUPO123=['123MILHAS','MAXMILHAS']
+
+# Formatos que o coletor emite, na ordem em que são tentados; o que nenhum reconhecer
+# cai no parser genérico (dayfirst), mas só para os valores distintos que sobraram.
+FORMATOS_DATA=['ISO8601','%d/%m/%Y %H:%M:%S','%d/%m/%Y %H:%M','%d/%m/%Y']
+FORMATOS_HORARIO=['%H:%M','%H:%M:%S']+FORMATOS_DATA
+
+def _datas_distintas(valores: pd.Series, formatos) -> np.ndarray:
+    out = np.full(len(valores), np.datetime64('NaT'), dtype='datetime64[ns]')
+    resto = np.arange(len(valores))
+    for f in formatos + [None]:
+        if not len(resto): break
+        v = valores.iloc[resto]
+        if f is None:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UserWarning)   # "could not infer format": esperado aqui
+                p = pd.to_datetime(v, errors='coerce', dayfirst=True)
+        else:
+            p = pd.to_datetime(v, format=f, errors='coerce')
+        p = p.dt.tz_localize(None) if getattr(p.dt, 'tz', None) is not None else p
+        ok = p.notna().to_numpy()
+        out[resto[ok]] = p.to_numpy(dtype='datetime64[ns]')[ok]
+        resto = resto[~ok]
+    return out
+
+def converter_datas(s: pd.Series, formatos=FORMATOS_DATA) -> tuple[pd.Series, int]:
+    """Texto -> datetime64[ns] testando formatos explícitos sobre os valores distintos (cada string
+    é convertida uma vez). Devolve também quantos valores não nulos ficaram sem data."""
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return pd.to_datetime(s, errors='coerce'), 0
+    if pd.api.types.is_numeric_dtype(s):
+        r = pd.to_datetime(s, errors='coerce')
+        return r, int((r.isna() & s.notna()).sum())
+    codigos, distintos = pd.factorize(s, use_na_sentinel=True)
+    texto = pd.Series(distintos, dtype=object).astype(str).str.strip()
+    valores = _datas_distintas(texto, formatos)
+    falhou = np.append(np.isnat(valores) & (texto != '').to_numpy(), False)   # vazio conta como nulo
+    r = np.append(valores, np.datetime64('NaT', 'ns'))[codigos]
+    return pd.Series(r, index=s.index, name=s.name), int(falhou[codigos].sum())
+
+def minutos_do_dia(s: pd.Series) -> tuple[pd.Series, int]:
+    """Horário ('HH:MM', datas com hora ou datetime) -> minuto do dia em Int16 (<NA> se inválido)."""
+    t, falhas = converter_datas(s, FORMATOS_HORARIO)
+    return (t.dt.hour * 60 + t.dt.minute).astype('Int16'), falhas
+
+def _mem_mb(df: pd.DataFrame) -> float:
+    return float(df.memory_usage(deep=True).sum()) / 2**20
+
+def _menor_inteiro(s: pd.Series) -> pd.Series:
+    """Converte para o menor inteiro (nullable) que comporta os valores; mantém float32 se houver fração."""
+    s = pd.to_numeric(s, errors='coerce')
+    v = s.dropna()
+    if not v.empty and not np.array_equal(v.to_numpy(dtype='float64'), np.floor(v.to_numpy(dtype='float64'))):
+        return s.astype('float32')
+    lo, hi = (int(v.min()), int(v.max())) if not v.empty else (0, 0)
+    for dt in ('Int8', 'Int16', 'Int32'):
+        info = np.iinfo(dt.lower())
+        if info.min <= lo and hi <= info.max: return s.astype(dt)
+    return s.astype('Int64')
+
+def _categorizar(s: pd.Series) -> pd.Series:
+    """Categórico com categorias object (estável no round-trip Arrow e ao unir lotes)."""
+    s = s.astype('category')
+    return s.cat.set_categories(s.cat.categories.astype(object))
+
+def _trecho_std_categorico(trecho: pd.Series) -> pd.Categorical:
+    """normalize_trecho uma vez por TRECHO distinto; devolve categórico alinhado às linhas."""
+    cat = _categorizar(trecho) if not isinstance(trecho.dtype, pd.CategoricalDtype) else trecho
+    std = pd.Index(cat.cat.categories.map(normalize_trecho), dtype=object)
+    codigos_std, uniq = pd.factorize(std)
+    cod = cat.cat.codes.to_numpy()
+    novos = np.where(cod >= 0, codigos_std[cod] if len(codigos_std) else -1, -1)
+    return pd.Categorical.from_codes(novos, categories=pd.Index(uniq))
+
+def _regiao_categorica(trecho_std: pd.Series) -> pd.Categorical:
+    """REGIAO de cada linha pela dimensão de rotas (consultada uma vez por TRECHO_STD distinto)."""
+    cat = trecho_std if isinstance(trecho_std.dtype, pd.CategoricalDtype) else _categorizar(trecho_std)
+    reg = tabela_rotas(cat.cat.categories)['REGIAO'].cat.codes.to_numpy()
+    cod = np.append(reg, np.int8(-1))[cat.cat.codes.to_numpy()]
+    return pd.Categorical.from_codes(cod, categories=REGIOES)
+
+def _compactar_ofertas(df: pd.DataFrame) -> pd.DataFrame:
+    """Esquema compacto: categorias nas colunas de texto, inteiros pequenos em ADVP/RANKING e Preço float32."""
+    for c in COLUNAS_CATEGORIA:
+        if c in df.columns: df[c]=_categorizar(df[c])
+    for c in ['ADVP','RANKING']:
+        if c in df.columns: df[c]=_menor_inteiro(df[c])
+    if 'Preço' in df.columns: df['Preço']=pd.to_numeric(df['Preço'], errors='coerce').astype('float32')
+    if 'TRECHO' in df.columns:
+        df['TRECHO_STD']=_trecho_std_categorico(df['TRECHO'])
+        df['REGIAO']=_regiao_categorica(df['TRECHO_STD'])
+    return df
+
+def _normalizar_ofertas(df: pd.DataFrame, compacto: bool = CARGA_COMPACTA) -> pd.DataFrame:
+    """Renomeia A..M, converte datas/horários/números e calcula TRECHO_STD e REGIAO."""
+    new_cols=list(df.columns)
+    for i,n in enumerate(COLUNAS_OFERTAS): new_cols[i]=n
+    df.columns=new_cols
+
+    falhas = {}
+    for c in COLUNAS_DATA + COLUNAS_HORARIO:
+        if c not in df.columns: continue
+        df[c], falhas[c] = converter_datas(df[c]) if c in COLUNAS_DATA else minutos_do_dia(df[c])
+    df.attrs['falhas_datas'] = {c: n for c, n in falhas.items() if n}
+    if df.attrs['falhas_datas']:
+        log.warning("datas/horários não reconhecidos (ficaram nulos): %s", df.attrs['falhas_datas'])
+
+    if compacto:
+        return _compactar_ofertas(df)
+
+    for c in ['Preço','ADVP','RANKING']:
+        if c in df.columns: df[c]=pd.to_numeric(df[c], errors='coerce')
+
+    if 'TRECHO' in df.columns:
+        df['TRECHO_STD']=df['TRECHO'].map(normalize_trecho)
+        df['REGIAO']=_regiao_categorica(df['TRECHO_STD'])
+    return df
+
+# ==================== CACHE ARROW (MEMORY-MAP) ====================
+# Incrementar sempre que _normalizar_ofertas mudar o esquema/conteúdo gerado.
+VERSAO_ESQUEMA = 3
+# df.attrs (memoria_mb, falhas_datas) vão como JSON nos metadados do schema
+_META_ATTRS = b'ofertas.attrs'
+
+def _assinatura_regioes() -> str:
+    """Digest da tabela de regiões (ordem das regiões = códigos da coluna REGIAO gravada no cache)."""
+    txt = ';'.join(f"{r}:{','.join(sorted(t))}" for r, t in REGIOES_TRECHOS_STD.items())
+    return hashlib.sha1(txt.encode()).hexdigest()[:12]
+
+def _arquivo_cache(caminho: str, compacto: bool) -> str | None:
+    """Arquivo de cache chaveado por caminho + mtime/tamanho + versão do esquema + tabela de regiões."""
+    if not CACHE_DIR or _is_url(caminho) or not os.path.isfile(caminho): return None
+    st_ = os.stat(caminho)
+    origem = hashlib.sha1(os.path.abspath(caminho).encode()).hexdigest()[:12]
+    chave = hashlib.sha1(f"{st_.st_mtime_ns}|{st_.st_size}|{VERSAO_ESQUEMA}|{int(compacto)}|{_assinatura_regioes()}"
+                         .encode()).hexdigest()[:12]
+    # modo (c0/c1) no prefixo: a limpeza de versões antigas não apaga o cache do outro modo
+    return os.path.join(CACHE_DIR, f"ofertas-{origem}-c{int(compacto)}-{chave}.arrow")
+
+def _ler_cache_arrow(arq: str | None) -> pd.DataFrame | None:
+    if not arq or not os.path.exists(arq): return None
+    try:
+        import pyarrow.feather as feather
+        # memory_map: colunas de largura fixa sem nulos ficam apontando para o page cache (compartilhado entre réplicas)
+        tabela = feather.read_table(arq, memory_map=True)
+        df = tabela.to_pandas(split_blocks=True)
+        meta = tabela.schema.metadata or {}
+        if _META_ATTRS in meta: df.attrs.update(json.loads(meta[_META_ATTRS]))
+        return df
+    except Exception as e:
+        log.warning("cache Arrow ilegível (%s): %s", arq, e)
         return None
+
+def _gravar_cache_arrow(df: pd.DataFrame, arq: str | None):
+    if not arq: return
     try:
-        if _is_url(caminho):
-            df = pd.read_parquet(caminho)
+        import pyarrow as pa, pyarrow.feather as feather
+        os.makedirs(os.path.dirname(arq), exist_ok=True)
+        tmp = f"{arq}.{os.getpid()}.tmp"
+        tabela = pa.Table.from_pandas(df)
+        tabela = tabela.replace_schema_metadata({**(tabela.schema.metadata or {}),
+                                                 _META_ATTRS: json.dumps(df.attrs, default=int).encode()})
+        feather.write_feather(tabela, tmp, compression='uncompressed')
+        os.replace(tmp, arq)  # atômico: outras réplicas nunca veem arquivo pela metade
+        prefixo = arq.rsplit('-', 1)[0]
+        for velho in glob.glob(f"{prefixo}-*.arrow"):
+            if velho != arq:
+                try: os.remove(velho)
+                except OSError: pass
+    except Exception as e:
+        log.warning("não foi possível gravar o cache Arrow (%s): %s", arq, e)
+
+# ==================== BASE COMPARTILHADA (SOMENTE LEITURA) ====================
+def _somente_leitura(*_a, **_k):
+    raise TypeError("A base de ofertas é compartilhada entre sessões e é somente leitura; "
+                    "trabalhe sobre um recorte (df[mascara]) ou df.assign(...).")
+
+class _IndexadorSomenteLeitura:
+    def __init__(self, ix): self._ix = ix
+    def __getitem__(self, key): return self._ix[key]
+    __setitem__ = _somente_leitura
+
+class OfertasCompartilhadas(pd.DataFrame):
+    """DataFrame único (st.cache_resource) lido por todas as sessões/páginas.
+
+    Escrita in-place levanta TypeError; recortes e derivações voltam como DataFrame comum
+    e, com copy-on-write, só materializam o que for de fato alterado.
+    """
+    _INPLACE = ('drop','dropna','fillna','rename','replace','reset_index','set_index',
+                'sort_values','sort_index','query','eval','where','mask','clip','interpolate','bfill','ffill')
+    # publicação a que o frame pertence (BaseOfertas._publicar); declarada para o pandas não tratá-la como coluna
+    _publicacao = None
+
+    @property
+    def _constructor(self): return pd.DataFrame
+
+    __setitem__ = __delitem__ = insert = pop = update = _somente_leitura
+
+    def __setattr__(self, name, value):
+        if not name.startswith('_') and name in getattr(self, 'columns', ()): _somente_leitura()
+        super().__setattr__(name, value)
+
+    @property
+    def loc(self): return _IndexadorSomenteLeitura(super().loc)
+    @property
+    def iloc(self): return _IndexadorSomenteLeitura(super().iloc)
+    @property
+    def at(self): return _IndexadorSomenteLeitura(super().at)
+    @property
+    def iat(self): return _IndexadorSomenteLeitura(super().iat)
+
+def _bloquear_inplace(nome):
+    original = getattr(pd.DataFrame, nome)
+    def metodo(self, *a, **k):
+        if k.get('inplace'): _somente_leitura()
+        return original(self, *a, **k)
+    metodo.__name__ = nome; metodo.__doc__ = original.__doc__
+    return metodo
+
+for _nome in OfertasCompartilhadas._INPLACE:
+    setattr(OfertasCompartilhadas, _nome, _bloquear_inplace(_nome))
+
+def congelar_ofertas(df: pd.DataFrame) -> OfertasCompartilhadas:
+    """Embrulha a base normalizada sem copiar os dados."""
+    out = OfertasCompartilhadas(df, copy=False)
+    out.attrs.update(df.attrs)
+    return out
+
+def _ler_lote(caminho: str, compacto: bool) -> pd.DataFrame:
+    """Lê e normaliza um arquivo (via cache Arrow quando possível)."""
+    arq_cache = _arquivo_cache(caminho, compacto)
+    df = _ler_cache_arrow(arq_cache)
+    if df is not None:
+        log.info("carregar_dados(%s): cache Arrow %s, %d linhas, %.1f MB", caminho, arq_cache, len(df), _mem_mb(df))
+        return df
+
+    df = pd.read_parquet(caminho)
+    if df.shape[1] < len(COLUNAS_OFERTAS):
+        raise ValueError(f"O arquivo tem {df.shape[1]} colunas, esperado ≥ {len(COLUNAS_OFERTAS)} (A..M).")
+
+    mem_antes = _mem_mb(df)
+    df = _normalizar_ofertas(df, compacto)
+    mem_depois = _mem_mb(df)
+    df.attrs['memoria_mb'] = {'antes': round(mem_antes, 1), 'depois': round(mem_depois, 1)}
+    log.info("carregar_dados(%s, compacto=%s): %d linhas, memória %.1f MB -> %.1f MB",
+             caminho, compacto, len(df), mem_antes, mem_depois)
+    _gravar_cache_arrow(df, arq_cache)
+    return df
+
+def _concatenar_ofertas(frames: list) -> pd.DataFrame:
+    """Concatena lotes; categóricos via union_categoricals (códigos antigos preservados)."""
+    frames = [f for f in frames if f is not None and len(f.columns)]
+    if len(frames) == 1: return frames[0]
+    cols = {}
+    for c in frames[0].columns:
+        partes = [f[c] for f in frames if c in f.columns]
+        if len(partes) == len(frames) and all(isinstance(p.dtype, pd.CategoricalDtype) for p in partes):
+            cols[c] = union_categoricals(partes, sort_categories=False)
         else:
-            if not os.path.exists(caminho):
-                st.error(f"Arquivo não encontrado: {caminho}")
-                return None
-            df = pd.read_parquet(caminho)
-
-        expected=['Nome do Arquivo','Companhia Aérea','Horário1','Horário2','Horário3','Tipo de Voo','Data do Voo','Data/Hora da Busca','Agência/Companhia','Preço','TRECHO','ADVP','RANKING']
-        if df.shape[1] < len(expected):
-            st.error(f"O arquivo tem {df.shape[1]} colunas, esperado ≥ {len(expected)} (A..M).")
-            return None
-        new_cols=list(df.columns)
-        for i,n in enumerate(expected): new_cols[i]=n
-        df.columns=new_cols
-
-        for c in ['Data/Hora da Busca','Data do Voo','Horário1','Horário2','Horário3']:
-            if c in df.columns and not pd.api.types.is_datetime64_any_dtype(df[c]):
-                df[c]=pd.to_datetime(df[c], errors='coerce', dayfirst=True)
-            elif c in df.columns:
-                df[c]=pd.to_datetime(df[c], errors='coerce')
-
-        for c in ['Preço','ADVP','RANKING']:
-            if c in df.columns: df[c]=pd.to_numeric(df[c], errors='coerce')
-
-        if 'TRECHO' in df.columns: df['TRECHO_STD']=df['TRECHO'].map(normalize_trecho)
+            cols[c] = pd.concat(partes, ignore_index=True)
+    return pd.DataFrame(cols)
+
+# Estruturas derivadas da base (índices, cubos, catálogos...). Cada uma declara como
+# construir do zero e, opcionalmente, como anexar um lote novo sem reprocessar o histórico.
+_DERIVADOS = {}
+
+def registrar_derivado(nome: str, construir, anexar=None):
+    """construir(df) -> obj; anexar(obj, df_novo, df_total) -> obj."""
+    _DERIVADOS[nome] = (construir, anexar)
+
+class PublicacaoOfertas:
+    """Uma versão publicada da base: o frame, o token de versão e as estruturas derivadas *desse* frame.
+
+    Vai pendurada no próprio frame (df._publicacao) e é trocada inteira a cada atualização, então quem
+    ainda segura o frame anterior continua resolvendo índices, cubos e chaves de cache pela versão dele.
+    Guarda o frame por weakref (o frame é que a mantém viva).
+    """
+    def __init__(self, df: 'OfertasCompartilhadas', versao: tuple, derivados: dict | None = None):
+        self._df = weakref.ref(df)
+        self.versao = versao                  # (caminho, compacto, n)
+        self._derivados = dict(derivados or {})
+        self._lock = threading.Lock()
+
+    def derivados(self) -> dict:
+        with self._lock: return dict(self._derivados)
+
+    def derivado(self, nome: str):
+        """Estrutura derivada desta versão (construída sob demanda e reaproveitada)."""
+        obj = self._derivados.get(nome)
+        if obj is None:
+            with self._lock:
+                obj = self._derivados.get(nome)
+                if obj is None:
+                    obj = self._derivados[nome] = _DERIVADOS[nome][0](self._df())
+        return obj
+
+class BaseOfertas:
+    """Estado compartilhado (st.cache_resource) de uma fonte de ofertas.
+
+    Fonte = arquivo único ou diretório de lotes .parquet. No modo diretório cada lote novo
+    é lido/normalizado uma vez e anexado; as estruturas derivadas já construídas são
+    atualizadas só com as linhas novas. `versao` muda a cada alteração da base; frame e derivados de
+    cada versão saem juntos numa PublicacaoOfertas.
+    """
+
+    def __init__(self, caminho: str, compacto: bool):
+        self.caminho, self.compacto = caminho, compacto
+        self.df = None
+        self.erro = None
+        self.versao = 0
+        self.lotes = {}          # arquivo -> mtime_ns
+        self.nomes = set()       # 'Nome do Arquivo' já ingeridos
+        self._verificado_em = 0.0
+        self._lock = threading.Lock()
+
+    def _arquivos(self) -> dict:
+        if _is_url(self.caminho): return {self.caminho: 0}
+        if os.path.isdir(self.caminho):
+            arqs = sorted(glob.glob(os.path.join(self.caminho, '*.parquet')))
+        else:
+            arqs = [self.caminho] if os.path.exists(self.caminho) else []
+        return {a: os.stat(a).st_mtime_ns for a in arqs}
+
+    def atualizar(self, forcar: bool = False) -> bool:
+        """Ingere lotes novos (no máximo a cada INTERVALO_ATUALIZACAO s). True se a base mudou."""
+        agora = time.monotonic()
+        if not forcar and (self.df is not None or self.erro) and agora - self._verificado_em < INTERVALO_ATUALIZACAO:
+            return False
+        if _is_url(self.caminho) and self.df is not None:
+            return False
+        with self._lock:
+            self._verificado_em = agora
+            try:
+                arqs = self._arquivos()
+                if not arqs:
+                    self.erro = f"Arquivo não encontrado: {self.caminho}"
+                    return False
+                alterados = [a for a in self.lotes if arqs.get(a) != self.lotes[a]]
+                if alterados or self.df is None:
+                    return self._recarregar(arqs)
+                novos = [a for a in arqs if a not in self.lotes]
+                return self._anexar(novos, arqs) if novos else False
+            except Exception as e:
+                self.erro = f"Erro ao carregar o arquivo: {e}"
+                log.exception("falha ao atualizar %s", self.caminho)
+                return False
+
+    def _sem_repetidos(self, df: pd.DataFrame) -> pd.DataFrame:
+        if 'Nome do Arquivo' not in df.columns or not self.nomes: return df
+        rep = df['Nome do Arquivo'].isin(self.nomes).to_numpy()
+        return df[~rep].reset_index(drop=True) if rep.any() else df
+
+    def _registrar_nomes(self, df: pd.DataFrame):
+        if 'Nome do Arquivo' in df.columns:
+            self.nomes.update(df['Nome do Arquivo'].dropna().unique())
+
+    def _recarregar(self, arqs: dict) -> bool:
+        self.nomes = set()
+        frames = []
+        for a in arqs:
+            f = self._sem_repetidos(_ler_lote(a, self.compacto))
+            self._registrar_nomes(f); frames.append(f)
+        df = _concatenar_ofertas(frames)
+        self.lotes = dict(arqs)
+        self._publicar(df)
+        return True
+
+    def _anexar(self, novos: list, arqs: dict) -> bool:
+        frames = []
+        for a in novos:
+            f = self._sem_repetidos(_ler_lote(a, self.compacto))
+            self._registrar_nomes(f); frames.append(f)
+            self.lotes[a] = arqs[a]
+        frames = [f for f in frames if len(f)]
+        if not frames: return False
+        df_novo = _concatenar_ofertas(frames)
+        df_total = _concatenar_ofertas([self.df, df_novo])
+        derivados = {}
+        for nome, obj in self._derivados.items():
+            anexar = _DERIVADOS.get(nome, (None, None))[1]
+            if anexar is not None:
+                derivados[nome] = anexar(obj, df_novo, df_total)
+        log.info("carregar_dados(%s): +%d lotes, +%d linhas (total %d)", self.caminho, len(novos), len(df_novo), len(df_total))
+        self._publicar(df_total, derivados)
+        return True
+
+    def _publicar(self, df: pd.DataFrame, derivados: dict | None = None):
+        """Frame, versão e derivados trocam juntos (uma atribuição), nunca um sem os outros."""
+        self.versao += 1
+        out = congelar_ofertas(df)
+        out._publicacao = PublicacaoOfertas(out, (self.caminho, self.compacto, self.versao), derivados)
+        self.df, self.erro = out, None
+
+    @property
+    def _derivados(self) -> dict:
+        return self.df._publicacao.derivados() if self.df is not None else {}
+
+    def derivado(self, nome: str):
+        """Estrutura derivada da versão atual (as páginas usam base_de(df).derivado, pela versão do frame)."""
+        return self.df._publicacao.derivado(nome)
+
+def base_de(df) -> 'PublicacaoOfertas | None':
+    """Publicação (frame + versão + derivados) a que o frame compartilhado pertence (None para recortes/frames avulsos)."""
+    return df._publicacao if isinstance(df, OfertasCompartilhadas) else None
+
+# ==================== DATASET PARTICIONADO (PUSHDOWN) ====================
+# Diretório hive (ex.: DATA_BUSCA=2025-08-04/REGIAO=SUL/*.parquet): os filtros da sidebar
+# viram expressões pyarrow.dataset e só as partições/row groups necessários são lidos.
+PARTICAO_DATA, PARTICAO_REGIAO = 'DATA_BUSCA', 'REGIAO'
+
+def _eh_particionado(caminho: str) -> bool:
+    if _is_url(caminho) or not os.path.isdir(caminho): return False
+    return any('=' in d.name for d in os.scandir(caminho) if d.is_dir())
+
+class DatasetParticionado:
+    """Fonte particionada lida sob demanda: facetas por varredura de poucas colunas e
+    recortes filtrados com predicate pushdown (cacheados por filtro e versão)."""
+
+    MAX_RECORTES = 8
+
+    def __init__(self, caminho: str, compacto: bool):
+        import pyarrow.dataset as ds
+        self.caminho, self.compacto = caminho, compacto
+        self.dataset = ds.dataset(caminho, format='parquet', partitioning='hive')
+        nomes = self.dataset.schema.names
+        if len(nomes) < len(COLUNAS_OFERTAS):
+            raise ValueError(f"O dataset tem {len(nomes)} colunas, esperado ≥ {len(COLUNAS_OFERTAS)} (A..M).")
+        self.fisico = dict(zip(COLUNAS_OFERTAS, nomes))   # nome lógico -> nome físico (posicional)
+        self.particoes = [n for n in (PARTICAO_DATA, PARTICAO_REGIAO) if n in nomes and n not in self.fisico.values()]
+        self.erro = None
+        self.versao = 1
+        self._assinatura = self._assinar()
+        self._verificado_em = time.monotonic()
+        self._facetas = self._catalogo = None
+        self._recortes = {}
+        self._lock = threading.Lock()
+
+    empty = property(lambda self: False)
+    columns = property(lambda self: pd.Index(list(self.fisico) + ['TRECHO_STD', 'REGIAO']))
+
+    def _assinar(self):
+        return tuple(sorted((f, os.stat(f).st_mtime_ns) for f in self.dataset.files))
+
+    def atualizar(self, forcar: bool = False) -> bool:
+        agora = time.monotonic()
+        if not forcar and agora - self._verificado_em < INTERVALO_ATUALIZACAO: return False
+        import pyarrow.dataset as ds
+        with self._lock:
+            self._verificado_em = agora
+            novo = ds.dataset(self.caminho, format='parquet', partitioning='hive')
+            self.dataset, velho = novo, self._assinatura
+            self._assinatura = self._assinar()
+            if self._assinatura == velho: return False
+            self.versao += 1
+            self._facetas, self._catalogo, self._recortes = None, None, {}
+            return True
+
+    # ---- facetas (sidebar/rodapé) ----
+    def _tabela_facetas(self) -> pd.DataFrame:
+        """TRECHO × Agência com limites de ADVP/data, agregados lote a lote (sem carregar a base).
+        A data da busca é convertida (converter_datas) antes de agregar: mín/máx comparam datas, não texto.
+        attrs['buscas']: buscas distintas ('Nome do Arquivo') por região, como CatalogoFacetas.contar_buscas."""
+        if self._facetas is None:
+            import pyarrow as pa
+            import pyarrow.compute as pc
+            f = self.fisico
+            cols = [f['TRECHO'], f['Agência/Companhia'], f['ADVP'], f['Data/Hora da Busca']]
+            partes, pares = [], []
+            for lote in self.dataset.to_batches(columns=cols + [f['Nome do Arquivo']]):
+                t = pa.Table.from_batches([lote])
+                if not pa.types.is_timestamp(t.schema.field(cols[3]).type):
+                    datas, _ = converter_datas(t.column(cols[3]).to_pandas())
+                    t = t.set_column(t.schema.get_field_index(cols[3]), cols[3], pa.array(datas, pa.timestamp('ns')))
+                # (busca, TRECHO) distintos do lote: a região sai do TRECHO depois, uma vez por trecho
+                pares.append(t.group_by([f['Nome do Arquivo'], cols[0]]).aggregate([]).to_pandas())
+                partes.append(t.select(cols).group_by(cols[:2]).aggregate(
+                    [(cols[2], 'min'), (cols[2], 'max'), (cols[3], 'min'), (cols[3], 'max'), (cols[2], 'count', pc.CountOptions(mode='all'))]).to_pandas())
+            fac = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=cols[:2])
+            fac.columns = ['TRECHO', 'Agência/Companhia', 'advp_min', 'advp_max', 'dt_min', 'dt_max', 'n'][:len(fac.columns)]
+            buscas = {'Todas': 0}
+            if not fac.empty:
+                fac = fac.groupby(['TRECHO', 'Agência/Companhia'], as_index=False).agg(
+                    advp_min=('advp_min', 'min'), advp_max=('advp_max', 'max'),
+                    dt_min=('dt_min', 'min'), dt_max=('dt_max', 'max'), n=('n', 'sum'))
+                fac['TRECHO_STD'] = fac['TRECHO'].map(normalize_trecho)
+                fac['REGIAO'] = _regiao_categorica(fac['TRECHO_STD'])
+                pares = pd.concat(pares, ignore_index=True)
+                pares.columns = ['Nome do Arquivo', 'TRECHO']
+                regiao = fac.drop_duplicates('TRECHO').set_index('TRECHO')['REGIAO']
+                buscas = CatalogoFacetas._contar(pares['Nome do Arquivo'], pares['TRECHO'].map(regiao))
+            fac.attrs['buscas'] = buscas
+            self._facetas = fac
+        return self._facetas
+
+    def catalogo(self) -> 'CatalogoFacetas':
+        if self._catalogo is None:
+            fac = self._tabela_facetas()
+            self._catalogo = CatalogoFacetas(tabela=fac, buscas=fac.attrs.get('buscas', {'Todas': 0}))
+        return self._catalogo
+
+    def facetas(self, regiao_sel: str) -> dict:
+        return self.catalogo()[regiao_sel]
+
+    def resumo(self) -> dict:
+        return self.catalogo()['Todas']
+
+    # ---- leitura com pushdown ----
+    def _expressao(self, regiao_sel, datas_sel, trecho_sel, advp_valor, advp_range):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        f, sch = self.fisico, self.dataset.schema
+        cond = []
+        if len(datas_sel) == 2:
+            sd, ed = pd.to_datetime(datas_sel[0]).normalize(), pd.to_datetime(datas_sel[1]).normalize()
+            if PARTICAO_DATA in self.particoes:
+                tp = sch.field(PARTICAO_DATA).type
+                lo, hi = ((sd.date().isoformat(), ed.date().isoformat()) if pa.types.is_string(tp)
+                          else (pa.scalar(sd.date(), tp), pa.scalar(ed.date(), tp)))
+                cond.append((ds.field(PARTICAO_DATA) >= lo) & (ds.field(PARTICAO_DATA) <= hi))
+            tb = sch.field(f['Data/Hora da Busca']).type
+            if pa.types.is_timestamp(tb):
+                campo = ds.field(f['Data/Hora da Busca'])
+                cond.append((campo >= pa.scalar(sd.to_pydatetime(), tb)) & (campo < pa.scalar((ed + timedelta(days=1)).to_pydatetime(), tb)))
+        if advp_valor != 'Todos':
+            cond.append(ds.field(f['ADVP']) == advp_valor)
+        else:
+            cond.append((ds.field(f['ADVP']) >= advp_range[0]) & (ds.field(f['ADVP']) <= advp_range[1]))
+        if trecho_sel != 'Todos os Trechos':
+            cond.append(ds.field(f['TRECHO']) == trecho_sel)
+        if regiao_sel != 'Todas':
+            if PARTICAO_REGIAO in self.particoes:
+                cond.append(ds.field(PARTICAO_REGIAO) == regiao_sel)
+            fac = self._tabela_facetas()
+            brutos = fac.loc[fac['REGIAO'] == regiao_sel, 'TRECHO'].unique().tolist() if not fac.empty else []
+            cond.append(ds.field(f['TRECHO']).isin(brutos))
+        expr = None
+        for c in cond: expr = c if expr is None else (expr & c)
+        return expr
+
+    def ler(self, regiao_sel, datas_sel, trecho_sel, advp_valor, advp_range) -> pd.DataFrame:
+        """Recorte normalizado (equivale a df_regiao já restrito por data/ADVP/trecho)."""
+        chave = (self.versao, regiao_sel, tuple(str(d) for d in datas_sel), trecho_sel, advp_valor, tuple(advp_range))
+        df = self._recortes.get(chave)
+        if df is not None: return df
+        tabela = self.dataset.to_table(filter=self._expressao(regiao_sel, datas_sel, trecho_sel, advp_valor, advp_range))
+        if self.particoes: tabela = tabela.drop(self.particoes)
+        df = _normalizar_ofertas(tabela.to_pandas(), self.compacto)
+        with self._lock:
+            if len(self._recortes) >= self.MAX_RECORTES: self._recortes.pop(next(iter(self._recortes)))
+            self._recortes[chave] = df
+        log.info("dataset particionado %s: %d linhas lidas para %s", self.caminho, len(df), chave[1:])
         return df
 
-    except Exception as e:
-        st.error(f"Erro ao carregar o arquivo: {e}")
+def abrir_fonte(caminho: str, compacto: bool = CARGA_COMPACTA):
+    """BaseOfertas (já carregada) ou DatasetParticionado para o caminho, sem cache de sessão nem mensagens
+    na tela — erros ficam em .erro. carregar_dados guarda uma instância por caminho em st.cache_resource."""
+    marcar_cache(False)
+    if _eh_particionado(caminho):
+        try:
+            fonte = _FONTES[(caminho, compacto)] = DatasetParticionado(caminho, compacto)
+            return fonte
+        except Exception as e:
+            log.exception("falha ao abrir dataset particionado %s", caminho)
+            base = BaseOfertas(caminho, compacto); base.erro = f"Erro ao carregar o arquivo: {e}"
+            return base
+    base = _FONTES[(caminho, compacto)] = BaseOfertas(caminho, compacto)
+    base.atualizar(forcar=True)
+    return base
+
+_obter_base = st.cache_resource(show_spinner="Carregando ofertas...")(abrir_fonte)
+
+def carregar_dados(caminho: str | None, compacto: bool = CARGA_COMPACTA):
+    """Base de ofertas compartilhada. PARQUET_PATH pode ser um arquivo, um diretório de lotes
+    ou um diretório particionado (hive) — neste caso volta um DatasetParticionado lido sob demanda."""
+    iniciar_medicao()
+    if not caminho:
+        st.error("Caminho do arquivo não definido. Configure PARQUET_PATH (secret/env) ou coloque data/OFERTAS.parquet no repo.")
         return None
+    with etapa('carga', 'carregar_dados') as e:
+        base = _obter_base(caminho, compacto)
+        if e.cache is None: e.cache = 'acerto'
+        base.atualizar()
+        if isinstance(base, BaseOfertas) and base.df is not None: e.linhas = len(base.df)
+    if isinstance(base, DatasetParticionado):
+        return base
+    if base.df is None:
+        st.error(base.erro or f"Arquivo não encontrado: {caminho}")
+        return None
+    return base.df
 
 # ==================== FILTROS (REUTILIZÁVEIS) ====================
-def get_sidebar_filters(df):
-    st.sidebar.header("Filtros")
-    st.sidebar.subheader("Filtro por Região")
+def agrupar_123(s: pd.Series) -> pd.Series:
+    """123MILHAS/MAXMILHAS -> Grupo123; em colunas categóricas remapeia só as categorias."""
+    if not isinstance(s.dtype, pd.CategoricalDtype):
+        return s.replace(GRUPO123, 'Grupo123')
+    cats = s.cat.categories
+    novas = pd.Index(cats.where(~cats.isin(GRUPO123), 'Grupo123'))
+    cod_novo, uniq = pd.factorize(novas)
+    cod = s.cat.codes.to_numpy()
+    cod = np.where(cod >= 0, cod_novo[cod] if len(cod_novo) else -1, -1)
+    return pd.Series(pd.Categorical.from_codes(cod, categories=uniq), index=s.index, name=s.name)
+
+# ==================== ÍNDICE DE FILTROS ====================
+def _codigos_regiao(trechos) -> np.ndarray:
+    """Posição em REGIOES da região de cada TRECHO bruto (-1 = sem região)."""
+    return np.array([_REGIAO_DA_ROTA.get(normalize_trecho(t), -1) for t in trechos], dtype=np.int8)
+
+class IndiceFiltros:
+    """Arrays alinhados às linhas (códigos de agência/trecho, dia da busca em int, ADVP) para
+    combinar todos os filtros da sidebar numa única máscara NumPy, sem frames intermediários.
+
+    Condições sobre agência, trecho e região viram tabelas booleanas por categoria
+    (poucas dezenas de itens) indexadas pelos códigos; o código -1 (nulo) cai sempre em False.
+    """
+    SEM_VALOR = np.iinfo(np.int32).min
+
+    def __init__(self, df: pd.DataFrame):
+        ag = df['Agência/Companhia']; tr = df['TRECHO']
+        ag = ag if isinstance(ag.dtype, pd.CategoricalDtype) else _categorizar(ag)
+        tr = tr if isinstance(tr.dtype, pd.CategoricalDtype) else _categorizar(tr)
+        self.agencias, self.trechos = ag.cat.categories, tr.cat.categories
+        self.ag = ag.cat.codes.to_numpy()
+        self.tr = tr.cat.codes.to_numpy()
+        self.dia = self._dias(df['Data/Hora da Busca'])
+        self.advp = self._inteiros(df['ADVP'])
+        self._tabela_regioes()
+
+    @classmethod
+    def _dias(cls, s: pd.Series) -> np.ndarray:
+        d = s.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]').astype('int64')
+        d[d == np.iinfo(np.int64).min] = cls.SEM_VALOR
+        return d.astype(np.int32)
+
+    @classmethod
+    def _inteiros(cls, s: pd.Series) -> np.ndarray:
+        v = s.to_numpy(dtype='float64', na_value=np.nan)
+        return np.where(np.isnan(v), cls.SEM_VALOR, v).astype(np.int32)
+
+    def _tabela_regioes(self):
+        self.regiao_trecho = np.append(_codigos_regiao(self.trechos), np.int8(-1))
+
+    @staticmethod
+    def _recodificar(categorias: pd.Index, s: pd.Series) -> tuple[pd.Index, np.ndarray]:
+        """Categorias antigas + as novas de `s` no fim (códigos antigos continuam válidos) e os códigos de `s` nelas."""
+        valores = s.cat.categories if isinstance(s.dtype, pd.CategoricalDtype) else pd.Index(s.dropna().unique())
+        novas = valores[~valores.isin(categorias)]
+        if len(novas): categorias = categorias.append(pd.Index(novas, dtype=object))
+        return categorias, pd.Categorical(s, categories=categorias).codes
+
+    def anexar(self, df_novo: pd.DataFrame, df_total: pd.DataFrame) -> 'IndiceFiltros':
+        """Estende os arrays com as linhas novas. O lote é codificado contra as categorias já existentes
+        (as que ele traz de novo entram no fim), então os códigos antigos seguem válidos nas duas cargas."""
+        lote = df_total.iloc[len(self.ag):]
+        novo = object.__new__(IndiceFiltros)
+        novo.agencias, ag = self._recodificar(self.agencias, lote['Agência/Companhia'])
+        novo.trechos, tr = self._recodificar(self.trechos, lote['TRECHO'])
+        novo.ag, novo.tr = np.concatenate([self.ag, ag]), np.concatenate([self.tr, tr])   # int8 -> int16 se precisar
+        novo.dia = np.concatenate([self.dia, self._dias(lote['Data/Hora da Busca'])])
+        novo.advp = np.concatenate([self.advp, self._inteiros(lote['ADVP'])])
+        novo._tabela_regioes()
+        return novo
+
+    def __len__(self): return len(self.ag)
+
+    @staticmethod
+    def _por_codigo(ok: np.ndarray, codigos: np.ndarray) -> np.ndarray:
+        return np.append(ok, False)[codigos]
+
+    def mascara_regiao(self, regiao_sel: str):
+        if regiao_sel == 'Todas': return None
+        cod = REGIOES.index(regiao_sel)
+        return (self.regiao_trecho == cod)[self.tr]
+
+    def mascara(self, regiao_sel='Todas', tipo_agencia_filtro='Geral', agencias=None, grupo123=False,
+                advp_valor='Todos', advp_range=None, datas_sel=(), trecho_sel='Todos os Trechos') -> np.ndarray:
+        nomes = self.agencias
+        ok = np.ones(len(nomes), dtype=bool)
+        if tipo_agencia_filtro == 'Agências': ok &= ~nomes.isin(cias_padrao)
+        elif tipo_agencia_filtro == 'Cias': ok &= nomes.isin(cias_padrao + GRUPO123)
+        if agencias is not None:
+            # a lista é comparada com o nome já agrupado (Grupo123), como no fluxo por linhas
+            pos = nomes.where(~nomes.isin(GRUPO123), 'Grupo123') if grupo123 else nomes
+            ok &= pos.isin(list(agencias))
+        m = self._por_codigo(ok, self.ag)
+
+        if regiao_sel != 'Todas' or trecho_sel != 'Todos os Trechos':
+            okt = np.ones(len(self.trechos), dtype=bool)
+            if regiao_sel != 'Todas': okt &= self.regiao_trecho[:-1] == REGIOES.index(regiao_sel)
+            if trecho_sel != 'Todos os Trechos': okt &= self.trechos == trecho_sel
+            m &= self._por_codigo(okt, self.tr)
+
+        if advp_valor != 'Todos': m &= self.advp == int(advp_valor)
+        elif advp_range is not None: m &= (self.advp >= advp_range[0]) & (self.advp <= advp_range[1])
+
+        if len(datas_sel) == 2:
+            d0, d1 = (np.datetime64(pd.to_datetime(d).date(), 'D').astype('int64') for d in datas_sel)
+            m &= (self.dia >= d0) & (self.dia <= d1)
+        return m
+
+registrar_derivado('indice', IndiceFiltros, IndiceFiltros.anexar)
+
+def _indice_de(df) -> IndiceFiltros:
+    base = base_de(df)
+    return base.derivado('indice') if base is not None else IndiceFiltros(df)
+
+def _recortar(df, mascara) -> pd.DataFrame:
+    """Único ponto em que o recorte é materializado."""
+    return df if mascara is None else df.take(np.flatnonzero(mascara))
+
+# ==================== CACHE DE RECORTES (LRU) ====================
+class CacheRecortes:
+    """LRU limitado em bytes de posições (np.int32/int64) de linhas filtradas, por
+    (versão da base, filtros normalizados). Guarda só os índices; o frame é refeito com um take.
+    Também aceita pequenos agregados (DataFrame/Series, ou dicts deles) calculados sobre um recorte,
+    contados pelo memory_usage."""
+    def __init__(self, limite_bytes: int):
+        self.limite = int(limite_bytes)
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = self.acertos = self.faltas = self.descartes = 0
+
+    @classmethod
+    def _tamanho(cls, obj) -> int:
+        if isinstance(obj, dict): return sum(cls._tamanho(v) for v in obj.values())
+        if isinstance(obj, (pd.DataFrame, pd.Series)): return int(np.sum(obj.memory_usage(deep=True)))
+        return int(getattr(obj, 'nbytes', 64))
+
+    def obter(self, chave, calcular):
+        if chave is None: return calcular()
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None: self._itens.move_to_end(chave); self.acertos += 1
+            else: self.faltas += 1
+        marcar_cache(item is not None)
+        if item is not None: return item[0]
+        pos = calcular()
+        if isinstance(pos, np.ndarray): pos.flags.writeable = False
+        tam = self._tamanho(pos)
+        if tam <= self.limite:
+            with self._lock:
+                if chave not in self._itens:
+                    self._itens[chave] = (pos, tam); self.bytes += tam
+                    while self.bytes > self.limite:
+                        _, (_, t) = self._itens.popitem(last=False)
+                        self.bytes -= t; self.descartes += 1
+        return pos
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear(); self.bytes = 0
+
+    @staticmethod
+    def _rotulo(chave) -> str:
+        """'consulta series_por_periodo Mensal', 'cubo_diario SUL Separado', 'posições Todas timeseries'..."""
+        k0 = chave[0]
+        if not isinstance(k0, tuple): return str(k0)[:80]
+        if k0[:1] == ('consulta',): return ' '.join(map(str, k0))
+        tipo = 'posições' if len(k0) > 1 and isinstance(k0[1], bool) else str(k0[0])
+        return ' '.join([tipo] + [x for x in chave[1:4:2] if isinstance(x, str)])   # + região e modo 123/Max
+
+    def maiores(self, n: int = 10) -> list:
+        with self._lock:
+            itens = sorted(self._itens.items(), key=lambda kv: -kv[1][1])[:n]
+        return [dict(item=self._rotulo(k), kb=round(t / 1024, 1)) for k, (_, t) in itens]
+
+    def estatisticas(self) -> dict:
+        total = self.acertos + self.faltas
+        return dict(itens=len(self._itens), bytes=self.bytes, limite=self.limite, acertos=self.acertos,
+                    faltas=self.faltas, descartes=self.descartes, taxa_acerto=self.acertos / total if total else 0.0)
+
+@st.cache_resource
+def cache_recortes() -> CacheRecortes:
+    """Instância única (todas as sessões/páginas) do cache de recortes."""
+    return CacheRecortes(CACHE_FILTROS_MB * 2**20)
+
+def _versao_de(df):
+    """Token barato da versão dos dados (None = frame avulso, sem cache). Para a base compartilhada é o
+    token que _publicar gravou no frame, não a versão corrente da base: numa atualização concorrente a
+    sessão que ainda está no frame anterior não grava nem lê chaves da versão nova."""
+    if base_de(df) is not None: return base_de(df).versao
+    if isinstance(df, DatasetParticionado): return (df.caminho, df.compacto, 'particionado', df.versao)
+    return None
+
+def _chave_filtros(versao, regiao_sel, tipo_agencia_filtro, config_123_max_filtro, agencias,
+                   trecho_sel, advp_valor, advp_range, datas_sel):
+    """Tupla normalizada (ordem das agências e tipos de data/ADVP não importam)."""
+    if versao is None: return None
+    advp = ('Todos', int(advp_range[0]), int(advp_range[1])) if advp_valor == 'Todos' else int(advp_valor)
+    datas = tuple(pd.Timestamp(d).date().isoformat() for d in datas_sel) if len(datas_sel) == 2 else ()
+    return (versao, regiao_sel, tipo_agencia_filtro, config_123_max_filtro, tuple(sorted(set(agencias))),
+            trecho_sel, advp, datas)
+
+def _posicoes(mascara) -> np.ndarray:
+    pos = np.flatnonzero(mascara)
+    return pos.astype(np.int32) if len(mascara) < 2**31 else pos
+
+@dataclass(frozen=True)
+class FiltroSpec:
+    """Filtros da sidebar como valor simples (imutável e hashable): é o que get_sidebar_filters devolve
+    e o que aplicar_filtros / analytics recebem. Sem widgets; monte à mão ou com especificar_filtros."""
+    regiao_sel: str = 'Todas'
+    tipo_agencia_filtro: str = 'Geral'
+    config_123_max_filtro: str = 'Separado'
+    agencias_principais: tuple = ()
+    agencias_para_analise: tuple = ()
+    trecho_sel: str = 'Todos os Trechos'
+    advp_valor: object = 'Todos'
+    advp_range: tuple = (0, 1)
+    datas_sel: tuple = ()
 
-    regiao_sel=st.sidebar.selectbox("Região", ['Todas']+list(REGIOES_TRECHOS_STD.keys()), index=0)
-    df_regiao=df.copy()
-    if regiao_sel!='Todas':
-        df_regiao=df_regiao[df_regiao['TRECHO_STD'].isin(REGIOES_TRECHOS_STD[regiao_sel])]
+    def chave(self, versao):
+        """Chave normalizada (como _chave_filtros) + agências principais; None para frames avulsos."""
+        k = _chave_filtros(versao, self.regiao_sel, self.tipo_agencia_filtro, self.config_123_max_filtro,
+                           self.agencias_para_analise, self.trecho_sel, self.advp_valor, self.advp_range, self.datas_sel)
+        return None if k is None else k + (tuple(self.agencias_principais),)
 
-    if regiao_sel=='Todas':
-        trechos_disp=sorted(df_regiao['TRECHO'].dropna().unique())
+class _Filtros(dict):
+    """Recorte resolvido de um FiltroSpec (aplicar_filtros); 'df_filtrado' e 'df_regiao' só são materializados
+    se alguém pedir (consultas que respondem pelo cubo diário nunca tocam nas linhas)."""
+    def __missing__(self, chave):
+        if chave == 'df_regiao':
+            v = _recortar(self['_df'], self['_mascara_regiao'])
+        elif chave == 'df_filtrado':
+            v = self['_df'].take(self['_posicoes'])
+            if self['config_123_max_filtro'] == 'Grupo123':
+                v = v.assign(**{'Agência/Companhia': agrupar_123(v['Agência/Companhia'])})
+        else:
+            raise KeyError(chave)
+        self[chave] = v
+        return v
+
+def _facetas_de(df_regiao, regiao_sel) -> dict:
+    """Opções/limites da sidebar: trechos, agências, ADVP e datas presentes no recorte da região."""
+    trechos=sorted(df_regiao['TRECHO'].dropna().unique())
+    if regiao_sel!='Todas' and not trechos: trechos=sorted(list(REGIOES_TRECHOS[regiao_sel]))
+    agencias=sorted(df_regiao['Agência/Companhia'].dropna().unique())
+    if 'advp_min' in df_regiao.columns:   # tabela de facetas (DatasetParticionado)
+        advp=(df_regiao['advp_min'].min(), df_regiao['advp_max'].max())
+        datas=(df_regiao['dt_min'].min(), df_regiao['dt_max'].max())
+    else:
+        advp=(df_regiao['ADVP'].min(), df_regiao['ADVP'].max())
+        datas=(df_regiao['Data/Hora da Busca'].min(), df_regiao['Data/Hora da Busca'].max())
+    advp=(int(advp[0]), int(advp[1])) if pd.notna(advp[0]) and pd.notna(advp[1]) else None
+    datas=(datas[0].date(), datas[1].date()) if pd.notna(datas[0]) and pd.notna(datas[1]) else None
+    return dict(trechos=trechos, agencias=agencias, advp=advp, datas=datas)
+
+# ==================== CATÁLOGO DE FACETAS ====================
+def _agencias_por_tipo(agencias) -> dict:
+    """Opções do seletor de agências para cada valor de 'Filtro de Agências/Cias'."""
+    return {'Geral': list(agencias),
+            'Agências': sorted(a for a in agencias if a not in cias_padrao),
+            'Cias': sorted(cias_padrao + [a for a in GRUPO123 if a in agencias])}
+
+class CatalogoFacetas:
+    """Facetas da sidebar e totais do rodapé por região ('Todas' + REGIOES), montados uma vez por versão.
+
+    A base é uma tabela TRECHO x agência com limites de ADVP/data e contagem de ofertas (a mesma que o
+    DatasetParticionado monta por varredura); as buscas vêm por região. Lotes novos só são agregados e
+    somados à tabela, e cada região vira um dict pronto (trechos, agências por tipo, limites, totais).
+    """
+    def __init__(self, df: pd.DataFrame = None, tabela: pd.DataFrame = None, buscas: dict = None, por_nome: bool = False):
+        if tabela is None:
+            por_nome = 'Nome do Arquivo' in df.columns and bool(df['Nome do Arquivo'].notna().any())
+            tabela, buscas = self.agregar(df), self.contar_buscas(df, por_nome)
+        self.tabela, self.buscas, self.por_nome = tabela, buscas, por_nome
+        self.regioes = {r: self._publicar(r) for r in ['Todas'] + REGIOES}
+
+    def __getitem__(self, regiao_sel: str) -> dict:
+        return self.regioes[regiao_sel]
+
+    @staticmethod
+    def agregar(df: pd.DataFrame) -> pd.DataFrame:
+        g = df.groupby(['TRECHO', 'Agência/Companhia', 'REGIAO'], observed=True, dropna=False, sort=False)
+        return g.agg(advp_min=('ADVP', 'min'), advp_max=('ADVP', 'max'), dt_min=('Data/Hora da Busca', 'min'),
+                     dt_max=('Data/Hora da Busca', 'max'), n=('ADVP', 'size')).reset_index()
+
+    @staticmethod
+    def _contar(chave: pd.Series, regiao: pd.Series) -> dict:
+        por = chave.groupby(regiao, observed=True).nunique()
+        return {'Todas': int(chave.nunique()), **{r: int(n) for r, n in por.items()}}
+
+    @classmethod
+    def contar_buscas(cls, df: pd.DataFrame, por_nome: bool) -> dict:
+        """Buscas por 'Nome do Arquivo' (se existir) senão por timestamp arredondado, como no rodapé."""
+        if por_nome:
+            return cls._contar(df['Nome do Arquivo'], df['REGIAO'])
+        if 'Data/Hora da Busca' in df.columns:
+            return cls._contar(df['Data/Hora da Busca'].dt.floor('min'), df['REGIAO'])
+        return {'Todas': 0}
+
+    def _publicar(self, regiao_sel: str) -> dict:
+        fac = self.tabela
+        if regiao_sel != 'Todas' and not fac.empty:
+            fac = fac[fac['REGIAO'] == regiao_sel]
+        f = _facetas_de(fac, regiao_sel)
+        f['agencias_por_tipo'] = _agencias_por_tipo(f['agencias'])
+        f.update(ultima=fac['dt_max'].max() if not fac.empty else None, buscas=self.buscas.get(regiao_sel, 0),
+                 ofertas=int(fac['n'].sum()) if not fac.empty else 0)
+        return f
+
+    def anexar(self, df_novo: pd.DataFrame, df_total: pd.DataFrame) -> 'CatalogoFacetas':
+        # lotes novos chegam sem 'Nome do Arquivo' repetido (BaseOfertas descarta), então as buscas somam
+        if not self.por_nome or 'Nome do Arquivo' not in df_novo.columns:
+            return CatalogoFacetas(df_total)
+        novo = self._contar(df_novo['Nome do Arquivo'], df_novo['REGIAO'])
+        buscas = {k: v + novo.get(k, 0) for k, v in self.buscas.items()}
+        buscas.update({k: v for k, v in novo.items() if k not in buscas})
+        tab = _concatenar_ofertas([self.tabela, self.agregar(df_novo)])
+        tab = tab.groupby(['TRECHO', 'Agência/Companhia', 'REGIAO'], observed=True, dropna=False, sort=False).agg(
+            advp_min=('advp_min', 'min'), advp_max=('advp_max', 'max'),
+            dt_min=('dt_min', 'min'), dt_max=('dt_max', 'max'), n=('n', 'sum')).reset_index()
+        return CatalogoFacetas(tabela=tab, buscas=buscas, por_nome=True)
+
+registrar_derivado('catalogo', CatalogoFacetas, CatalogoFacetas.anexar)
+
+def _catalogo_de(df) -> CatalogoFacetas:
+    base = base_de(df)
+    return base.derivado('catalogo') if base is not None else CatalogoFacetas(df)
+
+def _facetas_fonte(df, regiao_sel: str) -> dict:
+    """Opções/limites da sidebar para a região: catálogo pronto da versão (nada é varrido a cada rerun)."""
+    return df.facetas(regiao_sel) if isinstance(df, DatasetParticionado) else _catalogo_de(df)[regiao_sel]
+
+def _limites_advp(fac) -> tuple:
+    advp_min, advp_max = fac['advp'] if fac['advp'] is not None else (0, 1)
+    return advp_min, advp_max, ((advp_min, advp_max) if advp_min < advp_max else (advp_min, advp_min + 1))
+
+def _limites_datas(fac) -> tuple:
+    return fac['datas'] if fac['datas'] is not None else (datetime.now().date(),) * 2
+
+def _inicio_periodo(periodo: str, dmin, dmax):
+    dias = {'Últimos 7 dias': 7, 'Últimos 15 dias': 15, 'Últimos 30 dias': 30}.get(periodo)
+    return max(dmax - timedelta(days=dias), dmin) if dias else dmin
+
+def _agencias_analise(todas, principais, concorrentes) -> tuple[list, list]:
+    """(opções de concorrentes, agências em análise); 'Todos' = todas as que não são principais."""
+    pool = [a for a in todas if a not in principais]
+    return pool, list(principais) + (pool if 'Todos' in concorrentes else list(concorrentes))
+
+def especificar_filtros(df, regiao_sel='Todas', config_123_max_filtro='Separado', tipo_agencia_filtro='Geral',
+                        agencias_principais=None, agencias_concorrentes=('Todos',), trecho_sel='Todos os Trechos',
+                        advp_valor='Todos', advp_range=None, periodo='Últimos 7 dias', datas_sel=None) -> FiltroSpec:
+    """FiltroSpec com os mesmos padrões da sidebar (o que não for informado sai como na primeira abertura)."""
+    fac = _facetas_fonte(df, regiao_sel)
+    todas = fac['agencias_por_tipo'][tipo_agencia_filtro]
+    if agencias_principais is None: agencias_principais = [x for x in GRUPO123 if x in todas]
+    _, analise = _agencias_analise(todas, agencias_principais, agencias_concorrentes)
+    if datas_sel is None:
+        dmin, dmax = _limites_datas(fac)
+        datas_sel = (_inicio_periodo(periodo, dmin, dmax), dmax)
+    return FiltroSpec(regiao_sel, tipo_agencia_filtro, config_123_max_filtro, tuple(agencias_principais), tuple(analise),
+                      trecho_sel, advp_valor, tuple(advp_range or _limites_advp(fac)[2]), tuple(datas_sel))
+
+@medido('filtros', linhas=lambda f: len(f['_posicoes']))
+def aplicar_filtros(df, spec: FiltroSpec) -> _Filtros:
+    """Recorte de `spec` sobre a base: todos os filtros numa máscara só (posições reaproveitadas entre
+    páginas/sessões no cache LRU); df_filtrado sai de um único take, só quando pedido."""
+    versao=_versao_de(df)
+    if isinstance(df, DatasetParticionado):
+        # só as partições/row groups do intervalo, ADVP, trecho e região selecionados são lidos
+        df=df.ler(spec.regiao_sel, spec.datas_sel, spec.trecho_sel, spec.advp_valor, spec.advp_range)
+        idx,m_regiao=_indice_de(df),None
     else:
-        std_set=REGIOES_TRECHOS_STD[regiao_sel]
-        trechos_disp=sorted(df_regiao.loc[df_regiao['TRECHO_STD'].isin(std_set),'TRECHO'].dropna().unique())
-        if not trechos_disp: trechos_disp=sorted(list(REGIOES_TRECHOS[regiao_sel]))
+        idx=_indice_de(df)
+        m_regiao=idx.mascara_regiao(spec.regiao_sel)
+    chave=_chave_filtros(versao, spec.regiao_sel, spec.tipo_agencia_filtro, spec.config_123_max_filtro,
+                         spec.agencias_para_analise, spec.trecho_sel, spec.advp_valor, spec.advp_range, spec.datas_sel)
+    pos=cache_recortes().obter(chave, lambda: _posicoes(idx.mascara(
+        spec.regiao_sel, spec.tipo_agencia_filtro, spec.agencias_para_analise, spec.config_123_max_filtro=='Grupo123',
+        spec.advp_valor, spec.advp_range, spec.datas_sel, spec.trecho_sel)))
+    return _Filtros({f.name: getattr(spec, f.name) for f in fields(spec)}, spec=spec,
+                    _df=df, _indice=idx, _mascara_regiao=m_regiao, _posicoes=pos, _versao=versao)
+
+@medido('filtros')
+def get_sidebar_filters(df) -> FiltroSpec:
+    """Só os widgets: lê as escolhas e devolve o FiltroSpec (o recorte é feito por aplicar_filtros/analytics)."""
+    st.sidebar.header("Filtros")
+    st.sidebar.subheader("Filtro por Região")
+
+    regiao_sel=st.sidebar.selectbox("Região", ['Todas']+REGIOES, index=0)
+    fac=_facetas_fonte(df, regiao_sel)
+    trechos_disp=fac['trechos']
 
     st.sidebar.subheader("Análise 123/Max")
     config_123_max_filtro=st.sidebar.selectbox("Como analisar 123MILHAS e MAXMILHAS?", ("Separado","Grupo123"))
     st.sidebar.markdown("---")
 
     tipo_agencia_filtro=st.sidebar.selectbox("Filtro de Agências/Cias", ("Geral","Agências","Cias"))
-    agencias=[a for a in df_regiao['Agência/Companhia'].dropna().unique() if a not in cias_padrao]
-
-    if tipo_agencia_filtro=='Agências':
-        todas_agencias=sorted(agencias)
-    elif tipo_agencia_filtro=='Cias':
-        base=cias_padrao.copy()
-        for a in ['123MILHAS','MAXMILHAS']:
-            if a in df_regiao['Agência/Companhia'].dropna().unique(): base.append(a)
-        todas_agencias=sorted(base)
-    else:
-        todas_agencias=sorted(df_regiao['Agência/Companhia'].dropna().unique())
+    todas_agencias=list(fac['agencias_por_tipo'][tipo_agencia_filtro])
 
-    principais_default=[x for x in ['123MILHAS','MAXMILHAS'] if x in todas_agencias]
+    principais_default=[x for x in GRUPO123 if x in todas_agencias]
     agencias_principais=st.sidebar.multiselect("Agência(s) Principal(is)", todas_agencias, default=principais_default)
-    concorrentes_pool=[a for a in todas_agencias if a not in agencias_principais]
+    concorrentes_pool,_=_agencias_analise(todas_agencias, agencias_principais, ())
     agencias_concorrentes=st.sidebar.multiselect("Agência(s) Concorrente(s)", ['Todos']+concorrentes_pool, default=['Todos'])
-    agencias_para_analise=agencias_principais + (concorrentes_pool if 'Todos' in agencias_concorrentes else agencias_concorrentes)
+    _,agencias_para_analise=_agencias_analise(todas_agencias, agencias_principais, agencias_concorrentes)
 
     trecho_sel=st.sidebar.selectbox("Trecho", ['Todos os Trechos']+trechos_disp)
 
     st.sidebar.markdown("---")
     st.sidebar.subheader("Filtro por ADVP")
-    if df_regiao.empty or df_regiao['ADVP'].dropna().empty:
-        advp_min,advp_max=0,1
-    else:
-        advp_min,advp_max=int(df_regiao['ADVP'].min()), int(df_regiao['ADVP'].max())
-    range_default=(advp_min,advp_max) if advp_min<advp_max else (advp_min,advp_min+1)
+    advp_min,advp_max,range_default=_limites_advp(fac)
     advp_valor=st.sidebar.selectbox('Valor fixo de ADVP', options=['Todos']+ADVPS_ORDEM, index=0)
     advp_range=st.sidebar.slider('Ou intervalo de ADVP', min_value=advp_min, max_value=max(advp_max,advp_min+1), value=range_default)
 
     st.sidebar.markdown("---")
     st.sidebar.header("Filtros de Data")
-    df_dt=df_regiao.dropna(subset=['Data/Hora da Busca'])
-    if not df_dt.empty:
-        dmin,dmax=df_dt['Data/Hora da Busca'].min().date(), df_dt['Data/Hora da Busca'].max().date()
-    else:
-        dmin=dmax=datetime.now().date()
+    dmin,dmax=_limites_datas(fac)
     periodo=st.sidebar.selectbox('Período', ('Últimos 7 dias','Últimos 15 dias','Últimos 30 dias','Período Personalizado'))
-    if periodo=='Últimos 7 dias': start_default=max(dmax - timedelta(days=7), dmin)
-    elif periodo=='Últimos 15 dias': start_default=max(dmax - timedelta(days=15), dmin)
-    elif periodo=='Últimos 30 dias': start_default=max(dmax - timedelta(days=30), dmin)
-    else: start_default=dmin
+    start_default=_inicio_periodo(periodo, dmin, dmax)
     datas_sel=st.sidebar.date_input('Intervalo de datas', value=(start_default, dmax), min_value=dmin, max_value=dmax)
 
-    df_filtrado=df_regiao.copy()
-    if tipo_agencia_filtro=='Agências':
-        df_filtrado=df_filtrado[~df_filtrado['Agência/Companhia'].isin(cias_padrao)]
-    elif tipo_agencia_filtro=='Cias':
-        df_filtrado=df_filtrado[df_filtrado['Agência/Companhia'].isin(cias_padrao+['123MILHAS','MAXMILHAS'])]
+    return FiltroSpec(regiao_sel, tipo_agencia_filtro, config_123_max_filtro, tuple(agencias_principais),
+                      tuple(agencias_para_analise), trecho_sel, advp_valor, tuple(advp_range), tuple(datas_sel))
 
-    if config_123_max_filtro=='Grupo123':
-        df_filtrado=df_filtrado.copy()
-        df_filtrado['Agência/Companhia']=df_filtrado['Agência/Companhia'].replace(['123MILHAS','MAXMILHAS'],'Grupo123')
+# Mantém 123 e MAX separados (para timeseries e análises específicas)
+def apply_filters_for_timeseries(df_regiao, tipo_agencia_filtro, advp_valor, advp_range,
+                                 datas_sel, trecho_sel, agencias_para_analise):
+    alvo = set(agencias_para_analise) | set(GRUPO123)
+    m = _indice_de(df_regiao).mascara('Todas', tipo_agencia_filtro, alvo, False,
+                                      advp_valor, advp_range, datas_sel, trecho_sel)
+    return _recortar(df_regiao, m)
 
-    if advp_valor!='Todos':
-        df_filtrado=df_filtrado[df_filtrado['ADVP']==advp_valor]
-    else:
-        df_filtrado=df_filtrado[(df_filtrado['ADVP']>=advp_range[0])&(df_filtrado['ADVP']<=advp_range[1])]
+def filtrar_timeseries(flt) -> pd.DataFrame:
+    """apply_filters_for_timeseries a partir do recorte de aplicar_filtros (sem materializar df_regiao)."""
+    alvo = set(flt['agencias_para_analise']) | set(GRUPO123)
+    chave = _chave_filtros(flt['_versao'], flt['regiao_sel'], flt['tipo_agencia_filtro'], 'timeseries', alvo,
+                           flt['trecho_sel'], flt['advp_valor'], flt['advp_range'], flt['datas_sel'])
+    pos = cache_recortes().obter(chave, lambda: _posicoes(flt['_indice'].mascara(
+        flt['regiao_sel'], flt['tipo_agencia_filtro'], alvo, False,
+        flt['advp_valor'], flt['advp_range'], flt['datas_sel'], flt['trecho_sel'])))
+    return flt['_df'].take(pos)
 
-    df_filtrado=df_filtrado[df_filtrado['Agência/Companhia'].isin(agencias_para_analise)]
+# ==================== CUBO DIÁRIO (ROLLUP) ====================
+class CuboDiario:
+    """Rollup dia da busca x TRECHO x agência x ADVP x RANKING com contagem, soma/mín/máx de preço.
 
-    if len(datas_sel)==2:
-        sd,ed=pd.to_datetime(datas_sel[0]),pd.to_datetime(datas_sel[1])
-        df_filtrado=df_filtrado[(df_filtrado['Data/Hora da Busca'].dt.date>=sd.date())&(df_filtrado['Data/Hora da Busca'].dt.date<=ed.date())]
+    Usa o TRECHO bruto (e não o TRECHO_STD) porque é nele que os filtros de trecho e região
+    atuam; REGIAO (função do TRECHO, não multiplica grupos) vai junto para as quebras por região.
+    As colunas de chave têm os mesmos nomes das ofertas, então IndiceFiltros e add_period_column
+    funcionam direto no cubo.
+    """
+    CHAVES = ['Data/Hora da Busca', 'TRECHO', 'Agência/Companhia', 'ADVP', 'RANKING', 'REGIAO']
+    MEDIDAS = dict(OFERTAS='sum', PRECO_N='sum', PRECO_SOMA='sum', PRECO_MIN='min', PRECO_MAX='max')
 
-    if trecho_sel!='Todos os Trechos':
-        df_filtrado=df_filtrado[df_filtrado['TRECHO']==trecho_sel]
+    def __init__(self, df: pd.DataFrame = None, cubo: pd.DataFrame = None):
+        self.df = self.agregar(df) if cubo is None else cubo
+        self.indice = IndiceFiltros(self.df)
 
-    return dict(
-        regiao_sel=regiao_sel, tipo_agencia_filtro=tipo_agencia_filtro, config_123_max_filtro=config_123_max_filtro,
-        agencias_principais=agencias_principais, agencias_para_analise=agencias_para_analise,
-        trecho_sel=trecho_sel, advp_valor=advp_valor, advp_range=advp_range, datas_sel=datas_sel,
-        df_regiao=df_regiao, df_filtrado=df_filtrado
-    )
+    @classmethod
+    def agregar(cls, df: pd.DataFrame) -> pd.DataFrame:
+        chaves = [df['Data/Hora da Busca'].dt.floor('D')] + [df[c] for c in cls.CHAVES[1:]]
+        g = df['Preço'].astype('float64').groupby(chaves, observed=True, dropna=False, sort=False)
+        return g.agg(OFERTAS='size', PRECO_N='count', PRECO_SOMA='sum', PRECO_MIN='min', PRECO_MAX='max').reset_index()
 
-# Mantém 123 e MAX separados (para timeseries e análises específicas)
-def apply_filters_for_timeseries(df_regiao, tipo_agencia_filtro, advp_valor, advp_range,
-                                 datas_sel, trecho_sel, agencias_para_analise):
-    d = df_regiao.copy()
-    if tipo_agencia_filtro=='Agências':
-        d = d[~d['Agência/Companhia'].isin(cias_padrao)]
-    elif tipo_agencia_filtro=='Cias':
-        d = d[d['Agência/Companhia'].isin(cias_padrao+['123MILHAS','MAXMILHAS'])]
-
-    if advp_valor!='Todos':
-        d = d[d['ADVP']==advp_valor]
-    else:
-        d = d[(d['ADVP']>=advp_range[0])&(d['ADVP']<=advp_range[1])]
+    @classmethod
+    def reagregar(cls, cubo: pd.DataFrame) -> pd.DataFrame:
+        return cubo.groupby(cls.CHAVES, observed=True, dropna=False, sort=False).agg(cls.MEDIDAS).reset_index()
 
-    if len(datas_sel)==2:
-        sd,ed=pd.to_datetime(datas_sel[0]),pd.to_datetime(datas_sel[1])
-        d = d[(d['Data/Hora da Busca'].dt.date>=sd.date())&(d['Data/Hora da Busca'].dt.date<=ed.date())]
+    def anexar(self, df_novo: pd.DataFrame, df_total: pd.DataFrame) -> 'CuboDiario':
+        """Só o lote novo é agregado; dias/grupos que já existiam são somados no cubo."""
+        novo = self.agregar(df_total.iloc[len(df_total) - len(df_novo):])
+        return type(self)(cubo=self.reagregar(_concatenar_ofertas([self.df, novo])))
 
-    if trecho_sel!='Todos os Trechos':
-        d = d[d['TRECHO']==trecho_sel]
+registrar_derivado('cubo_diario', CuboDiario, CuboDiario.anexar)
 
-    alvo = set(agencias_para_analise) | {'123MILHAS','MAXMILHAS'}
-    d = d[d['Agência/Companhia'].isin([x for x in d['Agência/Companhia'].unique() if x in alvo])]
-    return d
+class CuboHoraVoo(CuboDiario):
+    """Rollup dia da busca x TRECHO x agência x ADVP x hora de partida (HORA_VOO, int8) com mínimo e média de preço.
 
-def add_period_column(df: pd.DataFrame, modo: str, sd, ed) -> pd.DataFrame:
-    """Agrega por período (Semanal/Quinzenal/Mensal) obedecendo ao intervalo do filtro."""
-    d = df.dropna(subset=['Data/Hora da Busca']).copy()
-    dt = d['Data/Hora da Busca'].dt.floor('D')
+    A hora vem da primeira coluna Horário1/2/3 existente (minuto do dia // 60); ofertas sem horário válido ficam de fora
+    (sem nenhuma coluna de horário o cubo sai vazio). O mínimo fica no dtype do Preço.
+    Mediana não é re-agregável entre células do cubo, por isso a alternativa ao mínimo é a média.
+    """
+    CHAVES = ['Data/Hora da Busca', 'TRECHO', 'Agência/Companhia', 'ADVP', 'HORA_VOO']
+    MEDIDAS = dict(OFERTAS='sum', PRECO_N='sum', PRECO_SOMA='sum', PRECO_MIN='min')
 
-    sd = pd.to_datetime(sd).normalize()
-    ed = pd.to_datetime(ed).normalize()
-    step = 7 if modo == 'Semanal' else (15 if modo == 'Quinzenal' else 30)
+    @staticmethod
+    def coluna_horario(df) -> str | None:
+        return next((c for c in COLUNAS_HORARIO if c in df.columns), None)
 
-    mask = (dt >= sd) & (dt <= ed)
-    d = d.loc[mask].copy()
-    dt = d['Data/Hora da Busca'].dt.floor('D')
+    @classmethod
+    def agregar(cls, df: pd.DataFrame) -> pd.DataFrame:
+        col = cls.coluna_horario(df)
+        hora = df[col] // 60 if col else pd.Series(np.nan, index=df.index)
+        ok = hora.notna().to_numpy()
+        if not ok.all(): df, hora = df[ok], hora[ok]
+        chaves = ([df['Data/Hora da Busca'].dt.floor('D')] + [df[c] for c in cls.CHAVES[1:-1]]
+                  + [hora.astype('int8').rename('HORA_VOO')])
+        p = pd.DataFrame({'P': df['Preço'], 'P64': df['Preço'].astype('float64')})
+        g = p.groupby(chaves, observed=True, dropna=False, sort=False)
+        return g.agg(OFERTAS=('P', 'size'), PRECO_N=('P', 'count'), PRECO_SOMA=('P64', 'sum'),
+                     PRECO_MIN=('P', 'min')).reset_index()
 
-    offset_days = (dt - sd).dt.days
-    idx = (offset_days // step).clip(lower=0)
+registrar_derivado('cubo_hora_voo', CuboHoraVoo, CuboHoraVoo.anexar)
 
-    bin_start = sd + pd.to_timedelta(idx * step, unit='D')
-    bin_end   = bin_start + pd.to_timedelta(step - 1, unit='D')
-    d['PERIODO'] = np.where(bin_end <= ed, bin_end, ed)
-    d['PERIODO'] = pd.to_datetime(d['PERIODO']).dt.normalize()
+def cubo_filtrado(flt, timeseries: bool = False, periodo: str | None = None, cubo: str = 'cubo_diario') -> pd.DataFrame:
+    """df_filtrado (ou filtrar_timeseries, se timeseries=True) já agregado no cubo diário (ou em outro cubo
+    registrado, p.ex. cubo='cubo_hora_voo').
+    Com periodo ('Semanal'/'Quinzenal'/'Mensal') sai também a coluna PERIODO do intervalo de datas do filtro,
+    a partir de códigos calculados uma vez por (versão, datas, modo) para o cubo inteiro.
+    Fora da base compartilhada (recortes do dataset particionado) o próprio recorte é agregado."""
+    nome = cubo
+    if base_de(flt['_df']) is None:
+        d = _DERIVADOS[nome][0].agregar(filtrar_timeseries(flt) if timeseries else flt['df_filtrado'])
+        return add_period_column(d, periodo, *flt['datas_sel'][:2]) if periodo else d
+    cubo = base_de(flt['_df']).derivado(nome)
+    grupo123 = not timeseries and flt['config_123_max_filtro'] == 'Grupo123'
+    agencias = set(flt['agencias_para_analise']) | set(GRUPO123) if timeseries else flt['agencias_para_analise']
+    chave = _chave_filtros((nome,) + flt['_versao'], flt['regiao_sel'], flt['tipo_agencia_filtro'],
+                           'timeseries' if timeseries else flt['config_123_max_filtro'], agencias,
+                           flt['trecho_sel'], flt['advp_valor'], flt['advp_range'], flt['datas_sel'])
+    pos = cache_recortes().obter(chave, lambda: _posicoes(cubo.indice.mascara(
+        flt['regiao_sel'], flt['tipo_agencia_filtro'], agencias, grupo123,
+        flt['advp_valor'], flt['advp_range'], flt['datas_sel'], flt['trecho_sel'])))
+    d = cubo.df.take(pos)
+    if grupo123:
+        d = d.assign(**{'Agência/Companhia': agrupar_123(d['Agência/Companhia'])})
+    if periodo:
+        sd, ed = flt['datas_sel'][:2]
+        chave = (('periodo', nome) + flt['_versao'], periodo, _dia(sd), _dia(ed))
+        cod = cache_recortes().obter(chave, lambda: codigos_periodo(cubo.indice.dia, periodo, sd, ed))
+        d = add_period_column(d, periodo, sd, ed, codigos=cod[pos])
     return d
 
-def render_footer(df):
-    st.markdown("---")
+def preco_medio_cubo(cubo: pd.DataFrame, chaves=None):
+    """Preço médio (como groupby(chaves)['Preço'].mean() nas ofertas); sem chaves, um escalar."""
+    if chaves is None:
+        n = cubo['PRECO_N'].sum()
+        return cubo['PRECO_SOMA'].sum() / n if n else np.nan
+    g = cubo.groupby(chaves, observed=True)[['PRECO_SOMA', 'PRECO_N']].sum()
+    return (g['PRECO_SOMA'] / g['PRECO_N']).rename('Preço')
+
+def ofertas_cubo(cubo: pd.DataFrame, chaves) -> pd.Series:
+    """Quantidade de ofertas (como groupby(chaves).size() nas ofertas)."""
+    return cubo.groupby(chaves, observed=True)['OFERTAS'].sum()
+
+# ==================== ROLLUP POR HORA ====================
+def rollup_horario(df: pd.DataFrame) -> pd.DataFrame:
+    """Hora da busca (floor) x agência x RANKING com OFERTAS (linhas) e PRECO_MIN, numa passada só.
+    Mantém grupos com chave nula (dropna=False) para que os totais por hora batam com as ofertas;
+    os groupby feitos em cima dele descartam essas chaves como fariam nas linhas."""
+    hora = df['Data/Hora da Busca'].dt.floor('h').rename('HORA')
+    g = df['Preço'].groupby([hora, df['Agência/Companhia'], df['RANKING']], observed=True, dropna=False)
+    return g.agg(OFERTAS='size', PRECO_MIN='min').reset_index()
+
+def rollup_horario_filtrado(flt) -> pd.DataFrame:
+    """rollup_horario de filtrar_timeseries(flt), guardado no cache de recortes junto das posições."""
+    versao = flt['_versao']
+    chave = _chave_filtros(None if versao is None else ('hora',) + versao, flt['regiao_sel'],
+                           flt['tipo_agencia_filtro'], 'timeseries',
+                           set(flt['agencias_para_analise']) | set(GRUPO123),
+                           flt['trecho_sel'], flt['advp_valor'], flt['advp_range'], flt['datas_sel'])
+    return cache_recortes().obter(chave, lambda: rollup_horario(filtrar_timeseries(flt)))
+
+# ==================== PÓDIO POR BUSCA ====================
+class PodioBuscas:
+    """Candidatos a pódio (RANKING 1–3 com preço/agência) ordenados por busca (TRECHO, Data/Hora da Busca),
+    posição e ordem original — construído uma vez por versão da base.
+
+    O pódio em si (1º/2º/3º de cada busca) sai de um recorte filtrado em O(candidatos): como há empates
+    de RANKING dentro da busca, o 'primeiro' de cada posição depende de quais linhas passam nos filtros.
+    """
+    COLUNAS = ['TRECHO', 'Data/Hora da Busca', 'Agência/Companhia', 'Preço', 'RANKING', 'ADVP']
+
+    def __init__(self, df: pd.DataFrame = None, candidatos: pd.DataFrame = None):
+        c = self.candidatos(df) if candidatos is None else candidatos
+        tr = c['TRECHO'].cat.codes.to_numpy()
+        ts = c['Data/Hora da Busca'].to_numpy(dtype='datetime64[ns]').view('int64')
+        rk = c['RANKING'].to_numpy(dtype='int8')
+        ordem = np.lexsort((np.arange(len(c)), rk, ts, tr))
+        self.df = c.take(ordem).reset_index(drop=True)
+        tr, ts, self.rank = tr[ordem], ts[ordem], rk[ordem]
+        nova = np.r_[True, (tr[1:] != tr[:-1]) | (ts[1:] != ts[:-1])] if len(c) else np.zeros(0, bool)
+        self.busca = np.cumsum(nova) - 1
+        self.buscas = self.df.loc[nova, ['TRECHO', 'Data/Hora da Busca']].reset_index(drop=True)
+        self.indice = IndiceFiltros(self.df)
+
+    @classmethod
+    def candidatos(cls, df: pd.DataFrame) -> pd.DataFrame:
+        d = df[cls.COLUNAS]
+        ok = d[cls.COLUNAS[:5]].notna().all(axis=1) & d['RANKING'].isin([1, 2, 3])
+        d = d[ok.to_numpy()].reset_index(drop=True)
+        # carga não compacta: códigos de trecho/agência precisam de categorias
+        return d.assign(**{c: _categorizar(d[c]) for c in ('TRECHO', 'Agência/Companhia')
+                           if not isinstance(d[c].dtype, pd.CategoricalDtype)})
+
+    def anexar(self, df_novo: pd.DataFrame, df_total: pd.DataFrame) -> 'PodioBuscas':
+        """Linhas novas entram depois das antigas, preservando a ordem original dentro de cada busca."""
+        novos = self.candidatos(df_total.iloc[len(df_total) - len(df_novo):])
+        return PodioBuscas(candidatos=_concatenar_ofertas([self.df, novos]))
+
+    def podio(self, posicoes=None) -> pd.DataFrame:
+        """Uma linha por busca: TRECHO, Data/Hora da Busca, Agência_k e Preço_k (k=1..3) —
+        o primeiro candidato de cada posição entre `posicoes` (todos, se None)."""
+        idx = np.arange(len(self.rank)) if posicoes is None else np.asarray(posicoes)
+        chave = self.busca[idx].astype(np.int64) * 4 + self.rank[idx]
+        prim = idx[np.r_[True, chave[1:] != chave[:-1]]] if len(idx) else idx
+        b = np.unique(self.busca[prim])
+        out = self.buscas.take(b).reset_index(drop=True)
+        linha = np.searchsorted(b, self.busca[prim])
+        ag = self.df['Agência/Companhia'].cat.codes.to_numpy()[prim]
+        preco = self.df['Preço'].to_numpy()[prim]
+        tipo_preco = np.result_type(preco.dtype, np.float32)
+        for k in (1, 2, 3):
+            sel = self.rank[prim] == k
+            cod = np.full(len(b), -1, dtype=ag.dtype); cod[linha[sel]] = ag[sel]
+            p = np.full(len(b), np.nan, dtype=tipo_preco); p[linha[sel]] = preco[sel]
+            out[f'Agência_{k}'] = pd.Categorical.from_codes(cod, dtype=self.df['Agência/Companhia'].dtype)
+            out[f'Preço_{k}'] = p
+        return out
+
+registrar_derivado('podio', PodioBuscas, PodioBuscas.anexar)
+
+def podio_buscas(flt) -> pd.DataFrame:
+    """PodioBuscas.podio() para os filtros da série temporal (123 e MAX separados)."""
+    if base_de(flt['_df']) is None:
+        return PodioBuscas(filtrar_timeseries(flt)).podio()
+    p = base_de(flt['_df']).derivado('podio')
+    alvo = set(flt['agencias_para_analise']) | set(GRUPO123)
+    chave = _chave_filtros(('podio',) + flt['_versao'], flt['regiao_sel'], flt['tipo_agencia_filtro'], 'timeseries', alvo,
+                           flt['trecho_sel'], flt['advp_valor'], flt['advp_range'], flt['datas_sel'])
+    pos = cache_recortes().obter(chave, lambda: _posicoes(p.indice.mascara(
+        flt['regiao_sel'], flt['tipo_agencia_filtro'], alvo, False,
+        flt['advp_valor'], flt['advp_range'], flt['datas_sel'], flt['trecho_sel'])))
+    return p.podio(pos)
+
+# ==================== DIFERENÇA VS MELHOR CONCORRENTE ====================
+def diferenca_vs_melhor(df: pd.DataFrame, chaves=(), agencias=GRUPO123, excluir=GRUPO123) -> pd.DataFrame:
+    """Preço médio de cada agência de `agencias` vs. o menor preço médio entre as concorrentes
+    (agências fora de `excluir`), por grupo de `chaves` — uma única agregação (ofertas ou cubo diário).
+
+    Uma linha por grupo com melhor concorrente definido e agência: chaves, 'Agência', 'Preço', 'Melhor'
+    e 'Diferença (%)' (nula quando a agência não tem preço no grupo ou o melhor é zero).
+    """
+    chaves = [chaves] if isinstance(chaves, str) else list(chaves)
+    ag = 'Agência/Companhia'
+    if 'PRECO_SOMA' in df.columns:
+        soma, n = df['PRECO_SOMA'], df['PRECO_N']
+    else:
+        p = df['Preço'].astype('float64')
+        soma, n = p.fillna(0.0), p.notna().astype('int64')
+    ks = chaves or ['_']
+    g = pd.DataFrame({'_': 0, **{k: df[k] for k in chaves}, ag: df[ag], 'S': soma, 'N': n})
+    por = g.groupby(ks + [ag], observed=True)[['S', 'N']].sum()
+    media = (por['S'] / por['N'].where(por['N'] > 0)).unstack(ag)
+    melhor = media[[c for c in media.columns if c not in excluir]].min(axis=1).dropna()
+    out = pd.concat([pd.DataFrame({'Agência': a, 'Melhor': melhor,
+                                   'Preço': media[a].reindex(melhor.index) if a in media.columns else np.nan})
+                     for a in agencias])
+    out['Diferença (%)'] = ((out['Preço'] - out['Melhor']) / out['Melhor'] * 100).where(out['Melhor'] != 0)
+    out = out.reset_index()
+    return out[chaves + ['Agência', 'Preço', 'Melhor', 'Diferença (%)']].reset_index(drop=True)
+
+def _dia(x) -> int:
+    """Data -> dias desde 1970-01-01 (mesma escala de IndiceFiltros.dia)."""
+    return int(np.datetime64(pd.to_datetime(x).date(), 'D').astype('int64'))
+
+def _passo_periodo(modo: str) -> int:
+    return 7 if modo == 'Semanal' else (15 if modo == 'Quinzenal' else 30)
+
+def codigos_periodo(dias: np.ndarray, modo: str, sd, ed) -> np.ndarray:
+    """Período (Semanal/Quinzenal/Mensal) de cada dia (int, ver _dia): códigos int16, -1 fora de [sd, ed]."""
+    passo, d0, d1 = _passo_periodo(modo), _dia(sd), _dia(ed)
+    return np.where((dias >= d0) & (dias <= d1), (dias - d0) // passo, -1).astype(np.int16)
+
+def fins_periodo(modo: str, sd, ed) -> np.ndarray:
+    """Data de fechamento de cada código de período (o último termina em ed)."""
+    passo, d0, d1 = _passo_periodo(modo), _dia(sd), _dia(ed)
+    fins = np.minimum(d0 + passo * np.arange(1, max((d1 - d0) // passo + 2, 1)) - 1, d1)
+    return fins.astype('datetime64[D]').astype('datetime64[ns]')
+
+def add_period_column(df: pd.DataFrame, modo: str, sd, ed, codigos: np.ndarray | None = None) -> pd.DataFrame:
+    """Agrega por período (Semanal/Quinzenal/Mensal) obedecendo ao intervalo do filtro.
+    `codigos` (de codigos_periodo, alinhados às linhas) evita recalcular os dias."""
+    if codigos is None:
+        codigos = codigos_periodo(IndiceFiltros._dias(df['Data/Hora da Busca']), modo, sd, ed)
+    ok = codigos >= 0
+    d = df if ok.all() else df.take(np.flatnonzero(ok))
+    return d.assign(PERIODO=fins_periodo(modo, sd, ed)[codigos[ok]])
+
+def _resumo_ofertas(df) -> dict:
     ultima_raw = df['Data/Hora da Busca'].max() if 'Data/Hora da Busca' in df.columns else None
     # Buscas: por Nome do Arquivo (se existir) senão por timestamp arredondado
     if 'Nome do Arquivo' in df.columns and df['Nome do Arquivo'].notna().any():
@@ -430,7 +2017,14 @@ def render_footer(df):
         qtd_buscas = int(df['Data/Hora da Busca'].dt.floor('min').nunique())
     else:
         qtd_buscas = 0
-    qtd_ofertas = int(len(df))
+    return dict(ultima=ultima_raw, buscas=qtd_buscas, ofertas=int(len(df)))
+
+def render_footer(df):
+    st.markdown("---")
+    base = base_de(df)
+    if isinstance(df, DatasetParticionado): r = df.resumo()
+    else: r = base.derivado('catalogo')['Todas'] if base is not None else _resumo_ofertas(df)
+    ultima_raw, qtd_buscas, qtd_ofertas = r['ultima'], r['buscas'], r['ofertas']
     if pd.notna(ultima_raw):
         st.caption(
             f"Última atualização do banco: **{format_data_br(ultima_raw)}** • "
@@ -438,3 +2032,4 @@ def render_footer(df):
         )
     else:
         st.caption(f"Buscas: **{fmt_int_br(qtd_buscas)}** • Ofertas: **{fmt_int_br(qtd_ofertas)}**")
+    concluir_medicao()
@@ -1,14 +1,14 @@
 # pages/01_Visao_Geral.py
 import streamlit as st
-import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
 from common import (
     apply_css, carregar_dados, CAMINHO_ARQUIVO, get_sidebar_filters,
     build_color_map, theme_plotly, chart_height, largura_barras_precos,
-    COLOR_123, COLOR_MAX, PRIMARY_BLUE, render_footer, render_logo
+    COLOR_123, COLOR_MAX, PRIMARY_BLUE, mostrar_grafico, render_footer, render_logo
 )
+from analytics import precos_por_agencia
 
 st.set_page_config(page_title="Visão 1 — Preços por Agência", layout="wide", initial_sidebar_state="expanded")
 apply_css()
@@ -20,23 +20,21 @@ df = carregar_dados(CAMINHO_ARQUIVO)
 if df is None or df.empty:
     st.warning("Nenhum dado carregado."); st.stop()
 
-flt = get_sidebar_filters(df)
-df_filtrado = flt['df_filtrado']
-agencias_principais = flt['agencias_principais']
-config_123_max_filtro = flt['config_123_max_filtro']
+spec = get_sidebar_filters(df)
+# agregados já prontos (cubo diário filtrado -> preços médios e diferenças), em cache por versão + filtros
+r = precos_por_agencia(df, spec)
+config_123_max_filtro = spec.config_123_max_filtro
 
-if df_filtrado.empty:
+if not r['ofertas']:
     st.info("Sem dados filtrados."); render_footer(df); st.stop()
 
 c1, c2 = st.columns(2)
 
 with c1:
     st.subheader("Agências Principais")
-    alvo = (['Grupo123'] if config_123_max_filtro == 'Grupo123' else agencias_principais)
-    df_princ = df_filtrado[df_filtrado['Agência/Companhia'].isin(alvo)]
+    pm = r['principais']
 
-    if not df_princ.empty:
-        pm = df_princ.groupby('Agência/Companhia', as_index=False)['Preço'].mean()
+    if pm is not None:
         cmap = build_color_map(pm['Agência/Companhia'].unique())
         fig = px.bar(
             pm, x='Agência/Companhia', y='Preço', text='Preço',
@@ -49,19 +47,15 @@ with c1:
             insidetextfont=dict(size=18, color='white'), width=largura_barras_precos
         )
         theme_plotly(fig)
-        st.plotly_chart(fig, use_container_width=True)
+        mostrar_grafico(fig)
     else:
         st.info("Sem dados das principais.")
 
 with c2:
     st.subheader("Agências Concorrentes")
-    if config_123_max_filtro == 'Grupo123':
-        df_conc = df_filtrado[df_filtrado['Agência/Companhia'] != 'Grupo123']
-    else:
-        df_conc = df_filtrado[~df_filtrado['Agência/Companhia'].isin(agencias_principais)]
+    pm = r['concorrentes']
 
-    if not df_conc.empty:
-        pm = df_conc.groupby('Agência/Companhia', as_index=False)['Preço'].mean().sort_values('Preço')
+    if pm is not None:
         cmap = build_color_map(pm['Agência/Companhia'].unique(), include_named=False)
         fig = px.bar(
             pm, x='Agência/Companhia', y='Preço', text='Preço',
@@ -74,57 +68,49 @@ with c2:
             insidetextfont=dict(size=18, color='white'), width=largura_barras_precos
         )
         theme_plotly(fig)
-        st.plotly_chart(fig, use_container_width=True)
+        mostrar_grafico(fig)
     else:
         st.info("Sem dados de concorrentes.")
 
 st.header("2. Comparativo de Preços vs. Melhor Concorrente")
 
+# sem preço da agência o gauge mostra 0%; sem melhor concorrente não há gauge
+dif = r['diferencas']
 if config_123_max_filtro == 'Grupo123':
-    df_comp = df_filtrado[df_filtrado['Agência/Companhia'] != 'Grupo123']
-    pm_grupo = df_filtrado.loc[df_filtrado['Agência/Companhia'] == 'Grupo123', 'Preço'].mean()
-    if not df_comp.empty:
-        melhor = df_comp.groupby('Agência/Companhia')['Preço'].mean().min()
-        if pd.notna(melhor):
-            diff = ((pm_grupo - melhor) / melhor) * 100 if pd.notna(pm_grupo) else 0
+    if not dif.empty:
+        diff = dif['Diferença (%)'].fillna(0).iloc[0]
+        fig = go.Figure(go.Indicator(
+            mode="gauge+number", value=diff,
+            title={'text': "Grupo123 vs. Melhor Concorrente (%)"},
+            number={'suffix': '%', 'valueformat': '.0f'},
+            gauge={'axis': {'range': [-50, 50]}, 'bar': {'color': PRIMARY_BLUE}, 'bgcolor': 'white'}
+        ))
+        fig.update_layout(height=chart_height)
+        theme_plotly(fig)
+        mostrar_grafico(fig)
+else:
+    if not dif.empty:
+        d123, dmax = dif.set_index('Agência')['Diferença (%)'].fillna(0)[['123MILHAS', 'MAXMILHAS']]
+        g1, g2 = st.columns(2)
+        with g1:
             fig = go.Figure(go.Indicator(
-                mode="gauge+number", value=diff,
-                title={'text': "Grupo123 vs. Melhor Concorrente (%)"},
+                mode="gauge+number", value=d123,
+                title={'text': "123MILHAS vs. Melhor Concorrente (%)"},
                 number={'suffix': '%', 'valueformat': '.0f'},
-                gauge={'axis': {'range': [-50, 50]}, 'bar': {'color': PRIMARY_BLUE}, 'bgcolor': 'white'}
+                gauge={'axis': {'range': [-50, 50]}, 'bar': {'color': COLOR_123}, 'bgcolor': 'white'}
             ))
             fig.update_layout(height=chart_height)
             theme_plotly(fig)
-            st.plotly_chart(fig, use_container_width=True)
-else:
-    df_comp = df_filtrado[~df_filtrado['Agência/Companhia'].isin(['123MILHAS', 'MAXMILHAS'])]
-    if not df_comp.empty:
-        melhor = df_comp.groupby('Agência/Companhia')['Preço'].mean().min()
-        pm_123 = df_filtrado.loc[df_filtrado['Agência/Companhia'] == '123MILHAS', 'Preço'].mean()
-        pm_max = df_filtrado.loc[df_filtrado['Agência/Companhia'] == 'MAXMILHAS', 'Preço'].mean()
-        if pd.notna(melhor):
-            d123 = ((pm_123 - melhor) / melhor) * 100 if pd.notna(pm_123) else 0
-            dmax = ((pm_max - melhor) / melhor) * 100 if pd.notna(pm_max) else 0
-            g1, g2 = st.columns(2)
-            with g1:
-                fig = go.Figure(go.Indicator(
-                    mode="gauge+number", value=d123,
-                    title={'text': "123MILHAS vs. Melhor Concorrente (%)"},
-                    number={'suffix': '%', 'valueformat': '.0f'},
-                    gauge={'axis': {'range': [-50, 50]}, 'bar': {'color': COLOR_123}, 'bgcolor': 'white'}
-                ))
-                fig.update_layout(height=chart_height)
-                theme_plotly(fig)
-                st.plotly_chart(fig, use_container_width=True)
-            with g2:
-                fig = go.Figure(go.Indicator(
-                    mode="gauge+number", value=dmax,
-                    title={'text': "MAXMILHAS vs. Melhor Concorrente (%)"},
-                    number={'suffix': '%', 'valueformat': '.0f'},
-                    gauge={'axis': {'range': [-50, 50]}, 'bar': {'color': COLOR_MAX}, 'bgcolor': 'white'}
-                ))
-                fig.update_layout(height=chart_height)
-                theme_plotly(fig)
-                st.plotly_chart(fig, use_container_width=True)
+            mostrar_grafico(fig)
+        with g2:
+            fig = go.Figure(go.Indicator(
+                mode="gauge+number", value=dmax,
+                title={'text': "MAXMILHAS vs. Melhor Concorrente (%)"},
+                number={'suffix': '%', 'valueformat': '.0f'},
+                gauge={'axis': {'range': [-50, 50]}, 'bar': {'color': COLOR_MAX}, 'bgcolor': 'white'}
+            ))
+            fig.update_layout(height=chart_height)
+            theme_plotly(fig)
+            mostrar_grafico(fig)
 
 render_footer(df)
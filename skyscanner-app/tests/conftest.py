@@ -0,0 +1,42 @@
+# tests/conftest.py — app no sys.path, sem cache Arrow e lotes sintéticos pequenos
+import os, sys
+from datetime import date, timedelta
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+APP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP)
+os.chdir(APP)          # common resolve data/regioes.csv e data/.cache a partir do diretório do app
+
+import common
+from tools.gerar_ofertas import gerar_dia, rotas
+
+AGENCIA_NOVA = 'AGENCIA NOVA'
+
+@pytest.fixture(autouse=True)
+def sem_cache_arrow(monkeypatch):
+    monkeypatch.setattr(common, 'CACHE_DIR', '')
+
+def lotes_sinteticos() -> dict:
+    """Três lotes diários; o terceiro traz um TRECHO (com região) e uma agência que os dois primeiros não têm."""
+    r = rotas(7)
+    dias = [gerar_dia(r, date(2025, 8, 1) + timedelta(days=i), 900, 7).to_pandas() for i in range(3)]
+    ultimo = dias[-1]
+    trechos = ultimo['TRECHO'].value_counts().index
+    novo = next(t for t in trechos if common._codigos_regiao([t])[0] >= 0)
+    antigos = [d[d['TRECHO'] != novo].reset_index(drop=True) for d in dias[:-1]]
+    ag = ultimo.loc[ultimo['TRECHO'] == novo, 'Agência/Companhia'].iloc[0]
+    ultimo.loc[(ultimo['TRECHO'] == novo) & (ultimo['Agência/Companhia'] == ag), 'Agência/Companhia'] = AGENCIA_NOVA
+    return dict(frames=antigos + [ultimo], trecho=novo, agencia=AGENCIA_NOVA)
+
+@pytest.fixture
+def lotes():
+    return lotes_sinteticos()
+
+def gravar(pasta, frames, inicio: int = 0):
+    """Cada frame vira OFERTAS_<n>.parquet em `pasta`, n a partir de `inicio` (ordem dos nomes = ordem de ingestão)."""
+    os.makedirs(pasta, exist_ok=True)
+    for i, f in enumerate(frames, inicio):
+        pq.write_table(pa.Table.from_pandas(f, preserve_index=False), os.path.join(pasta, f"OFERTAS_{i}.parquet"))
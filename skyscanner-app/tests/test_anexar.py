@@ -0,0 +1,116 @@
+# tests/test_anexar.py — lote anexado (BaseOfertas._anexar) x base recarregada do zero
+import numpy as np
+import pandas as pd
+import pytest
+
+import common
+from common import BaseOfertas, IndiceFiltros, REGIOES
+from conftest import gravar
+
+@pytest.fixture(params=[True, False], ids=['compacta', 'nao_compacta'])
+def bases(request, lotes, tmp_path):
+    """(incremental, recarregada): a incremental ingere o 3º lote por atualizar() -> _anexar, com todos os derivados
+    já montados; a recarregada lê os três lotes do zero (_recarregar)."""
+    pasta = str(tmp_path / 'lotes')
+    gravar(pasta, lotes['frames'][:2])
+    inc = BaseOfertas(pasta, request.param)
+    assert inc.atualizar(forcar=True)
+    for nome in common._DERIVADOS: inc.derivado(nome)
+    gravar(pasta, lotes['frames'][2:], inicio=2)
+    versao = inc.versao
+    assert inc.atualizar(forcar=True) and inc.versao == versao + 1
+    assert set(inc._derivados) == set(common._DERIVADOS)     # nenhum derivado foi descartado
+    ref = BaseOfertas(pasta, request.param)
+    assert ref.atualizar(forcar=True)
+    return inc, ref
+
+def _filtros(lotes):
+    yield {}
+    for r in REGIOES: yield dict(regiao_sel=r)
+    yield dict(trecho_sel=lotes['trecho'])
+    yield dict(regiao_sel=REGIOES[common._codigos_regiao([lotes['trecho']])[0]], trecho_sel=lotes['trecho'])
+    yield dict(agencias=[lotes['agencia']])
+    yield dict(agencias=[lotes['agencia'], 'MAXMILHAS', '123MILHAS'], grupo123=False)
+    yield dict(agencias=[lotes['agencia'], 'Grupo123'], grupo123=True)
+    yield dict(tipo_agencia_filtro='Agências', advp_valor=7)
+    yield dict(tipo_agencia_filtro='Cias', datas_sel=('2025-08-03', '2025-08-03'))
+
+def _mesmas_mascaras(a: IndiceFiltros, b: IndiceFiltros, lotes):
+    assert len(a) == len(b)
+    for f in _filtros(lotes):
+        np.testing.assert_array_equal(a.mascara(**f), b.mascara(**f), err_msg=str(f))
+    for r in ['Todas'] + REGIOES:
+        ma, mb = a.mascara_regiao(r), b.mascara_regiao(r)
+        assert (ma is None and mb is None) or np.array_equal(ma, mb), r
+
+def _ordenado(df: pd.DataFrame, chaves) -> pd.DataFrame:
+    """Categóricos como texto e linhas em ordem das chaves (os derivados incrementais não garantem a ordem)."""
+    df = df.astype({c: object for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+    return df.sort_values(chaves, kind='stable', na_position='first').reset_index(drop=True)
+
+# ==================== ÍNDICE DE FILTROS ====================
+def test_indice_anexado_com_trecho_e_agencia_novos(bases, lotes):
+    inc, ref = bases
+    idx = inc.derivado('indice')
+    assert lotes['trecho'] in idx.trechos and lotes['agencia'] in idx.agencias
+    _mesmas_mascaras(idx, IndiceFiltros(ref.df), lotes)
+    # as linhas do lote novo com a agência nova são exatamente as que o filtro devolve
+    esperado = (inc.df['Agência/Companhia'] == lotes['agencia']).to_numpy()
+    np.testing.assert_array_equal(idx.mascara(agencias=[lotes['agencia']]), esperado)
+    esperado = (inc.df['TRECHO'] == lotes['trecho']).to_numpy()
+    np.testing.assert_array_equal(idx.mascara(trecho_sel=lotes['trecho']), esperado)
+
+def test_indice_recodifica_lote_categorizado_a_parte():
+    """Lote com categorias próprias (ordem e conjunto diferentes) cai nos códigos das categorias antigas."""
+    antigo = pd.DataFrame({'Agência/Companhia': ['B', 'C'], 'TRECHO': ['GRUREC', 'GRUPOA'],
+                           'Data/Hora da Busca': pd.to_datetime(['2025-08-01', '2025-08-01']), 'ADVP': [1, 5]})
+    novo = pd.DataFrame({'Agência/Companhia': ['A', 'C', None], 'TRECHO': ['CGHSDU', 'GRUREC', 'GRUPOA'],
+                         'Data/Hora da Busca': pd.to_datetime(['2025-08-02'] * 3), 'ADVP': [1, 1, 1]})
+    total = pd.concat([antigo, novo], ignore_index=True)
+    idx = IndiceFiltros(antigo).anexar(novo, total)
+    assert list(idx.agencias) == ['B', 'C', 'A']
+    ref = IndiceFiltros(total)
+    for ag in ('A', 'B', 'C'):
+        np.testing.assert_array_equal(idx.mascara(agencias=[ag]), ref.mascara(agencias=[ag]))
+    for tr in ('GRUREC', 'GRUPOA', 'CGHSDU'):
+        np.testing.assert_array_equal(idx.mascara(trecho_sel=tr), ref.mascara(trecho_sel=tr))
+    for r in REGIOES:
+        np.testing.assert_array_equal(idx.mascara(regiao_sel=r), ref.mascara(regiao_sel=r))
+
+# ==================== DEMAIS DERIVADOS ====================
+def test_base_anexada_igual_a_recarregada(bases):
+    inc, ref = bases
+    assert inc.lotes == ref.lotes and inc.nomes == ref.nomes
+    sem_categoria = lambda df: df.astype({c: object for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+    pd.testing.assert_frame_equal(sem_categoria(inc.df), sem_categoria(ref.df))
+
+def test_catalogo_anexado_igual_ao_recarregado(bases):
+    inc, ref = bases
+    a, b = inc.derivado('catalogo'), ref.derivado('catalogo')
+    for r in ['Todas'] + REGIOES:
+        fa, fb = a[r], b[r]
+        assert fa.keys() == fb.keys(), r
+        for k in fa:
+            assert fa[k] == fb[k], (r, k)
+
+@pytest.mark.parametrize('nome', ['cubo_diario', 'cubo_hora_voo'])
+def test_cubos_anexados_iguais_aos_recarregados(bases, lotes, nome):
+    inc, ref = bases
+    a, b = inc.derivado(nome), ref.derivado(nome)
+    chaves = type(a).CHAVES
+    pd.testing.assert_frame_equal(_ordenado(a.df, chaves), _ordenado(b.df, chaves), check_dtype=False)
+    # o índice do cubo filtra as mesmas células
+    for f in _filtros(lotes):
+        ca = _ordenado(a.df[a.indice.mascara(**f)], chaves)
+        cb = _ordenado(b.df[b.indice.mascara(**f)], chaves)
+        pd.testing.assert_frame_equal(ca, cb, check_dtype=False, obj=str(f))
+
+def test_podio_anexado_igual_ao_recarregado(bases, lotes):
+    inc, ref = bases
+    a, b = inc.derivado('podio'), ref.derivado('podio')
+    chaves = ['TRECHO', 'Data/Hora da Busca']
+    pd.testing.assert_frame_equal(_ordenado(a.podio(), chaves), _ordenado(b.podio(), chaves), check_dtype=False)
+    for f in _filtros(lotes):
+        pa_, pb = (np.flatnonzero(p.indice.mascara(**f)) for p in (a, b))
+        pd.testing.assert_frame_equal(_ordenado(a.podio(pa_), chaves), _ordenado(b.podio(pb), chaves),
+                                      check_dtype=False, obj=str(f))
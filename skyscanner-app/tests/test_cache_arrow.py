@@ -0,0 +1,48 @@
+# tests/test_cache_arrow.py — cache Arrow dos lotes: chave e conteúdo restaurado
+import os
+
+import pyarrow.feather as feather
+
+import common
+from conftest import gravar, lotes_sinteticos
+
+def _lote(tmp_path, monkeypatch):
+    monkeypatch.setattr(common, 'CACHE_DIR', str(tmp_path / 'cache'))
+    gravar(str(tmp_path / 'lotes'), lotes_sinteticos()['frames'][:1])
+    return str(tmp_path / 'lotes' / 'OFERTAS_0.parquet')
+
+def test_tabela_de_regioes_nova_nao_reaproveita_cache(tmp_path, monkeypatch):
+    """REGIAO é gravada no cache: trocar data/regioes.csv (ou REGIOES_PATH) tem de invalidá-lo."""
+    caminho = _lote(tmp_path, monkeypatch)
+    antes = common._ler_lote(caminho, True)
+    assert os.listdir(common.CACHE_DIR)
+
+    trechos = set(antes['TRECHO_STD'].unique())
+    monkeypatch.setattr(common, 'REGIOES_TRECHOS_STD', {'TESTE': trechos})
+    monkeypatch.setattr(common, 'REGIOES', ['TESTE'])
+    monkeypatch.setattr(common, '_REGIAO_DA_ROTA', {t: 0 for t in trechos})
+    depois = common._ler_lote(caminho, True)
+    assert list(depois['REGIAO'].cat.categories) == ['TESTE']
+    assert (depois['REGIAO'] == 'TESTE').all()
+
+def test_cache_de_um_modo_nao_apaga_o_do_outro(tmp_path, monkeypatch):
+    caminho = _lote(tmp_path, monkeypatch)
+    common._ler_lote(caminho, True)
+    common._ler_lote(caminho, False)
+    compacto, completo = common._arquivo_cache(caminho, True), common._arquivo_cache(caminho, False)
+    assert compacto != completo and os.path.exists(compacto) and os.path.exists(completo)
+
+    os.utime(caminho, ns=(0, 0))        # lote regravado: só a versão antiga do mesmo modo é removida
+    novo = common._arquivo_cache(caminho, True)
+    common._ler_lote(caminho, True)
+    assert sorted(os.listdir(common.CACHE_DIR)) == sorted(map(os.path.basename, (novo, completo)))
+
+def test_attrs_sobrevivem_ao_cache(tmp_path, monkeypatch):
+    caminho = _lote(tmp_path, monkeypatch)
+    gravado = common._ler_lote(caminho, True)
+    arq = common._arquivo_cache(caminho, True)
+    # gravados explicitamente: o pyarrow só passou a levar df.attrs nos metadados pandas em versões recentes
+    assert common._META_ATTRS in feather.read_table(arq).schema.metadata
+    lido = common._ler_cache_arrow(arq)
+    assert set(gravado.attrs) >= {'memoria_mb', 'falhas_datas'}
+    assert lido.attrs == gravado.attrs
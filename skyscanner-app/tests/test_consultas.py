@@ -0,0 +1,290 @@
+# tests/test_consultas.py — consultas do analytics x o que as páginas calculavam inline antes da extração
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import analytics as an
+from common import (
+    ADVPS_ORDEM, GRUPO123, REGIOES_TRECHOS_STD, BaseOfertas, CuboHoraVoo, add_period_column, aplicar_filtros,
+    cache_recortes, cubo_filtrado, diferenca_vs_melhor, filtrar_timeseries, ofertas_cubo, podio_buscas,
+    preco_medio_cubo, rollup_horario_filtrado
+)
+from conftest import gravar, lotes_sinteticos
+
+FILTROS = [
+    dict(),
+    dict(config_123_max_filtro='Grupo123'),
+    dict(regiao_sel='SUDESTE', advp_valor=7),
+    dict(tipo_agencia_filtro='Agências', periodo='Últimos 30 dias'),
+]
+
+@pytest.fixture(scope='module')
+def df(tmp_path_factory):
+    pasta = str(tmp_path_factory.mktemp('consultas'))
+    gravar(pasta, lotes_sinteticos()['frames'])
+    base = BaseOfertas(pasta, True)
+    assert base.atualizar(forcar=True)
+    return base.df
+
+@pytest.fixture(params=FILTROS, ids=lambda f: ','.join(f"{k}={v}" for k, v in f.items()) or 'padrao')
+def caso(request, df):
+    cache_recortes().limpar()
+    spec = an.especificar_filtros(df, **request.param)
+    return df, spec, aplicar_filtros(df, spec)
+
+def _igual(a: pd.DataFrame | None, b: pd.DataFrame):
+    """None (a consulta sinaliza 'sem ofertas no grupo') equivale ao frame vazio que a página testava."""
+    if a is None:
+        assert b.empty; return
+    pd.testing.assert_frame_equal(a.reset_index(drop=True), b.reset_index(drop=True), check_dtype=False)
+
+# Referências em pandas puro sobre as linhas, como as páginas faziam antes dos cubos
+def _linhas_ts(flt) -> pd.DataFrame:
+    """Linhas da série temporal (apply_filters_for_timeseries): df_filtrado com 123 e MAX separados.
+    Preço em float64 como na carga original (médias em float32 acumulam erro)."""
+    linhas = filtrar_timeseries(flt)
+    if flt['config_123_max_filtro'] != 'Grupo123' and set(GRUPO123) <= set(flt['agencias_para_analise']):
+        assert len(linhas) == len(flt['df_filtrado'])
+    return linhas.astype({'Preço': 'float64'})
+
+def _dif_linhas(d: pd.DataFrame, ag: str):
+    """Corpo dos laços diff_vs_best_*: preço médio de `ag` vs. o menor preço médio das concorrentes."""
+    pm_ag = d.loc[d['Agência/Companhia']==ag, 'Preço'].mean()
+    comp = d[~d['Agência/Companhia'].isin(GRUPO123)]
+    if pd.isna(pm_ag) or comp.empty: return None
+    best = comp.groupby('Agência/Companhia', observed=True)['Preço'].mean().min()
+    if pd.isna(best) or best == 0: return None
+    return (pm_ag - best) / best * 100
+
+def _por_periodo(d: pd.DataFrame, ag: str, chave) -> dict:
+    return {(per, chave): v for per, dp in d.groupby('PERIODO', observed=True)
+            if (v := _dif_linhas(dp, ag)) is not None}
+
+def _mesmos_valores(r: pd.DataFrame, chaves: list, esperado: dict):
+    obtido = {tuple(k): v for k, v in zip(r[chaves].itertuples(index=False), r['Diferença (%)'])}
+    assert set(obtido) == set(esperado)
+    np.testing.assert_allclose([obtido[k] for k in esperado], list(esperado.values()), rtol=1e-5)
+
+# ==================== 1. PREÇOS POR AGÊNCIA ====================
+def test_precos_por_agencia(caso):
+    df, spec, flt = caso
+    r = an.precos_por_agencia(df, spec)
+    df_filtrado = cubo_filtrado(flt)
+    grupo = flt['config_123_max_filtro'] == 'Grupo123'
+    alvo = ['Grupo123'] if grupo else flt['agencias_principais']
+    df_princ = df_filtrado[df_filtrado['Agência/Companhia'].isin(alvo)]
+    _igual(r['principais'], preco_medio_cubo(df_princ, 'Agência/Companhia').reset_index())
+    if grupo:
+        df_conc = df_filtrado[df_filtrado['Agência/Companhia'] != 'Grupo123']
+        dif = diferenca_vs_melhor(df_filtrado, agencias=['Grupo123'], excluir=['Grupo123'])
+    else:
+        df_conc = df_filtrado[~df_filtrado['Agência/Companhia'].isin(flt['agencias_principais'])]
+        dif = diferenca_vs_melhor(df_filtrado, agencias=['123MILHAS', 'MAXMILHAS'])
+    _igual(r['concorrentes'], preco_medio_cubo(df_conc, 'Agência/Companhia').reset_index().sort_values('Preço'))
+    _igual(r['diferencas'], dif)
+    # e o cubo responde como as linhas
+    linhas = flt['df_filtrado']
+    esperado = linhas[linhas['Agência/Companhia'].isin(alvo)].groupby('Agência/Companhia', observed=True)['Preço'].mean()
+    if r['principais'] is None:
+        assert esperado.empty; return
+    np.testing.assert_allclose(r['principais'].set_index('Agência/Companhia')['Preço'].loc[esperado.index], esperado, rtol=1e-6)
+
+# ==================== 2. PARTICIPAÇÃO NOS RANKINGS ====================
+def test_participacao_rankings(caso):
+    df, spec, flt = caso
+    r = an.participacao_rankings(df, spec)
+    counts = ofertas_cubo(cubo_filtrado(flt), ['Agência/Companhia', 'RANKING']).unstack(fill_value=0)
+    if 1 in counts.columns or '1' in counts.columns:
+        chave = 1 if 1 in counts.columns else '1'
+        counts = counts.sort_values(by=chave, ascending=False)
+    counts_tot = counts.copy()
+    counts_tot['Total'] = counts_tot.sum(axis=1)
+    counts_tot.loc['Total'] = counts_tot.sum(numeric_only=True, axis=0)
+    pct_row = (counts.divide(counts.sum(axis=1).replace(0, np.nan), axis=0) * 100).fillna(0).round(2)
+    col_r1 = 1 if 1 in pct_row.columns else ('1' if '1' in pct_row.columns else None)
+    if col_r1 is not None:
+        pct_row = pct_row.sort_values(by=col_r1, ascending=False)
+    pct_col = (counts.divide(counts.sum(axis=0).replace(0, np.nan), axis=1) * 100).fillna(0).round(2)
+    pd.testing.assert_frame_equal(r['contagens'], counts_tot)
+    pd.testing.assert_frame_equal(r['pct_linha'], pct_row)
+    pd.testing.assert_frame_equal(r['pct_coluna'], pct_col)
+    assert int(r['contagens'].loc['Total', 'Total']) == len(flt['df_filtrado'])
+
+# ==================== 3. VANTAGEM POR TRECHO ====================
+def _moda_por_trecho(d: pd.DataFrame, col: str) -> pd.DataFrame:
+    x = d[['TRECHO', col]].assign(_ordem=np.arange(len(d))).dropna(subset=[col])
+    n = x.groupby(['TRECHO', col], observed=True)['_ordem'].agg(['size', 'min']).reset_index()
+    n = n.sort_values(['TRECHO', 'size', 'min'], ascending=[True, False, True], kind='stable')
+    return n.drop_duplicates('TRECHO')[['TRECHO', col]]
+
+def test_vantagem_por_trecho(caso):
+    df, spec, flt = caso
+    r = an.vantagem_por_trecho(df, spec)
+    pv = podio_buscas(flt)
+    pv = pv.dropna(subset=['Preço_1','Preço_2','Agência_1','Agência_2'])
+    pv = pv[pv['Agência_1'] != pv['Agência_2']]
+    assert r['comparaveis'] == len(pv)
+    if pv.empty: return
+    pv['Diferença_2_pct'] = ((pv['Preço_2'] - pv['Preço_1']) / pv['Preço_1'] * 100).round(2)
+    pv['Diferença_3_pct'] = ((pv['Preço_3'] - pv['Preço_1']) / pv['Preço_1'] * 100).round(2)
+    for ag in GRUPO123:
+        d = pv[pv['Agência_1'] == ag]
+        if d.empty:
+            assert r['top'][ag].empty; continue
+        top = (d.groupby('TRECHO', observed=True)
+                 .agg(Vitorias=('TRECHO','count'), Menor_Preco_1=('Preço_1','min'), Menor_Preco_2=('Preço_2','min'),
+                      Diferenca_Media_2=('Diferença_2_pct','mean'), Menor_Preco_3=('Preço_3','min'),
+                      Diferenca_Media_3=('Diferença_3_pct','mean'))
+                 .sort_values('Diferenca_Media_2', ascending=False).head(20).reset_index())
+        top = top.merge(_moda_por_trecho(d, 'Agência_2'), on='TRECHO', how='left').merge(
+            _moda_por_trecho(d, 'Agência_3'), on='TRECHO', how='left')
+        assert list(r['top'][ag]['TRECHO']) == list(top['TRECHO'])
+        assert list(r['top'][ag]['Vitorias']) == list(top['Vitorias'])
+        assert list(r['top'][ag]['2º Lugar']) == list(top['Agência_2'])
+        np.testing.assert_allclose(r['top'][ag]['Diferença (%) para 2º'], top['Diferenca_Media_2'])
+
+def test_vantagem_por_trecho_nas_linhas(caso):
+    """Pódio por pivot_table das linhas (1º de cada posição por busca), como na página original."""
+    df, spec, flt = caso
+    r = an.vantagem_por_trecho(df, spec)
+    base = _linhas_ts(flt)[['TRECHO','Data/Hora da Busca','Agência/Companhia','Preço','RANKING']].dropna()
+    base = base[base['RANKING'].isin([1,2,3])].astype({'TRECHO': str, 'Agência/Companhia': str, 'RANKING': int})
+    if base.empty:
+        assert r['comparaveis'] == 0; return
+    pv = (base.pivot_table(index=['TRECHO','Data/Hora da Busca'], columns='RANKING',
+                           values=['Preço','Agência/Companhia'], aggfunc='first').reset_index())
+    pv.columns = ['_'.join(map(str,c)).strip('_') for c in pv.columns.to_flat_index()]
+    pv = pv.rename(columns={f'Agência/Companhia_{i}': f'Agência_{i}' for i in (1, 2, 3)})
+    assert r['buscas'] == len(pv)
+    pv = pv.dropna(subset=['Preço_1','Preço_2','Agência_1','Agência_2'])
+    pv = pv[pv['Agência_1'] != pv['Agência_2']]
+    assert r['comparaveis'] == len(pv)
+    pv['Diferença_2_pct'] = ((pv['Preço_2'] - pv['Preço_1']) / pv['Preço_1'] * 100).round(2)
+    for ag in GRUPO123:
+        d = pv[pv['Agência_1'] == ag]
+        if d.empty:
+            assert ag not in r['top'] or r['top'][ag].empty; continue
+        top = (d.groupby('TRECHO').agg(Vitorias=('TRECHO','count'), Menor_Preco_1=('Preço_1','min'),
+                                       Diferenca_Media_2=('Diferença_2_pct','mean'))
+                 .sort_values('Diferenca_Media_2', ascending=False).head(20).reset_index())
+        seg = d.groupby('TRECHO')['Agência_2'].agg(lambda x: Counter(x).most_common(1)[0][0])
+        t = r['top'][ag]
+        assert list(t['TRECHO'].astype(str)) == list(top['TRECHO'])
+        assert list(t['Vitorias']) == list(top['Vitorias'])
+        assert list(t['2º Lugar'].astype(str)) == list(seg.loc[top['TRECHO']])
+        np.testing.assert_allclose(t['Menor Preço 1º Lugar'], top['Menor_Preco_1'], rtol=1e-6)
+        np.testing.assert_allclose(t['Diferença (%) para 2º'], top['Diferenca_Media_2'], rtol=1e-5)
+
+# ==================== 4. MELHOR PREÇO POR HORA DO VOO ====================
+def test_melhor_preco_por_hora_e_mapa(caso):
+    df, spec, flt = caso
+    assert CuboHoraVoo.coluna_horario(df)
+    r = an.melhor_preco_por_hora(df, spec)
+    df_h = cubo_filtrado(flt, cubo='cubo_hora_voo')
+    best_by_hour = df_h.groupby('HORA_VOO')['PRECO_MIN'].min().rename_axis('Hora do Voo').reset_index(name='Preço (R$)')
+    best_by_hour['Agência'] = 'Melhor Preço'
+    por_agencia = df_h.groupby(['Agência/Companhia','HORA_VOO'], observed=True)['PRECO_MIN'].min().reset_index()
+    por_agencia.columns = ['Agência','Hora do Voo','Preço (R$)']
+    por_agencia['Agência'] = por_agencia['Agência'].astype(str)
+    presentes = set(por_agencia['Agência'])
+    agencias = [a for a in (['Grupo123'] if flt['config_123_max_filtro'] == 'Grupo123' else GRUPO123) if a in presentes]
+    if not agencias and flt['agencias_principais']:
+        agencias = [a for a in flt['agencias_principais'] if a in presentes]
+    series = por_agencia[por_agencia['Agência'].isin(agencias)]
+    series = series.iloc[np.argsort(series['Agência'].map({a: i for i, a in enumerate(agencias)}).to_numpy(), kind='stable')]
+    _igual(r['serie'], pd.concat([best_by_hour, series], ignore_index=True))
+
+    for medida in ('Menor preço', 'Preço médio'):
+        g = df_h.groupby(['ADVP','HORA_VOO'], observed=True)
+        valores = g['PRECO_MIN'].min() if medida == 'Menor preço' else g['PRECO_SOMA'].sum() / g['PRECO_N'].sum()
+        mapa = valores.unstack('HORA_VOO').reindex(columns=range(24))
+        mapa = mapa.reindex([a for a in ADVPS_ORDEM if a in mapa.index] + [a for a in mapa.index if a not in ADVPS_ORDEM])
+        pd.testing.assert_frame_equal(an.mapa_hora_advp(df, spec, medida), mapa)
+
+# ==================== 5. CASCATAS 123 x MAX ====================
+def test_cascatas_nas_linhas(caso):
+    df, spec, flt = caso
+    r = an.cascatas(df, spec)
+    linhas = _linhas_ts(flt)
+    presentes = set(linhas['Agência/Companhia'].unique())
+    for ag in GRUPO123:
+        if ag not in presentes:
+            assert ag not in r['advp']; continue
+        advp = [(str(a), v) for a in ADVPS_ORDEM if (v := _dif_linhas(linhas[linhas['ADVP']==a], ag)) is not None]
+        assert list(r['advp'][ag]['ADVP'].astype(str)) == [a for a, _ in advp]
+        np.testing.assert_allclose(r['advp'][ag]['DifPct'], [v for _, v in advp], rtol=1e-5)
+        reg = sorted((reg, v) for reg, std in REGIOES_TRECHOS_STD.items()
+                     if (v := _dif_linhas(linhas[linhas['TRECHO_STD'].isin(std)], ag)) is not None)
+        assert list(r['regiao'][ag]['REGIÃO']) == [g for g, _ in reg]
+        np.testing.assert_allclose(r['regiao'][ag]['DifPct'], [v for _, v in reg], rtol=1e-5)
+
+# ==================== 6. VISÕES TEMPORAIS ====================
+@pytest.mark.parametrize('visao', ['Semanal', 'Mensal'])
+def test_series_por_periodo(caso, visao):
+    df, spec, flt = caso
+    r = an.series_por_periodo(df, spec, visao)
+    cubo_ts = cubo_filtrado(flt, timeseries=True, periodo=visao)
+    comp = cubo_ts[~cubo_ts['Agência/Companhia'].isin(('123MILHAS','MAXMILHAS'))]
+    top3 = [] if comp.empty else list(ofertas_cubo(comp, 'Agência/Companhia').sort_values(ascending=False).head(3).index)
+    alvo = [a for a in ['123MILHAS','MAXMILHAS'] if a in cubo_ts['Agência/Companhia'].unique()] + top3
+    sel = cubo_ts[cubo_ts['Agência/Companhia'].isin(alvo)]
+    assert r['total_ofertas'] == int(cubo_ts['OFERTAS'].sum())
+    _igual(r['preco'], preco_medio_cubo(sel, ['PERIODO','Agência/Companhia']).reset_index())
+    _igual(r['ofertas'], ofertas_cubo(sel, ['PERIODO','Agência/Companhia']).reset_index(name='Ofertas'))
+    for rnk in (1, 2, 3):
+        gr = ofertas_cubo(cubo_ts[(cubo_ts['RANKING']==rnk) & (cubo_ts['Agência/Companhia'].isin(alvo))],
+                          ['PERIODO','Agência/Companhia']).reset_index(name='Ofertas')
+        _igual(r['ofertas_ranking'][rnk], gr)
+
+@pytest.mark.parametrize('visao', ['Semanal', 'Mensal'])
+def test_series_por_periodo_nas_linhas(caso, visao):
+    """6.1, 6.2 e os laços diff_vs_best_by_period_* (6.5–6.7) da página original, nas linhas."""
+    df, spec, flt = caso
+    r = an.series_por_periodo(df, spec, visao)
+    d = add_period_column(_linhas_ts(flt), visao, *flt['datas_sel'][:2])
+    if d.empty:
+        assert r['total_ofertas'] == 0; return
+    ag = d['Agência/Companhia']
+    comp = d[~ag.isin(GRUPO123)]
+    top3 = list(comp.groupby('Agência/Companhia', observed=True).size().sort_values(ascending=False).head(3).index)
+    principais = [a for a in GRUPO123 if a in ag.unique()]
+    sel = d[ag.isin(principais + top3)]
+    assert r['total_ofertas'] == len(d)
+    preco = sel.groupby(['PERIODO','Agência/Companhia'], observed=True)['Preço'].mean()
+    np.testing.assert_allclose(r['preco'].set_index(['PERIODO','Agência/Companhia'])['Preço'].loc[preco.index],
+                               preco, rtol=1e-6)
+    ofertas = sel.groupby(['PERIODO','Agência/Companhia'], observed=True).size()
+    assert r['ofertas'].set_index(['PERIODO','Agência/Companhia'])['Ofertas'].to_dict() == ofertas.to_dict()
+
+    vol = {reg: int(d['TRECHO_STD'].isin(std).sum()) for reg, std in REGIOES_TRECHOS_STD.items()}
+    top_regs = [g for g, n in sorted(vol.items(), key=lambda x: x[1], reverse=True)[:5] if n > 0]
+    por_agencia = {}
+    for a in principais:
+        advp = {}
+        for v in sorted(int(x) for x in d['ADVP'].dropna().unique()):
+            advp.update(_por_periodo(d[d['ADVP']==v], a, str(v)))
+        _mesmos_valores(r['dif_advp'][a], ['PERIODO','ADVP'], advp)
+        reg = {}
+        for g, std in REGIOES_TRECHOS_STD.items():
+            if g in top_regs: reg.update(_por_periodo(d[d['TRECHO_STD'].isin(std)], a, g))
+        _mesmos_valores(r['dif_regiao'][a], ['PERIODO','REGIÃO'], reg)
+        por_agencia.update(_por_periodo(d, a, a))
+    _mesmos_valores(r['dif_agencias'], ['PERIODO','Agência'], por_agencia)
+
+def test_series_por_hora(caso):
+    df, spec, flt = caso
+    r = an.series_por_hora(df, spec)
+    dH = rollup_horario_filtrado(flt)
+    principais_h = [a for a in ['123MILHAS','MAXMILHAS'] if a in dH['Agência/Companhia'].unique()]
+    ag_series = []
+    for ag in principais_h:
+        s = dH[dH['Agência/Companhia']==ag].groupby('HORA')['PRECO_MIN'].min().reset_index(name='Preço')
+        s['Série'] = ag; ag_series.append(s)
+    smin = dH.groupby('HORA')['PRECO_MIN'].min().reset_index(name='Preço'); smin['Série'] = 'Melhor Preço'
+    ag_series.append(smin)
+    _igual(r['melhor_preco'], pd.concat(ag_series, ignore_index=True))
+    dr1 = dH[dH['RANKING']==1]
+    win = dr1.groupby('HORA')['OFERTAS'].sum()
+    np.testing.assert_array_equal(r['ranking'][1].query("Série == 'Melhor Preço'")['Ofertas'], win.to_numpy())
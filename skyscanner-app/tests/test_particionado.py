@@ -0,0 +1,28 @@
+# tests/test_particionado.py — catálogo do DatasetParticionado (varredura) x catálogo da base carregada
+from datetime import date
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from common import CatalogoFacetas, DatasetParticionado, REGIOES, _normalizar_ofertas
+from tools.gerar_ofertas import gerar_dia, rotas
+
+def test_catalogo_por_varredura_igual_ao_da_base(tmp_path):
+    """Datas da busca em texto dd/mm/aaaa atravessando a virada do mês: '01/08' < '31/07' como texto,
+    então limites agregados antes da conversão sairiam trocados."""
+    r = rotas(3)
+    frames = [gerar_dia(r, d, 700, 3).to_pandas() for d in (date(2025, 7, 30), date(2025, 7, 31), date(2025, 8, 1))]
+    df = pd.concat(frames, ignore_index=True)
+    df['DATA_BUSCA'] = df['Data/Hora da Busca'].dt.date.astype(str)
+    df['Data/Hora da Busca'] = df['Data/Hora da Busca'].dt.strftime('%d/%m/%Y %H:%M:%S')
+    pasta = tmp_path / 'particionado'
+    pq.write_to_dataset(pa.Table.from_pandas(df, preserve_index=False), str(pasta), partition_cols=['DATA_BUSCA'])
+
+    cat = DatasetParticionado(str(pasta), True).catalogo()
+    ref = CatalogoFacetas(_normalizar_ofertas(df.drop(columns='DATA_BUSCA'), True))
+    assert cat['Todas']['datas'] == (date(2025, 7, 30), date(2025, 8, 1))
+    assert sum(cat[r_]['buscas'] for r_ in REGIOES) <= cat['Todas']['buscas']
+    for r_ in ['Todas'] + REGIOES:
+        for k in ('trechos', 'agencias', 'advp', 'datas', 'ultima', 'buscas', 'ofertas'):
+            assert cat[r_][k] == ref[r_][k], (r_, k)
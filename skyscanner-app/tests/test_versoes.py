@@ -0,0 +1,61 @@
+# tests/test_versoes.py — sessões que ainda seguram o frame anterior durante uma atualização da base
+import pandas as pd
+import pytest
+
+from common import _DERIVADOS, BaseOfertas, _versao_de, aplicar_filtros, base_de, cache_recortes
+import analytics as an
+from conftest import gravar
+
+@pytest.fixture
+def base(lotes, tmp_path):
+    pasta = str(tmp_path / 'lotes')
+    gravar(pasta, lotes['frames'][:2])
+    b = BaseOfertas(pasta, True)
+    assert b.atualizar(forcar=True)
+    return b, pasta, lotes
+
+def test_token_de_versao_vem_do_frame(base):
+    b, pasta, lotes = base
+    velho = b.df
+    token = _versao_de(velho)
+    spec = an.especificar_filtros(velho, datas_sel=('2025-08-01', '2025-08-31'))
+    r_velho = an.participacao_rankings(velho, spec)
+    gravar(pasta, lotes['frames'][2:], inicio=2)
+    assert b.atualizar(forcar=True)
+    assert _versao_de(velho) == token != _versao_de(b.df)
+    # a consulta do frame anterior continua respondendo pela versão dele (mesma chave, mesmo resultado)
+    assert an.participacao_rankings(velho, spec)['contagens'].equals(r_velho['contagens'])
+    assert an.participacao_rankings(b.df, spec)['ofertas'] > r_velho['ofertas']
+
+def _recorte(df, spec):
+    return aplicar_filtros(df, spec)['df_filtrado']
+
+def test_frame_anterior_usa_os_proprios_derivados_apos_recarga(base):
+    b, pasta, lotes = base
+    velho = b.df
+    spec = an.especificar_filtros(velho, regiao_sel='SUDESTE', datas_sel=('2025-08-01', '2025-08-31'))
+    antes = _recorte(velho, spec)
+    cache_recortes().limpar()
+    gravar(pasta, [lotes['frames'][1].head(50)])             # OFERTAS_0 reescrito -> _recarregar
+    assert b.atualizar(forcar=True) and len(b.df) < len(velho)
+    for nome in _DERIVADOS: b.derivado(nome)
+    pd.testing.assert_frame_equal(_recorte(velho, spec), antes)
+    assert base_de(velho).derivado('indice') is not base_de(b.df).derivado('indice')
+
+def test_frame_anterior_apos_lote_que_preenche_datas_antigas(base):
+    b, pasta, lotes = base
+    velho = b.df
+    for nome in _DERIVADOS: b.derivado(nome)
+    spec = an.especificar_filtros(velho, datas_sel=('2025-08-01', '2025-08-01'))
+    antes, r_antes = _recorte(velho, spec), an.series_por_periodo(velho, spec)
+    cache_recortes().limpar()
+    # lote novo com buscas do primeiro dia (datas antigas): cai dentro do filtro da versão nova
+    retro = lotes['frames'][0].assign(**{'Nome do Arquivo': lambda d: 'retro_' + d['Nome do Arquivo']})
+    gravar(pasta, [retro], inicio=2)
+    assert b.atualizar(forcar=True)
+    pd.testing.assert_frame_equal(_recorte(velho, spec), antes)
+    pd.testing.assert_frame_equal(an.series_por_periodo(velho, spec)['ofertas'], r_antes['ofertas'])
+    assert len(_recorte(b.df, spec)) == 2 * len(antes)
+    # derivados anexados publicados junto do frame novo; o frame anterior segue com os dele
+    assert set(base_de(b.df).derivados()) == set(_DERIVADOS)
+    assert len(base_de(velho).derivado('indice')) == len(velho)
@@ -0,0 +1,201 @@
+# tools/benchmark.py — tempo e pico de memória dos caminhos do app em bases de vários tamanhos
+"""Mede carga, filtros, períodos e a agregação de cada página (analytics) e acrescenta a execução
+a um JSON, para comparar execuções e achar regressões.
+
+Etapas por base:
+    carregar_dados         leitura + normalização do parquet (sem cache Arrow)
+    carregar_dados_cache   mesma base pelo cache Arrow (memory-map)
+    get_sidebar_filters    especificar_filtros + aplicar_filtros: catálogo, índice e máscara (frio)
+    get_sidebar_filters_2  outro filtro com catálogo/índice prontos
+    add_period_column      Semanal, Quinzenal e Mensal sobre as ofertas filtradas
+    <página> <consulta>    frio (1ª chamada, monta cubos/pódio), recalculo (cache de recortes vazio,
+                           mediana de --repeticoes) e memo (resultado em cache)
+
+Uso (a partir de skyscanner-app/):
+    python -m tools.benchmark --linhas 100k 1M            # gera data/sintetico/OFERTAS_<n>.parquet se faltar
+    python -m tools.benchmark --fonte data/OFERTAS.parquet -o benchmark.json --comparar
+"""
+import argparse, gc, json, os, platform, statistics, subprocess, sys, threading, time, tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import analytics as an
+from common import CACHE_DIR, CARGA_COMPACTA, add_period_column, cache_recortes, fmt_int_br, _arquivo_cache, _mem_mb
+from tools.gerar_ofertas import gerar, quantidade
+
+PASTA_SINTETICO = os.path.join('data', 'sintetico')
+# razão de tempo a partir da qual --comparar marca a etapa como regressão
+LIMIAR_REGRESSAO = 1.2
+
+CONSULTAS = [
+    ('01 precos_por_agencia', an.precos_por_agencia, ()),
+    ('02 participacao_rankings', an.participacao_rankings, ()),
+    ('03 vantagem_por_trecho', an.vantagem_por_trecho, ()),
+    ('04 melhor_preco_por_hora', an.melhor_preco_por_hora, ()),
+    ('04 mapa_hora_advp', an.mapa_hora_advp, ('Menor preço',)),
+    ('05 cascatas', an.cascatas, ()),
+    ('06 series_por_periodo', an.series_por_periodo, ('Semanal',)),
+    ('06 series_por_hora', an.series_por_hora, ()),
+]
+
+# ==================== MEDIÇÃO ====================
+def _rss_mb() -> float:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+class Medida:
+    """Tempo de parede e pico de memória (MB acima do início) de um bloco. No Linux o pico é o RSS amostrado
+    a cada 5 ms (pega também buffers Arrow e mmap); sem /proc, o pico do tracemalloc (Python/NumPy)."""
+    def __init__(self):
+        self.proc = os.path.exists('/proc/self/statm')
+
+    def _amostrar(self):
+        while not self._fim.wait(0.005):
+            self._pico = max(self._pico, _rss_mb())
+
+    def __enter__(self):
+        gc.collect()
+        if self.proc:
+            self._inicio = self._pico = _rss_mb()
+            self._fim = threading.Event()
+            self._t = threading.Thread(target=self._amostrar, daemon=True); self._t.start()
+        else:
+            tracemalloc.start()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.s = time.perf_counter() - self._t0
+        if self.proc:
+            self._fim.set(); self._t.join()
+            self.pico_mb = max(self._pico, _rss_mb()) - self._inicio
+        else:
+            self.pico_mb = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+        return False
+
+    def registro(self, **extra) -> dict:
+        return dict(s=round(self.s, 4), pico_mb=round(max(self.pico_mb, 0.0), 1), **extra)
+
+def medir(fn, *args, **kwargs):
+    with Medida() as m:
+        r = fn(*args, **kwargs)
+    return r, m
+
+# ==================== ETAPAS ====================
+def medir_base(caminho: str, repeticoes: int, regiao: str) -> dict:
+    etapas = {}
+    arq = _arquivo_cache(caminho, CARGA_COMPACTA)
+    if arq and os.path.exists(arq): os.remove(arq)
+    df, m = medir(an.abrir, caminho)
+    etapas['carregar_dados'] = m.registro(linhas=len(df))
+    memoria = round(_mem_mb(df), 1)
+    if arq and os.path.exists(arq):
+        del df; gc.collect()
+        df, m = medir(an.abrir, caminho)
+        etapas['carregar_dados_cache'] = m.registro()
+
+    def filtros(**campos):
+        spec = an.especificar_filtros(df, regiao_sel=regiao, **campos)
+        return spec, an.aplicar_filtros(df, spec)
+    (spec, flt), m = medir(filtros)
+    etapas['get_sidebar_filters'] = m.registro(linhas=len(flt['_posicoes']))
+    _, m = medir(filtros, periodo='Últimos 30 dias')
+    etapas['get_sidebar_filters_2'] = m.registro()
+
+    ofertas = flt['df_filtrado']
+    sd, ed = spec.datas_sel
+    _, m = medir(lambda: [add_period_column(ofertas, modo, sd, ed) for modo in ('Semanal', 'Quinzenal', 'Mensal')])
+    etapas['add_period_column'] = m.registro(linhas=len(ofertas))
+    del ofertas, flt
+
+    for nome, fn, args in CONSULTAS:
+        _, frio = medir(fn, df, spec, *args)
+        recalculos = []
+        for _ in range(repeticoes):
+            cache_recortes().limpar()
+            recalculos.append(medir(fn, df, spec, *args)[1])
+        _, memo = medir(fn, df, spec, *args)
+        etapas[nome] = dict(frio=frio.registro(),
+                            recalculo=dict(s=round(statistics.median(r.s for r in recalculos), 4),
+                                           pico_mb=round(max(max(r.pico_mb for r in recalculos), 0.0), 1)),
+                            memo=memo.registro())
+    return dict(fonte=caminho, linhas=len(df), memoria_mb=memoria, filtros=dict(regiao_sel=regiao, datas_sel=[str(d) for d in spec.datas_sel]),
+                etapas=etapas)
+
+def _fontes(a) -> list:
+    fontes = list(a.fonte or [])
+    for n in a.linhas or []:
+        linhas = quantidade(n)
+        caminho = os.path.join(PASTA_SINTETICO, f"OFERTAS_{n}" + ('' if a.por_dia else '.parquet'))
+        if not os.path.exists(caminho):
+            print(f"gerando {fmt_int_br(linhas)} linhas em {caminho}...", flush=True)
+            gerar(linhas, caminho, por_dia=a.por_dia)
+        fontes.append(caminho)
+    return fontes
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+# ==================== RELATÓRIO ====================
+def _linhas_relatorio(base: dict):
+    for etapa, r in base['etapas'].items():
+        for fase, v in (r.items() if 'frio' in r else [('', r)]):
+            yield f"{etapa} {fase}".strip(), v
+
+def imprimir(base: dict, anterior: dict | None = None):
+    ant = dict(_linhas_relatorio(anterior)) if anterior else {}
+    print(f"\n{base['fonte']} — {fmt_int_br(base['linhas'])} linhas, {base['memoria_mb']} MB em memória")
+    for nome, v in _linhas_relatorio(base):
+        txt = f"  {nome:<40} {v['s']*1000:>10.1f} ms {v['pico_mb']:>9.1f} MB"
+        a = ant.get(nome)
+        if a:
+            razao = v['s'] / a['s'] if a['s'] else 1.0
+            marca = ' ▲' if razao > LIMIAR_REGRESSAO and v['s'] - a['s'] > 0.005 else ''
+            txt += f"   {razao:>5.2f}x (antes {a['s']*1000:.1f} ms){marca}"
+        print(txt)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--fonte', nargs='*', help='arquivos .parquet ou diretórios de lotes já existentes')
+    ap.add_argument('--linhas', nargs='*', help='tamanhos de base sintética (ex.: 100k 1M 10M 50M)')
+    ap.add_argument('--por-dia', action='store_true', help='bases sintéticas como diretório de lotes diários')
+    ap.add_argument('--regiao', default='Todas', help='região dos filtros (padrão: Todas)')
+    ap.add_argument('--repeticoes', type=int, default=3, help='repetições do recalculo de cada consulta')
+    ap.add_argument('-o', '--saida', default='benchmark.json', help='JSON de resultados (a execução é acrescentada)')
+    ap.add_argument('--comparar', action='store_true', help='compara com a execução anterior da mesma fonte no JSON')
+    a = ap.parse_args(argv)
+
+    fontes = _fontes(a)
+    if not fontes:
+        print("Informe --fonte e/ou --linhas.", file=sys.stderr); return 1
+    try:
+        with open(a.saida, encoding='utf-8') as f: historico = json.load(f)
+    except (OSError, ValueError):
+        historico = {'execucoes': []}
+
+    execucao = dict(quando=datetime.now().isoformat(timespec='seconds'), commit=_commit(), maquina=platform.platform(),
+                    python=platform.python_version(), pandas=pd.__version__, numpy=np.__version__,
+                    carga_compacta=CARGA_COMPACTA, cache_arrow=bool(CACHE_DIR), bases=[])
+    for caminho in fontes:
+        base = medir_base(caminho, a.repeticoes, a.regiao)
+        anterior = next((b for e in reversed(historico['execucoes']) for b in e['bases']
+                         if b['fonte'] == caminho and b['linhas'] == base['linhas']), None) if a.comparar else None
+        imprimir(base, anterior)
+        execucao['bases'].append(base)
+        cache_recortes().limpar(); gc.collect()
+
+    historico['execucoes'].append(execucao)
+    os.makedirs(os.path.dirname(a.saida) or '.', exist_ok=True)
+    with open(a.saida, 'w', encoding='utf-8') as f:
+        json.dump(historico, f, ensure_ascii=False, indent=1)
+    print(f"\nResultados acrescentados em {a.saida}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,195 @@
+# tools/carga.py — teste de carga ponta a ponta: latência de rerun das páginas com sessões concorrentes
+"""Abre N sessões simultâneas (streamlit.testing.v1.AppTest, uma thread por sessão, como no servidor)
+que percorrem Home e cada página aplicando um roteiro de filtros, e mede o tempo de parede de cada rerun.
+Relata p50/p95/p99 por página e por interação e acrescenta a execução a um JSON.
+
+Roteiro por página (ROTEIRO + EXTRAS da página):
+    abrir    primeiro run da sessão na página
+    regiao   Região (cada sessão uma região)
+    advp     Valor fixo de ADVP
+    datas    Período -> Últimos 30 dias
+    123max   Análise 123/Max -> Grupo123
+    rerun    mesmo estado de novo (só caches)
+    medida (rerun completo)    página 04: medida do mapa de calor -> Preço médio
+    visao                      página 06: agregação temporal -> Mensal (visao_2: Quinzenal)
+
+Widget dentro de fragmento (página 04): o AppTest não tem rerun só do fragmento, at.run() reexecuta o
+script inteiro. Essas linhas medem um rerun completo com a mudança (teto do que o usuário espera), não o
+corpo do fragmento, e saem marcadas assim no relatório. O radio da página 06 fica no corpo do script e
+reexecuta os fragmentos por chave (st.rerun no on_change), o que o AppTest respeita: a medida é a real.
+
+Uso (a partir de skyscanner-app/):
+    python -m tools.carga --linhas 1M --sessoes 4
+    python -m tools.carga --fonte data/OFERTAS.parquet --sessoes 8 --paginas 06 --rodadas 3 --comparar
+"""
+import argparse, glob, json, os, platform, sys, threading, time
+from datetime import datetime
+
+import numpy as np
+
+import common
+from common import fmt_int_br
+from tools.benchmark import _commit, _fontes
+from streamlit.testing.v1 import AppTest
+
+APP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PERCENTIS = (50, 95, 99)
+# razão de p95 a partir da qual --comparar marca a interação como regressão
+LIMIAR_REGRESSAO = 1.2
+
+# (interação, rótulo do selectbox da sidebar, escolha(opções, sessão)); None = rerun sem mudança
+ROTEIRO = [
+    ('regiao', 'Região', lambda o, i: o[1 + i % (len(o) - 1)]),
+    ('advp', 'Valor fixo de ADVP', lambda o, i: o[1 + i % (len(o) - 1)]),
+    ('datas', 'Período', lambda o, i: 'Últimos 30 dias'),
+    ('123max', 'Como analisar 123MILHAS e MAXMILHAS?', lambda o, i: 'Grupo123'),
+    ('rerun', None, None),
+]
+# interações do corpo da página: (interação, opção que identifica o radio, valor, widget dentro de fragmento);
+# as de widget dentro de fragmento são medidas como rerun completo do script (ver docstring), daí o sufixo
+RERUN_COMPLETO = ' (rerun completo)'
+EXTRAS = {
+    '04': [('medida', 'Preço médio', 'Preço médio', True)],
+    '06': [('visao', 'Mensal', 'Mensal', False), ('visao_2', 'Quinzenal', 'Quinzenal', False)],
+}
+
+def paginas(filtro: list | None = None) -> list:
+    todas = [os.path.join(APP, 'Home.py')] + sorted(glob.glob(os.path.join(APP, 'pages', '*.py')))
+    if not filtro: return todas
+    return [p for p in todas if any(os.path.basename(p).startswith(f) for f in filtro)]
+
+def _linhas(caminho: str) -> int:
+    df = common.carregar_dados(caminho)                 # já em cache (aquecimento)
+    return df.dataset.count_rows() if isinstance(df, common.DatasetParticionado) else len(df)
+
+def _nome(pagina: str) -> str:
+    return os.path.splitext(os.path.basename(pagina))[0]
+
+# ==================== SESSÕES ====================
+def _rodar(at: AppTest, timeout: float) -> tuple:
+    t0 = time.perf_counter()
+    at.run(timeout=timeout)
+    return time.perf_counter() - t0, [str(e.value)[:300] for e in at.exception]
+
+def _passos(at: AppTest, pagina: str, sessao: int):
+    """(interação, ação) do roteiro que a página comporta; ação None = rerun sem mudança."""
+    for nome, rotulo, escolha in ROTEIRO:
+        if rotulo is None:
+            yield nome, None; continue
+        w = next((w for w in at.sidebar.selectbox if w.label == rotulo), None)
+        if w is not None:
+            yield nome, (lambda w=w, v=escolha(w.options, sessao): w.select(v))
+    for nome, opcao, valor, no_fragmento in EXTRAS.get(_nome(pagina)[:2], []):
+        r = next((r for r in at.radio if opcao in r.options), None)
+        if r is not None:
+            yield nome + (RERUN_COMPLETO if no_fragmento else ''), (lambda r=r, v=valor: r.set_value(v))
+
+def sessao(i: int, pags: list, rodadas: int, pausa: float, timeout: float, amostras: list, trava: threading.Lock):
+    """Uma sessão: percorre as páginas (começando numa diferente por sessão) aplicando o roteiro."""
+    ordem = pags[i % len(pags):] + pags[:i % len(pags)]
+    for _ in range(rodadas):
+        for pagina in ordem:
+            at = AppTest.from_file(pagina, default_timeout=timeout)
+            s, erros = _rodar(at, timeout)
+            registros = [(_nome(pagina), 'abrir', s, erros)]
+            for nome, acao in list(_passos(at, pagina, i)):
+                if pausa: time.sleep(pausa)
+                if acao is not None: acao()
+                s, erros = _rodar(at, timeout)
+                registros.append((_nome(pagina), nome, s, erros))
+            with trava: amostras.extend(registros)
+
+def executar(caminho: str, sessoes: int, pags: list, rodadas: int, pausa: float, timeout: float) -> dict:
+    common.CAMINHO_ARQUIVO = caminho                     # as páginas leem o caminho do common a cada rerun
+    os.environ['PARQUET_PATH'] = caminho
+    # aquecimento: carga da base e catálogo fora das medidas
+    s_carga, erros = _rodar(AppTest.from_file(pags[0], default_timeout=timeout), timeout)
+    if erros: raise RuntimeError(f"{_nome(pags[0])}: {erros[0]}")
+
+    amostras, trava = [], threading.Lock()
+    ts = [threading.Thread(target=sessao, args=(i, pags, rodadas, pausa, timeout, amostras, trava), daemon=True)
+          for i in range(sessoes)]
+    t0 = time.perf_counter()
+    for t in ts: t.start()
+    for t in ts: t.join()
+    total = time.perf_counter() - t0
+    return dict(aquecimento_s=round(s_carga, 3), duracao_s=round(total, 3), reruns=len(amostras),
+                reruns_por_s=round(len(amostras) / total, 2) if total else None, **resumir(amostras))
+
+# ==================== RELATÓRIO ====================
+def _estat(tempos: list) -> dict:
+    p = np.percentile(tempos, PERCENTIS)
+    return dict(n=len(tempos), **{f"p{q}": round(float(v), 4) for q, v in zip(PERCENTIS, p)}, max=round(max(tempos), 4))
+
+def resumir(amostras: list) -> dict:
+    por_pagina, por_interacao, erros = {}, {}, {}
+    for pag, inter, s, errs in amostras:
+        por_pagina.setdefault(pag, []).append(s)
+        por_interacao.setdefault(pag, {}).setdefault(inter, []).append(s)
+        if errs: erros.setdefault(f"{pag} {inter}", errs[0])
+    return dict(paginas={p: dict(total=_estat(v), interacoes={k: _estat(t) for k, t in por_interacao[p].items()})
+                         for p, v in por_pagina.items()},
+                erros=erros)
+
+def imprimir(r: dict, anterior: dict | None = None):
+    print(f"\n{r['fonte']} — {fmt_int_br(r['linhas'])} linhas • {r['sessoes']} sessões • "
+          f"aquecimento {r['aquecimento_s']:.1f}s • {r['reruns']} reruns em {r['duracao_s']:.1f}s ({r['reruns_por_s']}/s)")
+    print(f"  {'página / interação':<44} {'n':>4} " + ' '.join(f"{f'p{q}':>8}" for q in PERCENTIS) + f" {'max':>8}")
+    for pag, v in r['paginas'].items():
+        for inter, e in [('', v['total'])] + list(v['interacoes'].items()):
+            nome = f"  {inter}" if inter else pag
+            txt = f"  {nome[:44]:<44} {e['n']:>4} " + ' '.join(f"{e[f'p{q}']:>7.2f}s" for q in PERCENTIS) + f" {e['max']:>7.2f}s"
+            a = (anterior or {}).get('paginas', {}).get(pag, {})
+            a = a.get('interacoes', {}).get(inter) if inter else a.get('total')
+            if a and a['p95']:
+                razao = e['p95'] / a['p95']
+                txt += f"   p95 {razao:.2f}x" + (' ▲' if razao > LIMIAR_REGRESSAO and e['p95'] - a['p95'] > 0.05 else '')
+            print(txt)
+    if any(RERUN_COMPLETO in i for v in r['paginas'].values() for i in v['interacoes']):
+        print(f"  {RERUN_COMPLETO.strip()}: widget de fragmento medido com o script inteiro (o AppTest não reexecuta só o fragmento)")
+    for k, e in r['erros'].items():
+        print(f"  ERRO {k}: {e}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--fonte', nargs='?', help='arquivo .parquet ou diretório de lotes')
+    ap.add_argument('--linhas', nargs='?', help='tamanho da base sintética (ex.: 100k, 1M), gerada se faltar')
+    ap.add_argument('--por-dia', action='store_true', help='base sintética como diretório de lotes diários')
+    ap.add_argument('--sessoes', type=int, default=4, help='sessões simultâneas (padrão: 4)')
+    ap.add_argument('--paginas', nargs='*', help='prefixos das páginas (ex.: Home 04 06); padrão: todas')
+    ap.add_argument('--rodadas', type=int, default=1, help='vezes que cada sessão percorre as páginas')
+    ap.add_argument('--pausa', type=float, default=0.0, help='segundos entre interações (tempo do usuário)')
+    ap.add_argument('--timeout', type=float, default=600, help='limite de cada rerun em segundos')
+    ap.add_argument('-o', '--saida', default='carga.json', help='JSON de resultados (a execução é acrescentada)')
+    ap.add_argument('--comparar', action='store_true', help='compara o p95 com a execução anterior da mesma fonte e sessões')
+    a = ap.parse_args(argv)
+
+    fontes = _fontes(argparse.Namespace(fonte=[a.fonte] if a.fonte else [], linhas=[a.linhas] if a.linhas else [],
+                                        por_dia=a.por_dia))
+    pags = paginas(a.paginas)
+    if len(fontes) != 1 or not pags:
+        print("Informe uma --fonte ou --linhas e páginas existentes.", file=sys.stderr); return 1
+    caminho = os.path.abspath(fontes[0])
+    try:
+        with open(a.saida, encoding='utf-8') as f: historico = json.load(f)
+    except (OSError, ValueError):
+        historico = {'execucoes': []}
+
+    r = executar(caminho, a.sessoes, pags, a.rodadas, a.pausa, a.timeout)
+    r = dict(quando=datetime.now().isoformat(timespec='seconds'), commit=_commit(), maquina=platform.platform(),
+             cpus=os.cpu_count(), fonte=fontes[0], linhas=_linhas(caminho), sessoes=a.sessoes,
+             rodadas=a.rodadas, pausa_s=a.pausa, **r)
+    anterior = next((e for e in reversed(historico['execucoes'])
+                     if e['fonte'] == r['fonte'] and e['linhas'] == r['linhas'] and e['sessoes'] == r['sessoes']), None) \
+        if a.comparar else None
+    imprimir(r, anterior)
+
+    historico['execucoes'].append(r)
+    os.makedirs(os.path.dirname(a.saida) or '.', exist_ok=True)
+    with open(a.saida, 'w', encoding='utf-8') as f:
+        json.dump(historico, f, ensure_ascii=False, indent=1)
+    print(f"\nResultados acrescentados em {a.saida}")
+    return 1 if r['erros'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+# tools/compactar_ofertas.py — compacta lotes de ofertas em parquet ordenado e com estatísticas
+"""Junta vários lotes .parquet num arquivo (ou dataset hive) ordenado por
+Data/Hora da Busca + TRECHO, com row groups de tamanho controlado e dicionário
+nas colunas de texto, no esquema A..M esperado por common.carregar_dados.
+
+Uso (a partir de skyscanner-app/):
+    python -m tools.compactar_ofertas data/lotes -o data/OFERTAS.parquet
+    python -m tools.compactar_ofertas data/lotes -o data/ofertas_part --particionar
+"""
+import argparse, glob, os, sys, time
+from datetime import timedelta
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from common import (COLUNAS_OFERTAS, COLUNAS_CATEGORIA, PARTICAO_DATA, PARTICAO_REGIAO,
+                    REGIOES_TRECHOS_STD, normalize_trecho, converter_datas, fmt_int_br)
+
+LINHAS_POR_GRUPO = 256_000
+ORDEM = [('Data/Hora da Busca', 'ascending'), ('TRECHO', 'ascending')]
+
+def listar_entradas(entradas) -> list:
+    arqs = []
+    for e in entradas:
+        if os.path.isdir(e): arqs += sorted(glob.glob(os.path.join(e, '**', '*.parquet'), recursive=True))
+        elif os.path.exists(e): arqs.append(e)
+    return arqs
+
+def _tamanho(caminho: str) -> int:
+    if os.path.isfile(caminho): return os.path.getsize(caminho)
+    return sum(os.path.getsize(f) for f in glob.glob(os.path.join(caminho, '**', '*'), recursive=True) if os.path.isfile(f))
+
+def _para_timestamp(col: pa.ChunkedArray) -> pa.ChunkedArray:
+    if pa.types.is_timestamp(col.type): return col.cast(pa.timestamp('ns'))
+    s, _ = converter_datas(pd.Series(col.to_pandas()))
+    return pa.chunked_array([pa.array(s, type=pa.timestamp('ns'))])
+
+def ler_lote(arq: str) -> pa.Table:
+    """Primeiras 13 colunas renomeadas (A..M) com datas/números em tipos nativos."""
+    t = pq.read_table(arq)
+    if t.num_columns < len(COLUNAS_OFERTAS):
+        raise ValueError(f"{arq}: {t.num_columns} colunas, esperado ≥ {len(COLUNAS_OFERTAS)} (A..M).")
+    t = t.select(list(range(len(COLUNAS_OFERTAS)))).rename_columns(COLUNAS_OFERTAS)
+    cols = {c: t.column(c) for c in COLUNAS_OFERTAS}
+    for c in ['Data/Hora da Busca', 'Data do Voo']:
+        cols[c] = _para_timestamp(cols[c])
+    for c in ['Preço', 'ADVP', 'RANKING']:
+        if not pa.types.is_integer(cols[c].type) and not pa.types.is_floating(cols[c].type):
+            cols[c] = pa.chunked_array([pa.array(pd.to_numeric(cols[c].to_pandas(), errors='coerce'))])
+    for c in COLUNAS_CATEGORIA:
+        if pa.types.is_dictionary(cols[c].type): cols[c] = cols[c].cast(pa.string())
+    return pa.table(cols)
+
+def juntar(arqs: list) -> pa.Table:
+    """Concatena os lotes descartando 'Nome do Arquivo' já vistos (mesma regra do BaseOfertas)."""
+    vistos, tabelas = None, []
+    for a in arqs:
+        t = ler_lote(a)
+        nomes = t.column('Nome do Arquivo')
+        if vistos is not None and len(vistos):
+            t = t.filter(pc.invert(pc.fill_null(pc.is_in(nomes, value_set=vistos), False)))
+            nomes = t.column('Nome do Arquivo')
+        u = pc.unique(nomes.drop_null())
+        vistos = u if vistos is None else pa.concat_arrays([vistos, u])
+        tabelas.append(t)
+    return pa.concat_tables(tabelas, promote_options='permissive') if tabelas else None
+
+def _colunas_particao(t: pa.Table) -> pa.Table:
+    dia = pc.strftime(t.column('Data/Hora da Busca'), format='%Y-%m-%d')
+    trechos = pc.unique(t.column('TRECHO')).to_pylist()
+    reg = {tr: r for r, s in REGIOES_TRECHOS_STD.items() for tr in s}
+    mapa = {tr: reg.get(normalize_trecho(tr)) for tr in trechos if tr is not None}
+    idx = pc.index_in(t.column('TRECHO'), value_set=pa.array(list(mapa), pa.string()))
+    regioes = pc.take(pa.array(list(mapa.values()), pa.string()), idx)
+    return t.append_column(PARTICAO_DATA, dia).append_column(PARTICAO_REGIAO, regioes)
+
+def gravar(t: pa.Table, saida: str, particionar: bool, linhas_por_grupo: int):
+    t = t.sort_by(ORDEM)
+    opcoes = dict(compression='zstd', use_dictionary=[c for c in COLUNAS_CATEGORIA], write_statistics=True)
+    if not particionar:
+        os.makedirs(os.path.dirname(saida) or '.', exist_ok=True)
+        tmp = f"{saida}.tmp"
+        pq.write_table(t, tmp, row_group_size=linhas_por_grupo,
+                       sorting_columns=pq.SortingColumn.from_ordering(t.schema, ORDEM), **opcoes)
+        os.replace(tmp, saida)
+        return
+    t = _colunas_particao(t)
+    ds.write_dataset(t, saida, format='parquet', partitioning=[PARTICAO_DATA, PARTICAO_REGIAO],
+                     partitioning_flavor='hive', existing_data_behavior='delete_matching',
+                     max_rows_per_group=linhas_por_grupo, min_rows_per_group=min(linhas_por_grupo, 16_384),
+                     file_options=ds.ParquetFileFormat().make_write_options(**opcoes))
+
+def medir_varredura(fonte, dias: int = 7) -> dict:
+    """Tempo de leitura completa e de um recorte típico (últimos N dias do trecho mais frequente)."""
+    hive = isinstance(fonte, str) and os.path.isdir(fonte)
+    dset = ds.dataset(fonte, format='parquet', partitioning='hive' if hive else None)
+    nomes = dset.schema.names
+    busca, trecho = ds.field(nomes[7]), ds.field(nomes[10])
+    t0 = time.perf_counter(); tudo = dset.to_table(columns=[nomes[7], nomes[10]]); t_total = time.perf_counter() - t0
+    out = dict(linhas=tudo.num_rows, leitura_s=round(t_total, 3))
+    if not pa.types.is_timestamp(dset.schema.field(nomes[7]).type) or tudo.num_rows == 0: return out
+    fim = pc.max(tudo.column(0)).as_py()
+    tr = tudo.column(1).to_pandas().value_counts().idxmax()
+    expr = (busca >= pa.scalar(fim - timedelta(days=dias), dset.schema.field(nomes[7]).type)) & (trecho == tr)
+    t0 = time.perf_counter(); rec = dset.to_table(filter=expr); t_rec = time.perf_counter() - t0
+    out.update(recorte=f"últimos {dias} dias, {tr}", recorte_linhas=rec.num_rows, recorte_s=round(t_rec, 4))
+    return out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('entradas', nargs='+', help='arquivos .parquet ou diretórios de lotes')
+    ap.add_argument('-o', '--saida', required=True, help='arquivo .parquet (ou diretório com --particionar)')
+    ap.add_argument('--particionar', action='store_true', help=f'dataset hive por {PARTICAO_DATA}/{PARTICAO_REGIAO}')
+    ap.add_argument('--linhas-por-grupo', type=int, default=LINHAS_POR_GRUPO)
+    a = ap.parse_args(argv)
+
+    arqs = listar_entradas(a.entradas)
+    if not arqs:
+        print("Nenhum .parquet encontrado nas entradas.", file=sys.stderr); return 1
+    antes_bytes = sum(os.path.getsize(f) for f in arqs)
+    antes = medir_varredura(arqs)
+
+    t0 = time.perf_counter()
+    t = juntar(arqs)
+    gravar(t, a.saida, a.particionar, a.linhas_por_grupo)
+    dt = time.perf_counter() - t0
+    depois = medir_varredura(a.saida)
+
+    print(f"Lotes: {len(arqs)} • Linhas: {fmt_int_br(t.num_rows)} • Compactação: {dt:.1f}s")
+    print(f"Tamanho: {antes_bytes/2**20:.1f} MB -> {_tamanho(a.saida)/2**20:.1f} MB")
+    print(f"Varredura antes:  {antes}")
+    print(f"Varredura depois: {depois}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
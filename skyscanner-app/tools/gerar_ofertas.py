@@ -0,0 +1,151 @@
+# tools/gerar_ofertas.py — base sintética de ofertas (esquema A..M) em qualquer tamanho
+"""Gera ofertas sintéticas e determinísticas (mesma semente e tamanho -> mesmo arquivo) no
+esquema A..M que common.carregar_dados espera, dia a dia, sem nunca montar a base inteira em memória.
+
+Cada busca (Nome do Arquivo) é um trecho x dia do voo x hora da busca, com uma cia, um tipo de voo e
+~10 agências distintas (participação como na base real). O preço sai de trecho x ADVP x agência com
+ruído log-normal e o RANKING é a posição do preço dentro da busca.
+
+Uso (a partir de skyscanner-app/):
+    python -m tools.gerar_ofertas 1M -o data/sintetico/OFERTAS_1M.parquet
+    python -m tools.gerar_ofertas 10M -o data/sintetico/lotes_10M --por-dia
+"""
+import argparse, os, sys, time
+from datetime import date, timedelta
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from common import COLUNAS_OFERTAS, ADVPS_ORDEM, REGIOES_TRECHOS_STD, fmt_int_br
+
+# ofertas por agência na base real (ago/2025) -> probabilidade de a agência aparecer numa busca
+AGENCIAS = {'KIWI.COM': 8580, 'ZUPPER': 7564, 'TRIP.COM': 7365, 'BOOKING.COM': 7296, 'MAXMILHAS': 7207,
+            'MYTRIP': 6911, '123MILHAS': 6842, 'DECOLAR': 6680, 'GOTOGATE': 6641, 'FLIPMILHAS': 6023,
+            'VIAJANET': 5304, 'EXPEDIA': 5236, 'CAPOVIAGENS': 3727, 'KISSANDFLY': 3633, 'GOL': 3172, 'LATAM': 2159}
+# preço relativo da agência (a média das demais fica em 1)
+AJUSTE_AGENCIA = {'123MILHAS': 0.96, 'MAXMILHAS': 0.97, 'FLIPMILHAS': 0.98, 'KIWI.COM': 1.03, 'GOL': 1.05, 'LATAM': 1.06}
+CIAS = {'GOL': 0.426, 'LATAM': 0.298, 'AZUL': 0.2758, 'JETSMART': 0.0001, 'TAP': 0.0001}
+TIPOS_VOO = {'DIRETO': 0.674, '1 PARADAS': 0.281, '2 ESCALAS': 0.0383, '3 ESCALAS': 0.0059, '4 ESCALAS': 0.0008}
+FATOR_ADVP = {1: 1.55, 3: 1.40, 7: 1.22, 14: 1.08, 21: 1.0, 30: 0.96, 60: 0.92, 90: 0.92}
+# buscas por hora do dia (o coletor roda mais em horário comercial)
+PESO_HORA = np.array([1, 1, 1, 1, 1, 2, 4, 6, 8, 9, 9, 9, 8, 8, 9, 9, 9, 8, 7, 6, 5, 4, 2, 1], dtype='float64')
+OFERTAS_POR_BUSCA = 10
+# sem data/regioes.csv: pares entre estes aeroportos
+AEROPORTOS = ['GRU', 'CGH', 'VCP', 'GIG', 'SDU', 'BSB', 'CNF', 'SSA', 'REC', 'FOR', 'POA', 'CWB', 'FLN', 'BEL', 'MAO', 'NAT']
+
+def quantidade(texto: str) -> int:
+    """'100k', '1M', '2.5M' ou '50000' -> int."""
+    t = str(texto).strip().upper().replace('_', '')
+    mult = {'K': 10**3, 'M': 10**6, 'B': 10**9}.get(t[-1:], 1)
+    return int(float(t[:-1] if mult > 1 else t) * mult)
+
+def rotas(semente: int) -> dict:
+    """Trechos no formato bruto ('GRUREC'), peso de busca (Zipf), preço base e duração do voo direto."""
+    std = sorted(set().union(*REGIOES_TRECHOS_STD.values())) if REGIOES_TRECHOS_STD else \
+        [f"{a}-{b}" for a in AEROPORTOS for b in AEROPORTOS if a != b]
+    rng = np.random.default_rng([semente, 0])
+    peso = 1.0 / np.arange(1, len(std) + 1) ** 0.6
+    rng.shuffle(peso)
+    return dict(trechos=pa.array([t.replace('-', '') for t in std], pa.string()), peso=peso / peso.sum(),
+                base=rng.lognormal(np.log(620), 0.45, len(std)), duracao=rng.integers(55, 200, len(std)))
+
+def _hhmm(minutos: np.ndarray) -> pa.Array:
+    return pc.strftime(pa.array(minutos.astype('int64') * 60, pa.timestamp('s')), format='%H:%M')
+
+def _escolher(rng, n: int, probs: dict) -> np.ndarray:
+    p = np.array(list(probs.values()), dtype='float64')
+    return rng.choice(len(p), n, p=p / p.sum())
+
+def gerar_dia(rotas_: dict, dia: date, linhas: int, semente: int) -> pa.Table:
+    """`linhas` ofertas buscadas em `dia`, ordenadas por busca e RANKING (como o coletor grava)."""
+    rng = np.random.default_rng([semente, dia.toordinal()])
+    nb = int(linhas / (OFERTAS_POR_BUSCA - 2)) + 8
+    r = rng.choice(len(rotas_['base']), nb, p=rotas_['peso'])
+    advp = np.array(ADVPS_ORDEM)[rng.integers(0, len(ADVPS_ORDEM), nb)]
+    seg = rng.choice(24, nb, p=PESO_HORA / PESO_HORA.sum()) * 3600 + rng.integers(0, 3600, nb)
+    busca = np.datetime64(dia, 's') + seg.astype('timedelta64[s]')
+    voo = np.datetime64(dia, 'D') + advp.astype('timedelta64[D]')
+    cia, tipo = _escolher(rng, nb, CIAS), _escolher(rng, nb, TIPOS_VOO)
+    partida = rng.integers(60, 288, nb) * 5                       # 05:00–23:55, de 5 em 5 min
+    chegada = (partida + rotas_['duracao'][r] + tipo * rng.integers(60, 150, nb)) % 1440
+    k = np.clip(np.rint(rng.normal(OFERTAS_POR_BUSCA, 4, nb)), 1, len(AGENCIAS)).astype('int64')
+    k = k[:np.searchsorted(np.cumsum(k), linhas) + 1]
+    k[-1] -= k.sum() - linhas                                     # última busca fecha o total exato
+    nb = len(k)
+
+    # agências distintas dentro da busca, pela participação (top-k de log(p) + Gumbel)
+    p_ag = np.array(list(AGENCIAS.values()), dtype='float64')
+    ordem = np.argsort(-(np.log(p_ag / p_ag.sum()) + rng.gumbel(size=(nb, len(p_ag)))), axis=1)
+    ag = ordem[np.arange(len(p_ag)) < k[:, None]]
+    b = np.repeat(np.arange(nb), k)
+    ajuste = np.array([AJUSTE_AGENCIA.get(a, 1.0) for a in AGENCIAS])
+    fator_advp = np.array([FATOR_ADVP[a] for a in ADVPS_ORDEM])[np.searchsorted(ADVPS_ORDEM, advp[:nb])]
+    nivel = rotas_['base'][r[:nb]] * fator_advp * rng.lognormal(0, 0.25, nb)
+    preco = np.maximum(np.rint(nivel[b] * ajuste[ag] * rng.lognormal(0, 0.12, len(b))), 49).astype('int64')
+
+    # RANKING = posição do preço na busca (empate: ordem de chegada)
+    o = np.lexsort((preco, b))
+    b, ag, preco = b[o], ag[o], preco[o]
+    ranking = np.arange(len(b)) - np.repeat(np.cumsum(k) - k, k) + 1
+
+    trecho = rotas_['trechos'].take(pa.array(r[:nb]))
+    ts_busca = pa.array(busca[:nb], pa.timestamp('s'))
+    ts_voo = pa.array(voo[:nb], pa.timestamp('s'))
+    nome = pc.binary_join_element_wise(trecho, pc.strftime(ts_voo, format='%d%m%Y'), pc.strftime(ts_busca, format='%H%M%S'),
+                                       pc.cast(pa.array(np.arange(nb)), pa.string()), '_')
+    nome = pc.binary_join_element_wise(nome, pa.scalar('PDF'), '.')
+    por_busca = {
+        'Nome do Arquivo': nome, 'Companhia Aérea': pa.array(list(CIAS)).take(pa.array(cia[:nb])),
+        'Horário1': _hhmm(seg[:nb] // 60), 'Horário2': _hhmm(partida[:nb]), 'Horário3': _hhmm(chegada[:nb]),
+        'Tipo de Voo': pa.array(list(TIPOS_VOO)).take(pa.array(tipo[:nb])),
+        'Data do Voo': ts_voo.cast(pa.timestamp('ns')), 'Data/Hora da Busca': ts_busca.cast(pa.timestamp('ns')),
+    }
+    idx = pa.array(b)
+    cols = {c: v.take(idx) for c, v in por_busca.items()}
+    cols.update({'Agência/Companhia': pa.array(list(AGENCIAS)).take(pa.array(ag)), 'Preço': pa.array(preco),
+                 'TRECHO': trecho.take(idx), 'ADVP': pa.array(advp[:nb][b]), 'RANKING': pa.array(ranking)})
+    return pa.table({c: cols[c] for c in COLUNAS_OFERTAS})
+
+def gerar(linhas: int, saida: str, dias: int = 30, fim: date = date(2025, 8, 10), semente: int = 42,
+          por_dia: bool = False) -> dict:
+    """Grava `linhas` ofertas de `dias` dias de busca terminando em `fim`: um .parquet (um row group por dia)
+    ou, com por_dia, um diretório de lotes OFERTAS_AAAA-MM-DD.parquet (como o coletor entrega)."""
+    rotas_ = rotas(semente)
+    por = np.full(dias, linhas // dias); por[:linhas % dias] += 1
+    if por_dia: os.makedirs(saida, exist_ok=True)
+    else: os.makedirs(os.path.dirname(saida) or '.', exist_ok=True)
+    escritor, tmp = None, f"{saida}.tmp"
+    try:
+        for i, n in enumerate(por):
+            if not n: continue
+            dia = fim - timedelta(days=dias - 1 - i)
+            t = gerar_dia(rotas_, dia, int(n), semente)
+            if por_dia:
+                pq.write_table(t, os.path.join(saida, f"OFERTAS_{dia.isoformat()}.parquet"), compression='zstd')
+                continue
+            if escritor is None: escritor = pq.ParquetWriter(tmp, t.schema, compression='zstd')
+            escritor.write_table(t)
+    finally:
+        if escritor is not None: escritor.close()
+    if not por_dia: os.replace(tmp, saida)
+    return dict(linhas=int(linhas), dias=dias, fim=fim.isoformat(), semente=semente, saida=saida)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('linhas', help="quantidade de ofertas (ex.: 100k, 1M, 10M, 50M)")
+    ap.add_argument('-o', '--saida', required=True, help='arquivo .parquet (ou diretório com --por-dia)')
+    ap.add_argument('--dias', type=int, default=30, help='dias de busca (padrão: 30)')
+    ap.add_argument('--fim', type=date.fromisoformat, default=date(2025, 8, 10), help='último dia de busca (AAAA-MM-DD)')
+    ap.add_argument('--semente', type=int, default=42)
+    ap.add_argument('--por-dia', action='store_true', help='um lote .parquet por dia de busca')
+    a = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    r = gerar(quantidade(a.linhas), a.saida, a.dias, a.fim, a.semente, a.por_dia)
+    print(f"Linhas: {fmt_int_br(r['linhas'])} • Dias: {r['dias']} (até {r['fim']}) • {time.perf_counter() - t0:.1f}s -> {a.saida}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())